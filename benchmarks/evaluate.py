@@ -0,0 +1,242 @@
+"""Retrieval quality next to latency and cost, swept over search settings.
+
+    python -m benchmarks.evaluate
+    python -m benchmarks.evaluate --grid '{"USE_DENSE": [false, true], "TOP_K": [4, 8]}'
+
+Every configuration in the grid (the product of the listed Settings values) runs the
+labeled questions in ``benchmarks/eval_questions.jsonl`` against the published index and
+reports recall@k, MRR and nDCG@k of the ranked hits, how often the context handed to
+the answer step still contains a relevant chunk, search latency, and the estimated
+tokens each question costs (query embedding plus the LLM prompt). The configurations
+that no other one beats on quality, p95 latency and prompt tokens at once are printed
+as the Pareto frontier.
+
+A question labeled with a ``section`` is answered only by that chunk; one without a
+section by any chunk of its policy. Index build choices (ANN backend, VECTOR_STORAGE)
+are compared by running the harness against each build.
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence
+from unittest import mock
+
+import numpy as np
+
+from benchmarks.run import latency_summary
+from src.core.config import settings
+from src.core.openai_client import estimate_tokens
+from src.core.result_cache import get_result_cache
+from src.llm.generator import _focused_hits, _llm_messages
+from src.llm.semantic_cache import get_semantic_cache
+from src.retrieval import search
+
+QUESTIONS_PATH = Path(__file__).resolve().parent / "eval_questions.jsonl"
+DEFAULT_GRID: Dict[str, List[Any]] = {
+    "TOP_K": [3, 6, 10],
+    "MIN_RELEVANCE_SCORE": [0.0, 0.05, 0.2],
+    "FOCUS_RELATIVE_SCORE": [0.5, 0.65, 0.8],
+}
+QUALITY_METRIC = "ndcg"
+
+
+class Question(NamedTuple):
+    query: str
+    policy_id: str
+    section: Optional[str] = None
+
+
+def load_questions(path: Path = QUESTIONS_PATH) -> List[Question]:
+    with path.open("r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [Question(row["query"], row["policy_id"], row.get("section")) for row in rows]
+
+
+def is_relevant(item: Dict, question: Question) -> bool:
+    if item.get("policy_id") != question.policy_id:
+        return False
+    return question.section is None or item.get("section") == question.section
+
+
+def ranking_metrics(relevance: Sequence[bool], relevant_total: int, k: int) -> Dict[str, float]:
+    """recall@k, reciprocal rank and nDCG@k of one ranked list with binary relevance.
+
+    Recall is measured against at most ``k`` relevant chunks, so a question whose policy
+    has more chunks than ``k`` can still reach 1.0.
+    """
+    top = list(relevance[:k])
+    ideal = min(k, relevant_total)
+    if ideal == 0:
+        return {"recall": 0.0, "mrr": 0.0, "ndcg": 0.0}
+    first = next((rank for rank, relevant in enumerate(relevance, 1) if relevant), None)
+    dcg = sum(1 / math.log2(rank + 1) for rank, relevant in enumerate(top, 1) if relevant)
+    idcg = sum(1 / math.log2(rank + 1) for rank in range(1, ideal + 1))
+    return {
+        "recall": sum(top) / ideal,
+        "mrr": 1 / first if first else 0.0,
+        "ndcg": dcg / idcg,
+    }
+
+
+def configurations(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    unknown = [name for name in grid if name not in type(settings).model_fields]
+    if unknown:
+        raise ValueError(f"unknown settings in grid: {', '.join(unknown)}")
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def _clear_caches() -> None:
+    get_result_cache.cache_clear()
+    get_semantic_cache.cache_clear()
+
+
+@contextlib.contextmanager
+def _configured(config: Dict[str, Any]) -> Iterator[None]:
+    """Apply ``config`` with result and answer caches off (query embeddings stay cached)."""
+    overrides = {
+        "RESULT_CACHE_SIZE": 0,
+        "RESULT_CACHE_PATH": "",
+        "SEMANTIC_CACHE_STYLES": "",
+        **config,
+    }
+    with contextlib.ExitStack() as stack:
+        for name, value in overrides.items():
+            stack.enter_context(mock.patch.object(settings, name, value))
+        stack.callback(_clear_caches)
+        _clear_caches()
+        yield
+
+
+def _prompt_tokens(query: str, hits: List[Dict]) -> int:
+    if not hits:
+        return 0
+    messages = _llm_messages(query, _focused_hits(hits))
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+
+def evaluate(
+    questions: Sequence[Question], config: Dict[str, Any], k: int = 5, repeats: int = 3
+) -> Dict[str, Any]:
+    """Mean quality and cost metrics of ``questions`` under ``config``, plus latency."""
+    search.index_fingerprint()
+    meta = search.loaded_index().meta
+    names = ("recall", "mrr", "ndcg", "context_recall", "embed_tokens", "prompt_tokens")
+    scores: Dict[str, List[float]] = {name: [] for name in names}
+    latencies = []
+    with _configured(config):
+        for question in questions:
+            search.hybrid_search(question.query)  # warm the query embedding cache
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                hits = search.hybrid_search(question.query)
+                timings.append(time.perf_counter() - start)
+            latencies.append(float(np.median(timings)))
+
+            relevant_total = sum(is_relevant(item, question) for item in meta)
+            relevance = [is_relevant(hit, question) for hit in hits]
+            for name, value in ranking_metrics(relevance, relevant_total, k).items():
+                scores[name].append(value)
+            context = _focused_hits(hits)
+            scores["context_recall"].append(any(is_relevant(hit, question) for hit in context))
+            scores["embed_tokens"].append(
+                estimate_tokens(question.query) if settings.USE_DENSE else 0
+            )
+            scores["prompt_tokens"].append(_prompt_tokens(question.query, hits))
+
+    summary: Dict[str, Any] = {
+        name: round(float(np.mean(values)), 4) for name, values in scores.items()
+    }
+    summary["search_ms"] = latency_summary(latencies)
+    return summary
+
+
+def _dominates(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    pairs = [
+        (a[QUALITY_METRIC], b[QUALITY_METRIC]),
+        (-a["search_ms"]["p95"], -b["search_ms"]["p95"]),
+        (-a["prompt_tokens"], -b["prompt_tokens"]),
+    ]
+    return all(x >= y for x, y in pairs) and any(x > y for x, y in pairs)
+
+
+def pareto_frontier(results: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Results not dominated on quality (nDCG), p95 search latency and prompt tokens."""
+    return [
+        result
+        for result in results
+        if not any(_dominates(other["metrics"], result["metrics"]) for other in results)
+    ]
+
+
+def sweep(
+    grid: Dict[str, List[Any]],
+    questions: Optional[Sequence[Question]] = None,
+    k: int = 5,
+    repeats: int = 3,
+) -> List[Dict[str, Any]]:
+    questions = questions if questions is not None else load_questions()
+    results = []
+    for config in configurations(grid):
+        print(f"Evaluating {config}…", file=sys.stderr)
+        results.append({"config": config, "metrics": evaluate(questions, config, k, repeats)})
+    return results
+
+
+def _describe(config: Dict[str, Any]) -> str:
+    return " ".join(f"{name}={value}" for name, value in config.items()) or "(current settings)"
+
+
+def format_table(results: Sequence[Dict[str, Any]], k: int) -> str:
+    frontier = {id(result) for result in pareto_frontier(results)}
+    header = (
+        f"  {'recall@' + str(k):>9} {'MRR':>6} {'nDCG@' + str(k):>7} {'ctx':>6} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'prompt':>7} {'embed':>6}  config"
+    )
+    lines = [header]
+    ranked = sorted(results, key=lambda result: -result["metrics"][QUALITY_METRIC])
+    for result in ranked:
+        m = result["metrics"]
+        lines.append(
+            f"{'*' if id(result) in frontier else ' '} {m['recall']:>9.3f} {m['mrr']:>6.3f} "
+            f"{m['ndcg']:>7.3f} {m['context_recall']:>6.3f} {m['search_ms']['p50']:>8.3f} "
+            f"{m['search_ms']['p95']:>8.3f} {m['prompt_tokens']:>7.0f} "
+            f"{m['embed_tokens']:>6.1f}  {_describe(result['config'])}"
+        )
+    lines.append("* = Pareto frontier (nDCG vs p95 latency vs prompt tokens)")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--grid",
+        type=json.loads,
+        default=DEFAULT_GRID,
+        help='JSON object of Settings name -> values, e.g. \'{"TOP_K": [4, 8]}\'',
+    )
+    parser.add_argument("--questions", type=Path, default=QUESTIONS_PATH)
+    parser.add_argument("--k", type=int, default=5, help="Cut-off for recall@k and nDCG@k")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per question")
+    parser.add_argument("--out", type=Path, help="Write all results as JSON here")
+    args = parser.parse_args()
+
+    try:
+        configurations(args.grid)
+    except (ValueError, TypeError, AttributeError) as exc:
+        parser.error(f"invalid --grid: {exc}")
+    results = sweep(args.grid, load_questions(args.questions), args.k, args.repeats)
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    print(format_table(results, args.k))
+
+
+if __name__ == "__main__":
+    main()
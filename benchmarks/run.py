@@ -0,0 +1,241 @@
+"""Latency benchmarks over synthetic corpora, with a baseline regression gate.
+
+    python -m benchmarks.run --scales 1k,10k --out results.json
+    python -m benchmarks.run --scales 1k,10k --baseline benchmarks/baseline.json
+
+Each scale writes Markdown policy files into a temporary directory and times
+``cli_ingest.ingest``, ``build_index`` (with a feature-hashing embedder instead of a
+real model), ``load_index``, the first load of a search generation, ``hybrid_search``
+and ``generate_answer`` per offline style. Result caches are disabled so every query
+does the full work. With ``--baseline`` the run exits with status 1 when any timing is
+more than ``--threshold`` slower than the stored one.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+from unittest import mock
+
+import numpy as np
+
+from benchmarks.synthetic import FAKE_DIMENSION, fake_embed_texts, synthetic_queries
+from benchmarks.synthetic import write_policy_files
+from src.core.config import settings
+from src.core.result_cache import get_result_cache
+from src.data_pipeline import cli_ingest
+from src.llm.generator import generate_answer
+from src.llm.semantic_cache import get_semantic_cache
+from src.retrieval import embeddings, index_faiss, search
+from src.retrieval.embedding_cache import get_query_cache
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+ANSWER_STYLES = ("bullets", "paragraph")
+WARMUP_QUERIES = 5
+# Differences below these are noise however large the ratio (keys ending _s / _ms).
+MIN_REGRESSION = {"s": 0.05, "ms": 1.0}
+
+
+def _clear_caches() -> None:
+    search.clear_search_cache()
+    get_query_cache.cache_clear()
+    get_result_cache.cache_clear()
+    get_semantic_cache.cache_clear()
+
+
+@contextlib.contextmanager
+def isolated_index(workdir: Path, dimension: int = FAKE_DIMENSION) -> Iterator[None]:
+    """Point ingest output, the index and all caches at ``workdir`` for one benchmark."""
+    index_dir = workdir / "index"
+
+    def embed(texts: List[str]):
+        return fake_embed_texts(texts, dimension)
+
+    paths = {
+        "DOCS_PATH": workdir / "processed" / "corpus.jsonl",
+        "INDEX_DIR": index_dir,
+        "VERSIONS_DIR": index_dir / "versions",
+        "STAGING_DIR": index_dir / "staging",
+        "CURRENT_PATH": index_dir / "CURRENT",
+        "EMBED_STORE_PATH": index_dir / "embeddings.sqlite",
+    }
+    overrides = {
+        "EMBEDDINGS_PROVIDER": "st",
+        "ST_MODEL": f"benchmark-hash-{dimension}",
+        "USE_DENSE": True,
+        "USE_LLM": False,
+        "INDEX_RELOAD_INTERVAL": -1,
+        "QUERY_EMBED_CACHE_SIZE": 0,
+        "QUERY_EMBED_CACHE_PATH": "",
+        "RESULT_CACHE_SIZE": 0,
+        "RESULT_CACHE_PATH": "",
+        "SEMANTIC_CACHE_STYLES": "",
+    }
+    patches = [
+        (index_faiss, {**paths, "embed_texts": embed}),
+        (embeddings, {"embed_texts": embed}),
+        (settings, overrides),
+    ]
+    with contextlib.ExitStack() as stack:
+        for target, values in patches:
+            for name, value in values.items():
+                stack.enter_context(mock.patch.object(target, name, value))
+        stack.callback(_clear_caches)
+        _clear_caches()
+        yield
+
+
+def _seconds(call: Callable[[], object]) -> Tuple[float, object]:
+    start = time.perf_counter()
+    result = call()
+    return time.perf_counter() - start, result
+
+
+def latency_summary(seconds: Sequence[float]) -> Dict[str, float]:
+    milliseconds = np.asarray(seconds, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(milliseconds.mean()), 3),
+    }
+
+
+def run_scale(
+    chunks: int, workdir: Path, queries: int = 200, dimension: int = FAKE_DIMENSION
+) -> Dict:
+    """Benchmark every stage on a fresh synthetic corpus of about ``chunks`` chunks."""
+    raw_dir, processed_dir = workdir / "raw", workdir / "processed"
+    files = write_policy_files(raw_dir, chunks)
+    with isolated_index(workdir, dimension), contextlib.redirect_stdout(io.StringIO()):
+        ingest_s, count = _seconds(
+            lambda: cli_ingest.ingest(raw_dir, processed_dir, "GLOBAL", "2025-01-01")
+        )
+        build_s, _ = _seconds(index_faiss.build_index)
+        load_index_s, (_, meta) = _seconds(index_faiss.load_index)
+        search.clear_search_cache()
+        load_generation_s, _ = _seconds(search.index_fingerprint)
+
+        questions = synthetic_queries(meta, queries)
+        for question in questions[:WARMUP_QUERIES]:
+            generate_answer(question, search.hybrid_search(question))
+        search_times, answer_times = [], {style: [] for style in ANSWER_STYLES}
+        for question in questions:
+            elapsed, hits = _seconds(lambda: search.hybrid_search(question))
+            search_times.append(elapsed)
+            for style in ANSWER_STYLES:
+                answer_times[style].append(
+                    _seconds(lambda: generate_answer(question, hits, style))[0]
+                )
+
+    return {
+        "chunks": count,
+        "files": files,
+        "ingest_s": round(ingest_s, 4),
+        "build_s": round(build_s, 4),
+        "load_index_s": round(load_index_s, 4),
+        "load_generation_s": round(load_generation_s, 4),
+        "search_ms": latency_summary(search_times),
+        "answer_ms": {style: latency_summary(times) for style, times in answer_times.items()},
+    }
+
+
+def run_suite(scales: Sequence[str], queries: int = 200, dimension: int = FAKE_DIMENSION) -> Dict:
+    results = {}
+    for scale in scales:
+        with tempfile.TemporaryDirectory(prefix=f"hr-bench-{scale}-") as workdir:
+            print(f"Benchmarking {scale} chunks…", file=sys.stderr)
+            results[scale] = run_scale(SCALES[scale], Path(workdir), queries, dimension)
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "queries": queries,
+            "dimension": dimension,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def _leaves(values: Dict, prefix: str) -> Iterator[Tuple[str, float]]:
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from _leaves(value, f"{prefix}.{key}")
+        else:
+            yield f"{prefix}.{key}", float(value)
+
+
+def _timings(results: Dict) -> Iterator[Tuple[str, str, float]]:
+    """(metric path, unit, value) for every per-scale key ending in _s or _ms."""
+    for scale, metrics in results.items():
+        for key, value in metrics.items():
+            unit = key.rsplit("_", 1)[-1]
+            if unit not in MIN_REGRESSION:
+                continue
+            if isinstance(value, dict):
+                for path, number in _leaves(value, f"{scale}.{key}"):
+                    yield path, unit, number
+            else:
+                yield f"{scale}.{key}", unit, float(value)
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Describe every timing more than ``threshold`` (0.2 = 20%) slower than the baseline.
+
+    Only metrics present in both runs are compared, and differences below
+    MIN_REGRESSION are ignored as noise.
+    """
+    previous = {path: value for path, _, value in _timings(baseline["results"])}
+    regressions = []
+    for path, unit, value in _timings(current["results"]):
+        before = previous.get(path)
+        if before is None:
+            continue
+        if value > before * (1 + threshold) and value - before > MIN_REGRESSION[unit]:
+            regressions.append(f"{path}: {value:g}{unit} vs baseline {before:g}{unit}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scales", default="1k,10k", help=f"Comma-separated: {', '.join(SCALES)}")
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries per scale")
+    parser.add_argument("--dimension", type=int, default=FAKE_DIMENSION)
+    parser.add_argument("--out", type=Path, help="Write the results JSON here")
+    parser.add_argument("--baseline", type=Path, help="Fail on regressions against this file")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    scales = [scale.strip().lower() for scale in args.scales.split(",") if scale.strip()]
+    unknown = set(scales) - set(SCALES)
+    if unknown:
+        parser.error(f"unknown scales: {', '.join(sorted(unknown))}")
+    results = run_suite(scales, args.queries, args.dimension)
+    payload = json.dumps(results, indent=2)
+    if args.out:
+        args.out.write_text(payload + "\n", encoding="utf-8")
+    print(payload)
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
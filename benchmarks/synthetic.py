@@ -0,0 +1,107 @@
+"""Synthetic policy corpora shaped like the shipped index, and a deterministic embedder."""
+
+import json
+import random
+import re
+import zlib
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from src.retrieval.bm25 import tokenize
+
+ROOT = Path(__file__).resolve().parents[1]
+SOURCE_META = ROOT / "data" / "index" / "meta.jsonl"
+FAKE_DIMENSION = 128
+MAX_SECTION_CHARS = 880  # below cli_ingest.chunk_text's 900, so one section is one chunk
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+class CorpusShape(NamedTuple):
+    """What synthetic corpora copy from a real one: wording, chunk sizes and policy mix."""
+
+    sentences: List[str]
+    lengths: List[int]
+    policies: List[str]
+    chunks_per_policy: int
+
+
+def corpus_shape(meta_path: Path = SOURCE_META) -> CorpusShape:
+    with meta_path.open("r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    sentences = sorted(
+        {
+            sentence.strip()
+            for record in records
+            for sentence in SENTENCE_RE.split(record["text"])
+            if 20 <= len(sentence.strip()) <= MAX_SECTION_CHARS // 2
+        }
+    )
+    policies = sorted({record["policy_id"] for record in records})
+    return CorpusShape(
+        sentences,
+        [len(record["text"]) for record in records],
+        policies,
+        max(1, round(len(records) / len(policies))),
+    )
+
+
+def _section_text(rng: random.Random, shape: CorpusShape) -> str:
+    target = min(rng.choice(shape.lengths), MAX_SECTION_CHARS)
+    text = rng.choice(shape.sentences)
+    while len(text) < target:
+        sentence = rng.choice(shape.sentences)
+        if len(text) + len(sentence) + 1 > MAX_SECTION_CHARS:
+            break
+        text = f"{text} {sentence}"
+    return text
+
+
+def write_policy_files(
+    directory: Path, chunks: int, seed: int = 0, shape: Optional[CorpusShape] = None
+) -> int:
+    """Write Markdown policy files that ingest into about ``chunks`` chunks; returns files."""
+    shape = shape or corpus_shape()
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    files = 0
+    for start in range(0, chunks, shape.chunks_per_policy):
+        policy_id = f"{rng.choice(shape.policies)}_{files:07d}"
+        lines = [f"# {policy_id.replace('_', ' ').title()}", ""]
+        for section in range(min(shape.chunks_per_policy, chunks - start)):
+            lines += [f"## Section {section + 1}", "", _section_text(rng, shape), ""]
+        (directory / f"{policy_id}.md").write_text("\n".join(lines), encoding="utf-8")
+        files += 1
+    return files
+
+
+def synthetic_queries(meta: Sequence[Dict], count: int, seed: int = 0) -> List[str]:
+    """Questions mixing a policy name with words from one of its chunks."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        item = rng.choice(meta)
+        words = tokenize(item["text"])
+        start = rng.randrange(max(1, len(words) - 6))
+        policy = item["policy_id"].rsplit("_", 1)[0].replace("_", " ")
+        queries.append(f"{policy} {' '.join(words[start : start + rng.randint(2, 6)])}")
+    return queries
+
+
+def fake_embed_texts(texts: List[str], dimension: int = FAKE_DIMENSION) -> np.ndarray:
+    """Signed feature hashing of tokens: deterministic, fast and lexically meaningful."""
+    rows: List[int] = []
+    columns: List[int] = []
+    signs: List[float] = []
+    for row, text in enumerate(texts):
+        for token in tokenize(text):
+            digest = zlib.crc32(token.encode("utf-8"))
+            rows.append(row)
+            columns.append(digest % dimension)
+            signs.append(1.0 if digest & 0x80000000 else -1.0)
+    vectors = np.zeros((len(texts), dimension), dtype=np.float32)
+    positions = (np.asarray(rows, dtype=np.int64), np.asarray(columns, dtype=np.int64))
+    np.add.at(vectors, positions, np.asarray(signs, dtype=np.float32))
+    vectors[~vectors.any(axis=1), 0] = 1.0  # texts without tokens still get a unit vector
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
@@ -0,0 +1,343 @@
+"""Headless JSON query service for integrations and load tests.
+
+    python -m src.api.server --host 0.0.0.0 --port 8080
+
+Endpoints:
+
+- ``GET|POST /search``: ``hybrid_search`` hits for ``query``, optionally filtered by
+  ``region``, ``policy_ids`` (``policy_id`` repeated in a query string) and
+  ``effective_as_of``.
+- ``POST /answer``: the same search followed by ``generate_answer`` in ``style``.
+- ``GET /health``: liveness plus the loaded index version.
+- ``GET /ready``: 200 once the index is loaded, 503 before that.
+- ``GET /metrics``: stage timings and counters in the Prometheus text format (empty
+  unless ``METRICS_ENABLED`` is set).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http import HTTPStatus
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from src.core.config import settings
+from src.core.metrics import incr, observe, render_prometheus
+from src.llm.generator import generate_answer
+from src.retrieval.filters import SearchFilter
+from src.retrieval.search import hybrid_search, index_fingerprint, loaded_index
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_HEADERS = 100
+ANSWER_STYLES = ("bullets", "paragraph", "llm")
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    params: Dict[str, List[str]]
+    headers: Dict[str, str]
+    body: bytes
+    keep_alive: bool
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """Parse one HTTP/1.x request; None when the client closed the connection."""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "malformed request line") from None
+
+    headers: Dict[str, str] = {}
+    for _ in range(MAX_HEADERS + 1):
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(400, "too many headers")
+
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPError(400, "invalid Content-Length") from None
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"request body is larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length > 0 else b""
+
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    url = urlsplit(target)
+    return Request(method.upper(), url.path, parse_qs(url.query), headers, body, keep_alive)
+
+
+def encode_response(status: int, payload: Union[Dict, str], keep_alive: bool) -> bytes:
+    """JSON for dict payloads; strings are sent as-is in the Prometheus text format."""
+    if isinstance(payload, str):
+        body, content_type = payload.encode("utf-8"), PROMETHEUS_CONTENT_TYPE
+    else:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        content_type = "application/json; charset=utf-8"
+    head = (
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+def _payload(request: Request) -> Dict[str, Any]:
+    if request.method == "GET":
+        payload: Dict[str, Any] = {key: values[-1] for key, values in request.params.items()}
+        if "policy_id" in request.params:
+            payload["policy_ids"] = request.params["policy_id"]
+        return payload
+    try:
+        payload = json.loads(request.body or b"{}")
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise HTTPError(400, "request body is not valid JSON") from None
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "request body must be a JSON object")
+    return payload
+
+
+def _query(payload: Dict[str, Any]) -> str:
+    query = payload.get("query")
+    if not isinstance(query, str) or not query.strip():
+        raise HTTPError(400, "'query' must be a non-empty string")
+    return query.strip()
+
+
+def _filters(payload: Dict[str, Any]) -> Optional[SearchFilter]:
+    effective_as_of = payload.get("effective_as_of")
+    if effective_as_of not in (None, ""):
+        # Chunk dates are compared as YYYY-MM-DD strings, so accept exactly that form
+        try:
+            valid = date.fromisoformat(effective_as_of).isoformat() == effective_as_of
+        except (TypeError, ValueError):
+            valid = False
+        if not valid:
+            raise HTTPError(400, "'effective_as_of' must be a YYYY-MM-DD date")
+    try:
+        search_filter = SearchFilter.of(
+            payload.get("region"), payload.get("policy_ids"), effective_as_of
+        )
+    except TypeError:
+        raise HTTPError(400, "'region' and 'policy_ids' must be strings or lists") from None
+    return None if search_filter.is_empty() else search_filter
+
+
+def _public_hit(hit: Dict) -> Dict:
+    """Hit fields returned to clients; precomputed sentence segments stay internal."""
+    return {key: value for key, value in hit.items() if key != "segments"}
+
+
+def _index_status() -> Dict[str, Any]:
+    generation = loaded_index()
+    if generation is None:
+        return {"loaded": False}
+    return {
+        "loaded": True,
+        "version": generation.version or "legacy",
+        "fingerprint": generation.fingerprint,
+        "chunks": len(generation.meta),
+    }
+
+
+def _search_and_answer(
+    query: str, style: str, search_filter: Optional[SearchFilter]
+) -> Tuple[List[Dict], str]:
+    hits = hybrid_search(query, search_filter)
+    return hits, generate_answer(query, hits, style)
+
+
+class QueryServer:
+    """asyncio HTTP front end over the process's shared index generation.
+
+    Searches and answers are CPU-bound (or wait on the LLM), so they run on a pool of
+    ``workers`` threads while the event loop keeps accepting connections. Requests
+    beyond ``max_pending`` waiting for a thread are refused with 503 rather than queued
+    without bound.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.workers = max(1, workers or settings.API_WORKERS)
+        self.max_pending = settings.API_MAX_PENDING if max_pending is None else max_pending
+        self.in_flight = 0
+        self.load_error: Optional[str] = None
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="query")
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._routes: Dict[str, Dict[str, Callable]] = {
+            "/health": {"GET": self._health},
+            "/ready": {"GET": self._ready},
+            "/search": {"GET": self._search, "POST": self._search},
+            "/answer": {"POST": self._answer},
+            "/metrics": {"GET": self._metrics},
+        }
+
+    async def start(self, host: str, port: int) -> int:
+        """Listen on ``host:port`` and start loading the index; returns the bound port."""
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        asyncio.get_running_loop().run_in_executor(self._pool, self._load_index)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _load_index(self) -> None:
+        try:
+            index_fingerprint()
+        except Exception as exc:
+            logger.exception("Could not load the search index")
+            self.load_error = str(exc)
+        else:
+            self.load_error = None
+
+    async def _run(self, func: Callable, *args):
+        if self.in_flight >= self.workers + self.max_pending:
+            raise HTTPError(503, "server is busy; retry later")
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, func, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def _health(self, request: Request) -> Tuple[int, Dict]:
+        return 200, {"status": "ok", "index": _index_status(), "in_flight": self.in_flight}
+
+    async def _ready(self, request: Request) -> Tuple[int, Dict]:
+        status = _index_status()
+        if status["loaded"]:
+            return 200, {"ready": True, "index": status}
+        return 503, {"ready": False, "index": status, "error": self.load_error}
+
+    async def _metrics(self, request: Request) -> Tuple[int, str]:
+        return 200, render_prometheus()
+
+    async def _search(self, request: Request) -> Tuple[int, Dict]:
+        payload = _payload(request)
+        query, search_filter = _query(payload), _filters(payload)
+        hits = await self._run(hybrid_search, query, search_filter)
+        return 200, {
+            "query": query,
+            "hits": [_public_hit(hit) for hit in hits],
+            "index": _index_status(),
+        }
+
+    async def _answer(self, request: Request) -> Tuple[int, Dict]:
+        payload = _payload(request)
+        query, search_filter = _query(payload), _filters(payload)
+        style = payload.get("style", "bullets")
+        if style not in ANSWER_STYLES:
+            raise HTTPError(400, f"'style' must be one of {', '.join(ANSWER_STYLES)}")
+        hits, answer = await self._run(_search_and_answer, query, style, search_filter)
+        return 200, {
+            "query": query,
+            "style": style,
+            "answer": answer,
+            "hits": [_public_hit(hit) for hit in hits],
+            "index": _index_status(),
+        }
+
+    async def dispatch(self, request: Request) -> Tuple[int, Union[Dict, str]]:
+        start = time.perf_counter()
+        status, payload = await self._dispatch(request)
+        route = request.path if request.path in self._routes else "other"
+        observe(f"api{route}", time.perf_counter() - start)
+        incr("api_requests", route=route, status=status)
+        return status, payload
+
+    async def _dispatch(self, request: Request) -> Tuple[int, Union[Dict, str]]:
+        methods = self._routes.get(request.path)
+        if methods is None:
+            return 404, {"error": f"no route for {request.path}"}
+        handler = methods.get(request.method)
+        if handler is None:
+            return 405, {"error": f"{request.method} is not allowed on {request.path}"}
+        try:
+            return await handler(request)
+        except HTTPError as exc:
+            return exc.status, {"error": str(exc)}
+        except Exception:
+            logger.exception("%s %s failed", request.method, request.path)
+            return 500, {"error": "internal server error"}
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as exc:
+                    writer.write(encode_response(exc.status, {"error": str(exc)}, False))
+                    await writer.drain()
+                    break
+                except (ValueError, asyncio.IncompleteReadError):
+                    break  # oversized header line or body cut short
+                if request is None:
+                    break
+                status, payload = await self.dispatch(request)
+                writer.write(encode_response(status, payload, request.keep_alive))
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def serve(host: str, port: int, workers: Optional[int] = None) -> None:
+    server = QueryServer(workers)
+    bound_port = await server.start(host, port)
+    print(f"Serving HR policy queries on http://{host}:{bound_port} ({server.workers} workers)")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HTTP query service for the policy index")
+    parser.add_argument("--host", default=settings.API_HOST)
+    parser.add_argument("--port", type=int, default=settings.API_PORT)
+    parser.add_argument("--workers", type=int, default=settings.API_WORKERS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
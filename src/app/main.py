@@ -11,15 +11,16 @@ import streamlit as st  # noqa: E402
 
 # Local modules (now resolvable thanks to the shim above)
 from src.core.config import settings  # noqa: E402
-from src.llm.generator import generate_answer  # noqa: E402
+from src.llm.generator import generate_answer_stream  # noqa: E402
+from src.retrieval.index_faiss import META_NAME, VECS_NAME, index_dir  # noqa: E402
 from src.retrieval.search import hybrid_search  # noqa: E402
 
 
 # ---------------------------- Helpers -----------------------------------
 def _index_ready() -> bool:
-    """Check if the dense/BM25 index files exist."""
-    idx_dir = ROOT / "data" / "index"
-    return (idx_dir / "vectors.npy").exists() and (idx_dir / "meta.jsonl").exists()
+    """Check if the dense/BM25 index files of the published (or legacy) index exist."""
+    idx_dir = index_dir()
+    return (idx_dir / VECS_NAME).exists() and (idx_dir / META_NAME).exists()
 
 def _processed_ready() -> bool:
     """Check if processed corpus exists (from ingestion)."""
@@ -76,6 +77,11 @@ if "last_hits" not in st.session_state:
     st.session_state.last_hits = [] # store last retrieval results for the debug panel
 
 
+# ------------------------ Render conversation ----------------------------
+for msg in st.session_state.history[-20:]:
+    with st.chat_message(msg["role"]):
+        st.markdown(msg["content"])
+
 # --------------------------- Chat input ----------------------------------
 q = st.chat_input("Type your question, e.g., “What is the PTO carryover policy?”")
 
@@ -84,20 +90,20 @@ if q:
     if not _index_ready():
         st.error("No index found. Please run ingestion and build the index (see sidebar).")
     else:
-        # Save user message
+        # Save and show user message
         st.session_state.history.append({"role": "user", "content": q})
+        with st.chat_message("user"):
+            st.markdown(q)
 
-        # Retrieve + answer
+        # Retrieve + answer, redrawing the reply as LLM tokens arrive
         hits = hybrid_search(q)
         st.session_state.last_hits = hits
-        answer_md = generate_answer(q, hits)
+        with st.chat_message("assistant"):
+            reply = st.empty()
+            for answer_md in generate_answer_stream(q, hits):
+                reply.markdown(answer_md)
         st.session_state.history.append({"role": "assistant", "content": answer_md})
 
-# ------------------------ Render conversation ----------------------------
-for msg in st.session_state.history[-20:]:
-    with st.chat_message(msg["role"]):
-        st.markdown(msg["content"])
-
 # ------------------------ Debug / Evidence panel -------------------------
 with st.expander("🔎 View retrieved snippets (debug)"):
     if not st.session_state.last_hits:
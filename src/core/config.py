@@ -1,40 +1,141 @@
 # src/core/config.py
 import os
-from typing import Optional
-from pydantic import BaseModel
+import sys
+from functools import lru_cache
+from typing import Any, Dict, Optional
+from pydantic import BaseModel, Field, field_validator
 from dotenv import load_dotenv
 
 load_dotenv()  # read .env for local runs
 
-def _get_secret_or_none(key: str) -> Optional[str]:
-    # Only try st.secrets if Streamlit is present; never crash if secrets.toml is missing
+# Values accepted for FUSION_METHOD, implemented in src/retrieval/fusion.py
+FUSION_METHODS = ("weighted", "rrf", "zscore")
+
+@lru_cache(maxsize=1)
+def _streamlit_secrets() -> Dict[str, Any]:
+    # Read st.secrets once, and only inside a Streamlit process: CLI tools never pay for
+    # importing streamlit. Missing or unreadable secrets.toml means no secrets.
+    if "streamlit" not in sys.modules:
+        return {}
     try:
         import streamlit as st
-        try:
-            return st.secrets[key]  # may raise if secrets.toml not present
-        except Exception:
-            return None
+
+        return dict(st.secrets)
     except Exception:
-        return None
+        return {}
 
-def getenv(key: str, default: Optional[str] = None) -> Optional[str]:
-    # Prefer OS env (.env); fall back to Streamlit secrets; else default
-    v = os.getenv(key)
-    if v not in (None, ""):
+def _get_secret_or_none(key: str) -> Optional[str]:
+    return _streamlit_secrets().get(key)
+
+def getenv(key: str, default: Optional[str] = None, allow_empty: bool = False) -> Optional[str]:
+    # Prefer OS env (.env); fall back to Streamlit secrets; else default. An empty value
+    # counts as unset unless allow_empty, for settings where "" switches a feature off.
+    unset = (None,) if allow_empty else (None, "")
+    v = os.environ.get(key)
+    if v not in unset:
         return v
     s = _get_secret_or_none(key)
-    return s if s not in (None, "") else default
+    return s if s not in unset else default
 
 class Settings(BaseModel):
     OPENAI_API_KEY: Optional[str] = getenv("OPENAI_API_KEY")
     EMBEDDINGS_PROVIDER: str = getenv("EMBEDDINGS_PROVIDER", "st")
     EMBEDDINGS_MODEL: str = getenv("EMBEDDINGS_MODEL", "all-MiniLM-L6-v2")
     GEN_MODEL: str = getenv("GEN_MODEL", "gpt-4o-mini")
+    # OpenAI-compatible endpoint for chat completions (unset = api.openai.com)
+    OPENAI_BASE_URL: Optional[str] = getenv("OPENAI_BASE_URL")
+    # Shared OpenAI client: request timeout (s), retries on 429/5xx/connection errors,
+    # parallel embedding requests, rate limits (0 = unlimited) and tokens per embeddings request
+    OPENAI_TIMEOUT: float = float(getenv("OPENAI_TIMEOUT", "60"))
+    OPENAI_MAX_RETRIES: int = int(getenv("OPENAI_MAX_RETRIES", "5"))
+    OPENAI_MAX_CONCURRENCY: int = int(getenv("OPENAI_MAX_CONCURRENCY", "4"))
+    OPENAI_REQUESTS_PER_MINUTE: float = float(getenv("OPENAI_REQUESTS_PER_MINUTE", "0"))
+    OPENAI_TOKENS_PER_MINUTE: float = float(getenv("OPENAI_TOKENS_PER_MINUTE", "0"))
+    OPENAI_EMBED_BATCH_TOKENS: int = int(getenv("OPENAI_EMBED_BATCH_TOKENS", "20000"))
     ST_MODEL: str = getenv("ST_MODEL", "all-MiniLM-L6-v2")
     USE_LLM: bool = str(getenv("USE_LLM", "false")).lower() == "true"
     USE_DENSE: bool = str(getenv("USE_DENSE", "false")).lower() in {"1", "true", "yes"}
     TOP_K: int = int(getenv("TOP_K", "6"))
     MIN_RELEVANCE_SCORE: float = float(getenv("MIN_RELEVANCE_SCORE", "0.05"))
+    # How dense and BM25 candidates are combined (src/retrieval/fusion.py):
+    # weighted (min-max scores) | rrf (reciprocal rank, constant FUSION_RRF_K) | zscore
+    FUSION_METHOD: str = Field(getenv("FUSION_METHOD", "weighted"), validate_default=True)
+    FUSION_RRF_K: int = int(getenv("FUSION_RRF_K", "60"))
+    # Share of the fused score from dense retrieval (the rest is BM25) when USE_DENSE is on
+    FUSION_DENSE_WEIGHT: float = float(getenv("FUSION_DENSE_WEIGHT", "0.6"))
+    # Answers keep every hit of the top policy plus other hits scoring at least
+    # max(FOCUS_MIN_SCORE, FOCUS_RELATIVE_SCORE * top score)
+    FOCUS_MIN_SCORE: float = float(getenv("FOCUS_MIN_SCORE", "0.35"))
+    FOCUS_RELATIVE_SCORE: float = float(getenv("FOCUS_RELATIVE_SCORE", "0.65"))
     DATABASE_URL: Optional[str] = getenv("DATABASE_URL")
+    # Dense ANN index: auto | flat | ivf | faiss-hnsw | faiss-ivf
+    # (auto = flat below ANN_MIN_VECTORS, FAISS HNSW when installed, NumPy IVF otherwise)
+    ANN_BACKEND: str = getenv("ANN_BACKEND", "auto")
+    ANN_MIN_VECTORS: int = int(getenv("ANN_MIN_VECTORS", "20000"))
+    ANN_NLIST: int = int(getenv("ANN_NLIST", "0"))  # 0 = 4 * sqrt(vector count)
+    ANN_NPROBE: int = int(getenv("ANN_NPROBE", "16"))
+    ANN_HNSW_M: int = int(getenv("ANN_HNSW_M", "32"))
+    ANN_EF_SEARCH: int = int(getenv("ANN_EF_SEARCH", "128"))
+    # Coarse-scan copy written by build_index: float32 (none) | float16 | int8
+    VECTOR_STORAGE: str = getenv("VECTOR_STORAGE", "float32")
+    # Chunks embedded and checkpointed per step of build_index
+    INDEX_BATCH_SIZE: int = int(getenv("INDEX_BATCH_SIZE", "512"))
+    # Shards written by build_index (1 = one unsharded index) and how chunks are split:
+    # hash (of the chunk id, even sizes) | policy_id (each policy whole in one shard)
+    INDEX_SHARDS: int = int(getenv("INDEX_SHARDS", "1"))
+    INDEX_SHARD_BY: str = getenv("INDEX_SHARD_BY", "hash")
+    # Threads searching shards concurrently; 0 = one per shard, capped at the CPU count
+    SEARCH_SHARD_WORKERS: int = int(getenv("SEARCH_SHARD_WORKERS", "0"))
+    # Published index versions kept on disk, and how often (seconds) running processes
+    # check for a newer one; 0 checks on every query, a negative value never checks
+    INDEX_KEEP_VERSIONS: int = int(getenv("INDEX_KEEP_VERSIONS", "3"))
+    INDEX_RELOAD_INTERVAL: float = float(getenv("INDEX_RELOAD_INTERVAL", "5"))
+    # Query embedding cache: in-process LRU entries plus a shared SQLite file ("" disables it)
+    QUERY_EMBED_CACHE_SIZE: int = int(getenv("QUERY_EMBED_CACHE_SIZE", "1024"))
+    QUERY_EMBED_CACHE_PATH: str = getenv(
+        "QUERY_EMBED_CACHE_PATH", "data/cache/query_embeddings.sqlite", allow_empty=True
+    )
+    # Search/answer result cache: LRU entries, TTL in seconds (0 = no expiry), a shared
+    # SQLite file ("" keeps it in-process only) and the most rows kept in it (0 = no cap)
+    RESULT_CACHE_SIZE: int = int(getenv("RESULT_CACHE_SIZE", "2048"))
+    RESULT_CACHE_TTL: float = float(getenv("RESULT_CACHE_TTL", "3600"))
+    RESULT_CACHE_PATH: str = getenv(
+        "RESULT_CACHE_PATH", "data/cache/results.sqlite", allow_empty=True
+    )
+    RESULT_CACHE_DISK_SIZE: int = int(getenv("RESULT_CACHE_DISK_SIZE", "100000"))
+    # Semantic answer cache: a paraphrase whose query embedding has at least this cosine
+    # similarity to an answered question (same index, same cited chunks) reuses its answer.
+    # SEMANTIC_CACHE_STYLES is a comma-separated list of answer styles ("" disables it).
+    SEMANTIC_CACHE_STYLES: str = getenv("SEMANTIC_CACHE_STYLES", "llm", allow_empty=True)
+    SEMANTIC_CACHE_SIZE: int = int(getenv("SEMANTIC_CACHE_SIZE", "512"))
+    SEMANTIC_CACHE_THRESHOLD: float = float(getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    # HTTP query service (python -m src.api.server): bind address, threads running
+    # searches and answers, and requests allowed to wait for a thread before 503s
+    API_HOST: str = getenv("API_HOST", "127.0.0.1")
+    API_PORT: int = int(getenv("API_PORT", "8080"))
+    API_WORKERS: int = int(getenv("API_WORKERS", "4"))
+    API_MAX_PENDING: int = int(getenv("API_MAX_PENDING", "64"))
+    # Per-stage timings and counters (src/core/metrics.py, served at /metrics by the API);
+    # METRICS_LOG also logs one JSON line per finished search, answer, index load or build
+    METRICS_ENABLED: bool = str(getenv("METRICS_ENABLED", "false")).lower() in {"1", "true", "yes"}
+    METRICS_LOG: bool = str(getenv("METRICS_LOG", "false")).lower() in {"1", "true", "yes"}
+    # Slow-query profiler (src/core/profiler.py): stack-sample searches and answers and keep
+    # those slower than PROFILE_SLOW_MS (0 = off); PROFILE_SAMPLE_RATE of all calls are
+    # cProfiled instead. The newest PROFILE_MAX_FILES captures are kept in PROFILE_DIR.
+    PROFILE_SLOW_MS: float = float(getenv("PROFILE_SLOW_MS", "0"))
+    PROFILE_SAMPLE_RATE: float = float(getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_INTERVAL_MS: float = float(getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_DIR: str = getenv("PROFILE_DIR", "data/profiles")
+    PROFILE_MAX_FILES: int = int(getenv("PROFILE_MAX_FILES", "50"))
+
+    @field_validator("FUSION_METHOD")
+    @classmethod
+    def _known_fusion_method(cls, value: str) -> str:
+        # Case-insensitive like ANN_BACKEND and VECTOR_STORAGE; an unknown method fails
+        # when settings load instead of on every search
+        value = value.strip().lower()
+        if value not in FUSION_METHODS:
+            raise ValueError(f"FUSION_METHOD must be one of {FUSION_METHODS}, not {value!r}")
+        return value
 
 settings = Settings()
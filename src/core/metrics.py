@@ -0,0 +1,202 @@
+"""Per-stage latency histograms and counters for searches, answers and index builds.
+
+Nothing is recorded unless ``METRICS_ENABLED`` is set: ``span`` then hands back a shared
+no-op context manager and ``incr`` returns immediately. When enabled, every ``span``
+adds its wall time to the ``hr_policy_stage_seconds`` histogram under its stage name
+and ``incr`` bumps a labelled counter. ``render_prometheus`` returns a snapshot in the
+Prometheus text format (the API serves it at ``/metrics``). With ``METRICS_LOG`` each
+finished top-level span is also logged as one JSON line with the time spent in every
+nested stage and the counters bumped meanwhile. ``collect_stages`` gathers the stage
+times of one call on the current thread even while metrics are disabled.
+"""
+
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Tuple
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "hr_policy"
+# Upper bounds (seconds) of the stage histogram buckets; +Inf is implicit.
+BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 120.0,
+)  # fmt: skip
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_stages: Dict[str, List[float]] = {}  # bucket counts followed by sum and count
+_counters: Dict[Tuple[str, Labels], float] = {}
+_local = threading.local()
+_DISABLED = nullcontext()
+
+
+class _Trace:
+    """Stage times and counters of the spans running on this thread."""
+
+    __slots__ = ("stages", "counters", "depth")
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+        self.depth = 0
+
+
+class _Span:
+    __slots__ = ("name", "start", "trace", "owner")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        trace = getattr(_local, "trace", None)
+        self.owner = trace is None
+        if self.owner:
+            trace = _local.trace = _Trace()
+        self.trace = trace
+        trace.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        seconds = time.perf_counter() - self.start
+        observe(self.name, seconds)
+        trace = self.trace
+        trace.depth -= 1
+        trace.stages[self.name] = trace.stages.get(self.name, 0.0) + seconds
+        if self.owner:
+            _local.trace = None
+        if trace.depth == 0 and settings.METRICS_ENABLED and settings.METRICS_LOG:
+            record = {
+                "span": self.name,
+                "ms": round(seconds * 1000, 3),
+                "stages": {
+                    name: round(value * 1000, 3)
+                    for name, value in trace.stages.items()
+                    if name != self.name
+                },
+                "counters": trace.counters,
+                "error": exc_info[0].__name__ if exc_info[0] is not None else None,
+            }
+            logger.info(json.dumps(record, sort_keys=True))
+
+
+def span(name: str):
+    """Context manager timing one stage, e.g. ``with span("search.bm25"): ...``."""
+    if not settings.METRICS_ENABLED and getattr(_local, "trace", None) is None:
+        return _DISABLED
+    return _Span(name)
+
+
+@contextmanager
+def collect_stages() -> Iterator[Dict[str, float]]:
+    """Seconds per stage name of the spans run inside the block on this thread."""
+    trace = getattr(_local, "trace", None)
+    if trace is not None:  # already inside a span or another collection
+        yield trace.stages
+        return
+    trace = _local.trace = _Trace()
+    try:
+        yield trace.stages
+    finally:
+        _local.trace = None
+
+
+def observe(stage: str, seconds: float) -> None:
+    """Record a stage duration measured outside ``span`` (e.g. across a generator's yields)."""
+    if not settings.METRICS_ENABLED:
+        return
+    with _lock:
+        histogram = _stages.get(stage)
+        if histogram is None:
+            histogram = _stages[stage] = [0.0] * (len(BUCKETS) + 3)
+        histogram[bisect_left(BUCKETS, seconds)] += 1
+        histogram[-2] += seconds
+        histogram[-1] += 1
+
+
+def incr(name: str, value: float = 1, **labels: Any) -> None:
+    """Add ``value`` to the counter ``hr_policy_<name>_total{labels}``."""
+    if not settings.METRICS_ENABLED:
+        return
+    key = (name, tuple(sorted((label, str(v)) for label, v in labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        field = ".".join([name, *(v for _, v in key[1])])
+        trace.counters[field] = trace.counters.get(field, 0) + value
+
+
+def snapshot() -> Dict[str, Any]:
+    """Counters and per-stage count/sum (seconds) as plain dicts."""
+    with _lock:
+        stages = {
+            stage: {"count": int(values[-1]), "sum": values[-2]}
+            for stage, values in _stages.items()
+        }
+        counters = {
+            name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else ""): value
+            for (name, labels), value in _counters.items()
+        }
+    return {"stages": stages, "counters": counters}
+
+
+def reset_metrics() -> None:
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus() -> str:
+    """Snapshot of every histogram and counter in the Prometheus text format (0.0.4)."""
+    with _lock:
+        stages = {stage: list(values) for stage, values in _stages.items()}
+        counters = dict(_counters)
+
+    histogram = f"{PREFIX}_stage_seconds"
+    lines = [
+        f"# HELP {histogram} Wall time of each pipeline stage.",
+        f"# TYPE {histogram} histogram",
+    ]
+    for stage in sorted(stages):
+        values = stages[stage]
+        cumulative = 0.0
+        for bound, count in zip((*BUCKETS, float("inf")), values):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(
+                f"{histogram}_bucket{_labels((('stage', stage), ('le', le)))} "
+                f"{_number(cumulative)}"
+            )
+        lines.append(f"{histogram}_sum{_labels((('stage', stage),))} {repr(values[-2])}")
+        lines.append(f"{histogram}_count{_labels((('stage', stage),))} {_number(values[-1])}")
+
+    for name in sorted({name for name, _ in counters}):
+        metric = f"{PREFIX}_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for (counter, labels), value in sorted(counters.items()):
+            if counter == name:
+                lines.append(f"{metric}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,190 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, TypeVar
+
+import numpy as np
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+T = TypeVar("T")
+
+EMBED_MAX_INPUTS = 2048  # OpenAI limit on inputs per embeddings request
+CHAT_COMPLETION_TOKENS = 1024  # completion budget charged to the limiter per chat call
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) used for batching and limits."""
+    return len(text) // 4 + 1
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, shared by every thread.
+
+    Each bucket refills continuously at its per-minute rate; ``acquire`` blocks until
+    both buckets cover the call. A rate of 0 disables that bucket.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rates = (float(requests_per_minute), float(tokens_per_minute))
+        self.levels = list(self.rates)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed, self._updated = now - self._updated, now
+        for bucket, rate in enumerate(self.rates):
+            self.levels[bucket] = min(rate, self.levels[bucket] + elapsed * rate / 60)
+
+    def acquire(self, tokens: int = 0) -> None:
+        # Waiting while holding the lock queues callers in arrival order.
+        with self._lock:
+            while True:
+                self._refill()
+                wait = 0.0
+                needs = (1.0, float(tokens))
+                for bucket, rate in enumerate(self.rates):
+                    need = min(needs[bucket], rate)
+                    if rate > 0 and self.levels[bucket] < need:
+                        wait = max(wait, (need - self.levels[bucket]) * 60 / rate)
+                if wait <= 0:
+                    for bucket, rate in enumerate(self.rates):
+                        if rate > 0:
+                            self.levels[bucket] -= min(needs[bucket], rate)
+                    return
+                self._sleep(wait)
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _retryable(exc: Exception) -> bool:
+    import openai
+
+    if isinstance(exc, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+def with_retries(call: Callable[[], T], sleep: Callable[[float], None] = time.sleep) -> T:
+    """Run ``call``, retrying rate-limit, connection and 5xx errors with full-jitter backoff.
+
+    A ``Retry-After`` header from the server sets the minimum wait.
+    """
+    attempt = 0
+    while True:
+        try:
+            return call()
+        except Exception as exc:
+            if attempt >= settings.OPENAI_MAX_RETRIES or not _retryable(exc):
+                raise
+            delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt))
+            delay = max(delay, _retry_after(exc) or 0.0)
+            logger.info("OpenAI request failed (%s); retry %d in %.2fs", exc, attempt + 1, delay)
+            sleep(delay)
+            attempt += 1
+
+
+@lru_cache(maxsize=4)
+def _client(api_key: str, base_url: Optional[str]):
+    from openai import OpenAI
+
+    # Retries are handled by with_retries; every attempt takes rate limiter tokens.
+    return OpenAI(
+        api_key=api_key, base_url=base_url, max_retries=0, timeout=settings.OPENAI_TIMEOUT
+    )
+
+
+def get_openai_client():
+    """Process-wide client; reusing it keeps pooled keep-alive connections and TLS sessions."""
+    if not settings.OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY is not configured")
+    return _client(settings.OPENAI_API_KEY, settings.OPENAI_BASE_URL)
+
+
+@lru_cache(maxsize=1)
+def get_rate_limiter() -> RateLimiter:
+    return RateLimiter(settings.OPENAI_REQUESTS_PER_MINUTE, settings.OPENAI_TOKENS_PER_MINUTE)
+
+
+def token_batches(
+    texts: Sequence[str], max_tokens: int, max_items: int = EMBED_MAX_INPUTS
+) -> List[List[int]]:
+    """Split positions of ``texts`` into ordered batches within a token and item budget."""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for position, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (used + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], 0
+        current.append(position)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def create_embeddings(texts: List[str], model: str) -> np.ndarray:
+    """Embed ``texts`` in token-budgeted batches sent concurrently; rows keep input order."""
+    client = get_openai_client()
+    limiter = get_rate_limiter()
+    batches = token_batches(texts, settings.OPENAI_EMBED_BATCH_TOKENS)
+
+    def embed(batch: List[int]) -> List[List[float]]:
+        inputs = [texts[position] for position in batch]
+        tokens = sum(estimate_tokens(text) for text in inputs)
+
+        def attempt():
+            limiter.acquire(tokens)
+            return client.embeddings.create(model=model, input=inputs)
+
+        response = with_retries(attempt)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    workers = max(1, min(settings.OPENAI_MAX_CONCURRENCY, len(batches)))
+    if workers == 1:
+        results = [embed(batch) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(embed, batches))
+    return np.array([vector for result in results for vector in result], dtype=np.float32)
+
+
+def create_chat_completion(messages: List[Dict], **kwargs):
+    """``chat.completions.create`` through the shared client, limiter and retry policy.
+
+    With ``stream=True`` only opening the stream is retried; a failure while reading it
+    is left to the caller. Every attempt, retries included, is charged to the rate limiter.
+    """
+    prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in messages)
+    limiter = get_rate_limiter()
+    client = get_openai_client()
+
+    def attempt():
+        limiter.acquire(prompt_tokens + CHAT_COMPLETION_TOKENS)
+        return client.chat.completions.create(messages=messages, **kwargs)
+
+    return with_retries(attempt)
@@ -0,0 +1,298 @@
+"""Opt-in profiles of slow or randomly sampled searches and answers.
+
+With ``PROFILE_SLOW_MS`` > 0, every ``hybrid_search``/``generate_answer`` call is
+watched by a background thread that samples its stack every ``PROFILE_INTERVAL_MS``;
+calls that end up slower than the threshold are saved as collapsed stacks (one
+``frame;frame;frame count`` line per stack, readable by flamegraph.pl and speedscope).
+A ``PROFILE_SAMPLE_RATE`` share of calls is instead run under cProfile and always saved
+as ``.pstats``. Each capture also records the query, index version and stage timings in
+a JSON file next to the profile. Only the newest ``PROFILE_MAX_FILES`` captures are kept
+in ``PROFILE_DIR``.
+
+    python -m src.core.profiler list
+    python -m src.core.profiler show <capture id>
+    python -m src.core.profiler summary
+"""
+
+import argparse
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import nullcontext
+from pathlib import Path
+from types import FrameType
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.core.config import settings
+from src.core.metrics import collect_stages
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parents[2]
+MAX_QUERY_CHARS = 500
+_DISABLED = nullcontext()
+
+
+def profile_dir() -> Path:
+    path = Path(settings.PROFILE_DIR)
+    return path if path.is_absolute() else ROOT / path
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler:
+    """One daemon thread sampling the stacks of the threads currently being watched."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._watched: Dict[int, Tuple[FrameType, Counter]] = {}  # thread id -> (entry, stacks)
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, entry: FrameType) -> Counter:
+        stacks: Counter = Counter()
+        with self._lock:
+            self._watched[threading.get_ident()] = (entry, stacks)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="query-profiler", daemon=True
+                )
+                self._thread.start()
+        self._wakeup.set()
+        return stacks
+
+    def unwatch(self) -> None:
+        with self._lock:
+            self._watched.pop(threading.get_ident(), None)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            time.sleep(max(settings.PROFILE_INTERVAL_MS, 0.1) / 1000)
+            with self._lock:
+                if not self._watched:
+                    self._wakeup.clear()
+                    continue
+                frames = sys._current_frames()
+                for thread_id, (entry, stacks) in self._watched.items():
+                    frame = frames.get(thread_id)
+                    labels: List[str] = []
+                    while frame is not None:
+                        labels.append(_frame_label(frame))
+                        if frame is entry:
+                            break
+                        frame = frame.f_back
+                    if labels:
+                        stacks[";".join(reversed(labels))] += 1
+
+
+_sampler = _StackSampler()
+
+
+class _Capture:
+    """Profiles one call and saves it when it was slow or picked by the random sample."""
+
+    def __init__(self, kind: str, query: str, entry: FrameType):
+        self.kind = kind
+        self.query = query
+        self.entry = entry
+
+    def __enter__(self) -> "_Capture":
+        self.slow_ms = settings.PROFILE_SLOW_MS
+        self.sampled = random.random() < settings.PROFILE_SAMPLE_RATE
+        self.profile: Optional[cProfile.Profile] = None
+        self.stacks: Optional[Counter] = None
+        if self.sampled:
+            self.profile = cProfile.Profile()
+            try:
+                self.profile.enable()
+            except ValueError:  # another profiler is already running on this thread
+                self.profile, self.sampled = None, False
+        if self.profile is None and self.slow_ms > 0:  # stacks are only kept for slow calls
+            self.stacks = _sampler.watch(self.entry)
+        self._stages = collect_stages()
+        self.stages = self._stages.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        seconds = time.perf_counter() - self.start
+        self._stages.__exit__(None, None, None)
+        if self.profile is not None:
+            self.profile.disable()
+        elif self.stacks is not None:
+            _sampler.unwatch()
+        if self.sampled or (self.slow_ms > 0 and seconds * 1000 >= self.slow_ms):
+            try:
+                save_capture(self, seconds)
+            except OSError as exc:
+                logger.warning("Could not save query profile: %s", exc)
+
+
+def profile_call(kind: str, query: str):
+    """Context manager profiling one ``kind`` ("search"/"answer") call for ``query``."""
+    if settings.PROFILE_SLOW_MS <= 0 and settings.PROFILE_SAMPLE_RATE <= 0:
+        return _DISABLED
+    return _Capture(kind, query, sys._getframe(1))
+
+
+def _index_version() -> Dict[str, Optional[str]]:
+    from src.retrieval.search import loaded_index
+
+    generation = loaded_index()
+    if generation is None:
+        return {"version": None, "fingerprint": None}
+    return {"version": generation.version or "legacy", "fingerprint": generation.fingerprint}
+
+
+def save_capture(capture: _Capture, seconds: float) -> Path:
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    capture_id = (
+        f"{time.strftime('%Y%m%d-%H%M%S')}-{capture.kind}-{int(seconds * 1000)}ms-"
+        f"{uuid.uuid4().hex[:6]}"
+    )
+    if capture.profile is not None:
+        profile_name = f"{capture_id}.pstats"
+        capture.profile.dump_stats(str(directory / profile_name))
+    else:
+        profile_name = f"{capture_id}.collapsed"
+        lines = "".join(f"{stack} {count}\n" for stack, count in capture.stacks.items())
+        (directory / profile_name).write_text(lines, encoding="utf-8")
+    record = {
+        "id": capture_id,
+        "kind": capture.kind,
+        "query": capture.query[:MAX_QUERY_CHARS],
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "duration_ms": round(seconds * 1000, 3),
+        "trigger": "sample" if capture.sampled else "slow",
+        "index": _index_version(),
+        "stages_ms": {name: round(value * 1000, 3) for name, value in capture.stages.items()},
+        "profile": profile_name,
+        "format": "pstats" if capture.profile is not None else "collapsed",
+    }
+    path = directory / f"{capture_id}.json"
+    path.write_text(json.dumps(record, indent=2, ensure_ascii=False), encoding="utf-8")
+    _rotate(directory, settings.PROFILE_MAX_FILES)
+    return path
+
+
+def _rotate(directory: Path, keep: int) -> None:
+    """Delete all but the ``keep`` newest captures (JSON record plus profile file)."""
+    records = sorted(directory.glob("*.json"), key=lambda path: path.stat().st_mtime)
+    for path in records[: max(0, len(records) - keep)]:
+        for stale in directory.glob(f"{path.stem}.*"):
+            stale.unlink(missing_ok=True)
+
+
+def load_captures(directory: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """Capture records, newest first."""
+    directory = directory or profile_dir()
+    records = []
+    for path in sorted(directory.glob("*.json"), key=lambda path: -path.stat().st_mtime):
+        try:
+            records.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, json.JSONDecodeError):
+            continue
+    return records
+
+
+def hot_frames(collapsed: str, limit: int = 10) -> List[Tuple[str, int, int]]:
+    """(frame, self samples, total samples) of the frames in the most samples."""
+    own: Counter = Counter()
+    total: Counter = Counter()
+    for line in collapsed.splitlines():
+        stack, _, count = line.rpartition(" ")
+        if not stack:
+            continue
+        frames = stack.split(";")
+        own[frames[-1]] += int(count)
+        for frame in set(frames):
+            total[frame] += int(count)
+    return [(frame, own[frame], samples) for frame, samples in total.most_common(limit)]
+
+
+def describe(record: Dict[str, Any], directory: Optional[Path] = None, limit: int = 15) -> str:
+    directory = directory or profile_dir()
+    lines = [
+        f"{record['id']}: {record['kind']} took {record['duration_ms']:.1f} ms "
+        f"({record['trigger']}) on index {record['index']['version']}",
+        f"query: {record['query']}",
+        "stages (ms):",
+    ]
+    for name, ms in sorted(record["stages_ms"].items(), key=lambda item: -item[1]):
+        lines.append(f"  {ms:>10.3f}  {name}")
+    path = directory / record["profile"]
+    if record["format"] == "pstats":
+        out = io.StringIO()
+        pstats.Stats(str(path), stream=out).sort_stats("cumulative").print_stats(limit)
+        lines.append(out.getvalue().rstrip())
+    else:
+        lines.append("hottest frames (self / total samples):")
+        for frame, own, total in hot_frames(path.read_text(encoding="utf-8"), limit):
+            lines.append(f"  {own:>6} {total:>6}  {frame}")
+    return "\n".join(lines)
+
+
+def summarize(records: Sequence[Dict[str, Any]]) -> str:
+    if not records:
+        return "No captured profiles."
+    lines = []
+    for kind in sorted({record["kind"] for record in records}):
+        durations = sorted(r["duration_ms"] for r in records if r["kind"] == kind)
+        lines.append(
+            f"{kind}: {len(durations)} captures, median {durations[len(durations) // 2]:.1f} ms, "
+            f"max {durations[-1]:.1f} ms"
+        )
+    stage_totals: Counter = Counter()
+    for record in records:
+        stage_totals.update(record["stages_ms"])
+    if stage_totals:
+        lines.append("time by stage across captures (ms):")
+        for name, ms in stage_totals.most_common(10):
+            lines.append(f"  {ms:>10.1f}  {name}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect captured slow-query profiles")
+    parser.add_argument("--dir", type=Path, help=f"Capture directory (default {profile_dir()})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="One line per capture, newest first")
+    show = commands.add_parser("show", help="Stage timings and hottest functions of one capture")
+    show.add_argument("id", help="Capture id, or a unique prefix of one")
+    show.add_argument("--limit", type=int, default=15)
+    commands.add_parser("summary", help="Durations and time per stage across all captures")
+    args = parser.parse_args()
+
+    directory = args.dir or profile_dir()
+    records = load_captures(directory)
+    if args.command == "list":
+        for record in records:
+            print(
+                f"{record['id']}  {record['duration_ms']:>9.1f} ms  {record['trigger']:<6}  "
+                f"{record['index']['version']}  {record['query'][:60]}"
+            )
+    elif args.command == "show":
+        matches = [record for record in records if record["id"].startswith(args.id)]
+        if len(matches) != 1:
+            parser.error(f"{len(matches)} captures match {args.id!r}")
+        print(describe(matches[0], directory, args.limit))
+    else:
+        print(summarize(records))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from src.core.config import settings
+
+ROOT = Path(__file__).resolve().parents[2]
+_PURGE_EVERY = 256  # writes between sweeps of expired and surplus rows on disk
+
+
+def result_key(*parts: Any) -> str:
+    """Stable cache key for JSON-serializable parts (queries, settings, hits, ...)."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Bounded LRU/TTL cache of search hits and rendered answers.
+
+    Values are stored as JSON, so every hit hands back a fresh copy. The optional
+    SQLite tier is shared by all workers on the host and survives restarts. Callers put
+    the index fingerprint in the key, so results from an older index version are never
+    returned and simply age out. The SQLite tier keeps at most ``max_disk_entries`` rows
+    (0 = unlimited), dropping the least recently written ones.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        path: Optional[Path],
+        max_disk_entries: int = 0,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self.path is not None
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, expires REAL NOT NULL, value TEXT NOT NULL)"
+            )
+        return self._connection
+
+    def _expires(self) -> float:
+        return time.time() + self.ttl_seconds if self.ttl_seconds > 0 else 0.0
+
+    @staticmethod
+    def _live(expires: float, now: float) -> bool:
+        return not expires or expires > now
+
+    def _remember(self, key: str, expires: float, payload: str) -> None:
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = (expires, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._live(entry[0], now):
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(entry[1])
+            self._memory.pop(key, None)
+
+            db = self._db()
+            row = None
+            if db is not None:
+                row = db.execute("SELECT expires, value FROM results WHERE key = ?", (key,))
+                row = row.fetchone()
+            if row is None or not self._live(row[0], now):
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, row[0], row[1])
+            return json.loads(row[1])
+
+    def put(self, key: str, value: Any) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        expires = self._expires()
+        with self._lock:
+            self._remember(key, expires, payload)
+            db = self._db()
+            if db is None:
+                return
+            self._writes += 1
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (key, expires, payload)
+                )
+                if self._writes % _PURGE_EVERY == 0:
+                    self._purge(db)
+
+    def _purge(self, db: sqlite3.Connection) -> None:
+        """Drop expired rows, then the oldest rows beyond ``max_disk_entries``.
+
+        INSERT OR REPLACE gives a rewritten key a fresh rowid, so rowid order is write order.
+        """
+        db.execute("DELETE FROM results WHERE expires > 0 AND expires <= ?", (time.time(),))
+        if self.max_disk_entries > 0:
+            db.execute(
+                "DELETE FROM results WHERE rowid <= "
+                "(SELECT rowid FROM results ORDER BY rowid DESC LIMIT 1 OFFSET ?)",
+                (self.max_disk_entries,),
+            )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+        }
+
+    def clear(self) -> None:
+        """Forget every cached result, on disk too, and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            db = self._db()
+            if db is not None:
+                with db:
+                    db.execute("DELETE FROM results")
+            self.memory_hits = self.disk_hits = self.misses = 0
+
+
+@lru_cache(maxsize=1)
+def get_result_cache() -> ResultCache:
+    path = settings.RESULT_CACHE_PATH
+    resolved = None
+    if path:
+        resolved = Path(path) if Path(path).is_absolute() else ROOT / path
+    return ResultCache(
+        settings.RESULT_CACHE_SIZE,
+        settings.RESULT_CACHE_TTL,
+        resolved,
+        settings.RESULT_CACHE_DISK_SIZE,
+    )
@@ -2,9 +2,15 @@ import argparse
 import hashlib
 import json
 import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Iterator, Tuple
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
 
+MANIFEST_NAME = "manifest.json"
+DELTA_NAME = "delta.json"
+MANIFEST_VERSION = 1
 HEADING_RE = re.compile(r"^#{1,6}\s+(.+?)\s*$", re.MULTILINE)
 LINK_RE = re.compile(r"\[([^]]+)]\([^)]+\)")
 
@@ -59,37 +65,218 @@ def chunk_text(text: str, max_chars: int = 900) -> Iterator[str]:
         yield current
 
 
-def ingest(input_dir: Path, output_dir: Path, region: str, effective_from: str) -> int:
+def file_records(
+    policy_id: str, file_name: str, content: str, region: str, effective_from: str
+) -> List[str]:
+    """Section and chunk one policy file into serialized corpus.jsonl lines."""
+    lines = []
+    for section_number, (section_title, section_text) in enumerate(
+        iter_sections(content, policy_id.replace("_", " ").title())
+    ):
+        for chunk_number, chunk in enumerate(chunk_text(section_text)):
+            if len(chunk) < 40:
+                continue
+            section_id = f"sec-{section_number:02d}-{chunk_number:02d}"
+            record = {
+                "id": hashlib.sha256(
+                    f"{policy_id}:{section_title}:{chunk_number}:{chunk}".encode("utf-8")
+                ).hexdigest(),
+                "policy_id": policy_id,
+                "section": section_title,
+                "text": chunk,
+                "region": region,
+                "effective_from": effective_from,
+                "source": f"file://{file_name}#{section_id}",
+            }
+            lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+    return lines
+
+
+def _load_manifest(output_dir: Path, region: str, effective_from: str) -> Dict:
+    """Return the previous run's per-file manifest, or {} when it cannot be trusted."""
+    manifest_path = output_dir / MANIFEST_NAME
+    corpus_path = output_dir / "corpus.jsonl"
+    if not (manifest_path.exists() and corpus_path.exists()):
+        return {}
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if (
+        manifest.get("version") != MANIFEST_VERSION
+        or manifest.get("region") != region
+        or manifest.get("effective_from") != effective_from
+        or corpus_path.stat().st_size
+        != sum(entry["length"] for entry in manifest["files"].values())
+    ):
+        return {}
+    return manifest["files"]
+
+
+def _chunk_ids(lines: Iterable[str]) -> Dict[str, int]:
+    """Map chunk id to a hash of its serialized line, enough to tell updated records apart."""
+    return {json.loads(line)["id"]: hash(line) for line in lines}
+
+
+def _process_file(
+    path: Path, region: str, effective_from: str, known_sha256: Optional[str]
+) -> Tuple[str, Optional[List[str]]]:
+    """Hash and chunk one file; returns no lines when its content matches ``known_sha256``.
+
+    Runs in pool workers, so it only takes picklable arguments.
+    """
+    raw = path.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    if digest == known_sha256:
+        return digest, None
+    # Universal newlines, as read_text gives: headings are matched line by line
+    content = raw.decode("utf-8", errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+    return digest, file_records(path.stem, path.name, content, region, effective_from)
+
+
+class _Done:
+    """Already-computed stand-in for a pool future in serial mode."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+
+def ingest(
+    input_dir: Path,
+    output_dir: Path,
+    region: str,
+    effective_from: str,
+    full: bool = False,
+    workers: int = 1,
+) -> int:
+    """Write corpus.jsonl, re-chunking only policy files that changed since the last run.
+
+    manifest.json records each file's size, mtime, sha256 and its byte range in the
+    corpus; unchanged files are copied forward byte for byte. delta.json lists the
+    added, removed and updated chunk ids for downstream index updates, plus a
+    throughput report.
+
+    With ``workers > 1`` changed files are chunked in a process pool. Results are
+    written in sorted file order as they complete and at most ``workers * 2`` files are
+    in flight, so output is identical to serial mode and memory stays bounded.
+    """
+    started = time.perf_counter()
     output_dir.mkdir(parents=True, exist_ok=True)
     output_path = output_dir / "corpus.jsonl"
-    count = 0
-    with output_path.open("w", encoding="utf-8") as output:
-        for path in sorted(input_dir.iterdir()):
-            if path.suffix.lower() not in {".md", ".txt"}:
-                continue
-            policy_id = path.stem
-            content = path.read_text(encoding="utf-8", errors="replace")
-            for section_number, (section_title, section_text) in enumerate(
-                iter_sections(content, policy_id.replace("_", " ").title())
-            ):
-                for chunk_number, chunk in enumerate(chunk_text(section_text)):
-                    if len(chunk) < 40:
-                        continue
-                    section_id = f"sec-{section_number:02d}-{chunk_number:02d}"
-                    record = {
-                        "id": hashlib.sha256(
-                            f"{policy_id}:{section_title}:{chunk_number}:{chunk}".encode("utf-8")
-                        ).hexdigest(),
-                        "policy_id": policy_id,
-                        "section": section_title,
-                        "text": chunk,
-                        "region": region,
-                        "effective_from": effective_from,
-                        "source": f"file://{path.name}#{section_id}",
-                    }
-                    output.write(json.dumps(record, ensure_ascii=False) + "\n")
-                    count += 1
-    return count
+    temp_path = output_path.with_suffix(".jsonl.tmp")
+    previous = {} if full else _load_manifest(output_dir, region, effective_from)
+    old_corpus = output_path.open("rb") if output_path.exists() else None
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def old_bytes(entry: Dict) -> bytes:
+        old_corpus.seek(entry["offset"])
+        return old_corpus.read(entry["length"])
+
+    def old_ids(entry: Dict) -> Dict[str, int]:
+        return _chunk_ids(old_bytes(entry).decode("utf-8").splitlines(True))
+
+    files: Dict[str, Dict] = {}
+    changes = {"added": [], "changed": [], "deleted": [], "unchanged": 0}
+    before: Dict[str, int] = {}
+    after: Dict[str, int] = {}
+    if old_corpus and not previous:  # no usable manifest: diff against the whole old corpus
+        before = _chunk_ids(line.decode("utf-8") for line in old_corpus)
+    pending: Deque = deque()
+    totals = {"chunks": 0, "bytes": 0, "parsed": 0}
+
+    def write_next(output) -> None:
+        path, stat, entry, job = pending.popleft()
+        if job is None:
+            digest, lines = entry["sha256"], None
+        else:
+            digest, lines = job.result()
+        if lines is None:
+            data, line_count = old_bytes(entry), entry["line_count"]
+        else:
+            if entry:
+                changes["changed"].append(path.name)
+                before.update(old_ids(entry))
+            else:
+                changes["added"].append(path.name)
+            after.update(_chunk_ids(lines))
+            data, line_count = "".join(lines).encode("utf-8"), len(lines)
+            totals["parsed"] += 1
+        output.write(data)
+        files[path.name] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest,
+            "offset": totals["bytes"],
+            "length": len(data),
+            "line_count": line_count,
+        }
+        totals["bytes"] += len(data)
+        totals["chunks"] += line_count
+
+    try:
+        with temp_path.open("wb") as output:
+            for path in sorted(input_dir.iterdir()):
+                if path.suffix.lower() not in {".md", ".txt"}:
+                    continue
+                stat = path.stat()
+                entry = previous.get(path.name)
+                if entry and (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                    job = None
+                elif pool is None:
+                    job = _Done(
+                        _process_file(path, region, effective_from, entry and entry["sha256"])
+                    )
+                else:
+                    job = pool.submit(
+                        _process_file, path, region, effective_from, entry and entry["sha256"]
+                    )
+                pending.append((path, stat, entry, job))
+                while len(pending) > max(1, workers * 2):
+                    write_next(output)
+            while pending:
+                write_next(output)
+
+            for name, entry in previous.items():
+                if name not in files:
+                    changes["deleted"].append(name)
+                    before.update(old_ids(entry))
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if old_corpus:
+            old_corpus.close()
+    temp_path.replace(output_path)
+    changes["unchanged"] = len(files) - len(changes["added"]) - len(changes["changed"])
+
+    seconds = max(time.perf_counter() - started, 1e-9)
+    delta = {
+        "added": sorted(after.keys() - before.keys()),
+        "removed": sorted(before.keys() - after.keys()),
+        "updated": sorted(
+            chunk_id
+            for chunk_id in after.keys() & before.keys()
+            if after[chunk_id] != before[chunk_id]
+        ),
+        "files": changes,
+        "stats": {
+            "workers": workers,
+            "files": len(files),
+            "parsed_files": totals["parsed"],
+            "chunks": totals["chunks"],
+            "seconds": round(seconds, 3),
+            "files_per_second": round(len(files) / seconds, 1),
+            "chunks_per_second": round(totals["chunks"] / seconds, 1),
+        },
+    }
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "region": region,
+        "effective_from": effective_from,
+        "files": files,
+    }
+    (output_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    (output_dir / DELTA_NAME).write_text(json.dumps(delta, indent=2), encoding="utf-8")
+    return totals["chunks"]
 
 
 def main() -> None:
@@ -98,9 +285,29 @@ def main() -> None:
     parser.add_argument("--out", required=True, help="Output folder for processed JSONL")
     parser.add_argument("--region", default="GLOBAL")
     parser.add_argument("--effective-from", default="2025-01-01")
+    parser.add_argument(
+        "--full", action="store_true", help="Ignore the manifest and re-chunk every file"
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to chunk files")
     args = parser.parse_args()
-    count = ingest(Path(args.inp), Path(args.out), args.region, args.effective_from)
+    count = ingest(
+        Path(args.inp), Path(args.out), args.region, args.effective_from, args.full, args.workers
+    )
+    delta = json.loads((Path(args.out) / DELTA_NAME).read_text(encoding="utf-8"))
+    files = delta["files"]
     print(f"Processed {count} chunks into {Path(args.out) / 'corpus.jsonl'}")
+    print(
+        f"Files: {len(files['added'])} added, {len(files['changed'])} changed, "
+        f"{len(files['deleted'])} deleted, {files['unchanged']} unchanged; "
+        f"chunks: {len(delta['added'])} added, {len(delta['removed'])} removed, "
+        f"{len(delta['updated'])} updated"
+    )
+    stats = delta["stats"]
+    print(
+        f"Throughput: {stats['files_per_second']} files/s, {stats['chunks_per_second']} chunks/s "
+        f"({stats['parsed_files']} files chunked in {stats['seconds']}s, "
+        f"{stats['workers']} workers)"
+    )
 
 
 if __name__ == "__main__":
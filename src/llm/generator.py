@@ -1,45 +1,38 @@
+import logging
 import re
-from typing import Dict, List, Tuple
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
 
 from src.core.config import settings
+from src.core.metrics import incr, observe, span
+from src.core.profiler import profile_call
+from src.core.openai_client import create_chat_completion
+from src.core.result_cache import get_result_cache, result_key
+from src.llm.semantic_cache import Namespace, Sources, get_semantic_cache, semantic_styles
+from src.llm.sentences import segment, sentences
+from src.retrieval.embedding_cache import normalize_query
+from src.retrieval.embeddings import embed_queries, embedding_model
+from src.retrieval.search import index_fingerprint
 
-SYNTHETIC_NOTICE_RE = re.compile(
-    r"Disclaimer:\s*This is a synthetic document generated for a model training dataset\.\s*"
-    r"It is not a real policy and should not be used as such\.\s*",
-    re.IGNORECASE,
-)
-POLICY_HEADER_RE = re.compile(
-    r"^[A-Z][A-Za-z0-9 &()/,'-]+ Policy\s+Effective Date:\s*"
-    r"[A-Za-z]+\s+\d{1,2},\s+\d{4}\s+I\.\s+Policy Statement\s+",
-)
-SECTION_HEADING_RE = re.compile(
-    r"\s+[IVX]{1,5}\.\s+[A-Z][A-Za-z &/()'-]{2,40}?"
-    r"(?=\s+(?:The|This|Employees|All|Eligible|Any|There|Business|Non|An|A)\b)"
+logger = logging.getLogger(__name__)
+
+NO_MATCH_ANSWER = (
+    "### No matching policy found\n\n"
+    "I couldn't find reliable information for that question. Try using the policy name or "
+    "contact HR for clarification."
 )
-SECTION_MARKER_RE = re.compile(r"\s+[IVX]{1,5}\.\s+(?=[A-Z])")
+STREAM_PLACEHOLDER = "_Generating answer…_"
 
 
 def _policy_title(policy_id: str | None) -> str:
     return (policy_id or "HR policy").replace("_", " ").title()
 
 
-def _clean_text(text: str) -> str:
-    text = SYNTHETIC_NOTICE_RE.sub("", text or "")
-    text = POLICY_HEADER_RE.sub("", text)
-    text = text.replace("[Company Name]", "the company")
-    text = SECTION_HEADING_RE.sub(". ", text)
-    text = SECTION_MARKER_RE.sub(". ", text)
-    return re.sub(r"\s+", " ", text).strip()
-
-
-def _sentences(text: str) -> List[str]:
-    cleaned = _clean_text(text)
-    sentences = re.split(r"(?<=[.!?])\s+", cleaned)
-    return [
-        sentence.strip()[:1].upper() + sentence.strip()[1:]
-        for sentence in sentences
-        if sentence.strip()
-    ]
+def _segments(hit: Dict) -> Dict:
+    """Sentence segmentation stored with the index; computed here only for other hits."""
+    return hit.get("segments") or segment(hit.get("text", ""))
 
 
 def _focused_hits(hits: List[Dict]) -> List[Dict]:
@@ -48,7 +41,7 @@ def _focused_hits(hits: List[Dict]) -> List[Dict]:
         return []
     top_policy = hits[0].get("policy_id")
     top_score = float(hits[0].get("score", 0.0))
-    related_score = max(0.35, top_score * 0.65)
+    related_score = max(settings.FOCUS_MIN_SCORE, top_score * settings.FOCUS_RELATIVE_SCORE)
     focused = [
         hit
         for hit in hits
@@ -61,8 +54,7 @@ def _evidence(hits: List[Dict], max_sentences: int = 9) -> List[Tuple[str, str]]
     evidence: List[Tuple[str, str, bool]] = []
     seen = set()
     for source_number, hit in enumerate(hits, 1):
-        for sentence in _sentences(hit.get("text", "")):
-            is_complete = sentence.endswith((".", "!", "?"))
+        for sentence, is_complete in sentences(_segments(hit)):
             if evidence and not evidence[-1][2]:
                 previous, previous_source, _ = evidence.pop()
                 sentence = f"{previous.rstrip()} {sentence.lstrip()}"
@@ -113,17 +105,16 @@ def _offline_body(hits: List[Dict], style: str) -> str:
     return f"### Overview\n\n{summary}\n\n### Key policy details\n\n{bullets}"
 
 
-def _paragraph_llm_openai(query: str, hits: List[Dict]) -> str:
-    """Compose a detailed grounded answer with bracketed citations using OpenAI."""
-    from openai import OpenAI
-
+def _check_llm_enabled() -> None:
     if not settings.USE_LLM:
         raise RuntimeError("LLM generation is disabled")
     if not settings.OPENAI_API_KEY:
         raise RuntimeError("OPENAI_API_KEY is not configured")
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
+
+
+def _llm_messages(query: str, hits: List[Dict]) -> List[Dict]:
     sources = "\n".join(
-        f"{number}) {_clean_text(hit.get('text', ''))}" for number, hit in enumerate(hits, 1)
+        f"{number}) {_segments(hit)['clean']}" for number, hit in enumerate(hits, 1)
     )
     prompt = (
         "You are an HR policy assistant. Answer only from the supplied policy excerpts. "
@@ -132,33 +123,98 @@ def _paragraph_llm_openai(query: str, hits: List[Dict]) -> str:
         "Do not mention synthetic data, invent requirements, or include unrelated policies.\n\n"
         f"Question: {query}\n\nPolicy excerpts:\n{sources}"
     )
-    response = client.chat.completions.create(
-        model=settings.GEN_MODEL,
-        temperature=0.2,
-        messages=[{"role": "user", "content": prompt}],
+    return [{"role": "user", "content": prompt}]
+
+
+def _paragraph_llm_openai(query: str, hits: List[Dict]) -> str:
+    """Compose a detailed grounded answer with bracketed citations using OpenAI."""
+    _check_llm_enabled()
+    response = create_chat_completion(
+        _llm_messages(query, hits), model=settings.GEN_MODEL, temperature=0.2
     )
     return response.choices[0].message.content.strip()
 
 
-def generate_answer(query: str, hits: List[Dict], style: str = "bullets") -> str:
-    if not hits:
-        return (
-            "### No matching policy found\n\n"
-            "I couldn't find reliable information for that question. Try using the policy name or "
-            "contact HR for clarification."
-        )
+def _stream_llm_openai(query: str, hits: List[Dict]) -> Iterator[str]:
+    """Same answer as ``_paragraph_llm_openai``, yielded as content deltas as they arrive."""
+    _check_llm_enabled()
+    stream = create_chat_completion(
+        _llm_messages(query, hits), model=settings.GEN_MODEL, temperature=0.2, stream=True
+    )
+    finished = False
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        if chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+        finished = finished or chunk.choices[0].finish_reason is not None
+    if not finished:
+        raise RuntimeError("LLM stream ended before the answer was complete")
 
-    focused_hits = _focused_hits(hits)
-    title = _policy_title(focused_hits[0].get("policy_id"))
 
-    if style == "llm" and settings.USE_LLM:
-        try:
-            body = _paragraph_llm_openai(query, focused_hits)
-        except Exception:
-            body = _offline_body(focused_hits, "paragraph")
-    else:
-        body = _offline_body(focused_hits, style)
+def _semantic_key(query: str) -> Optional[Tuple[Namespace, np.ndarray]]:
+    """Namespace and unit query vector for the semantic cache, or None without embeddings."""
+    try:
+        vector = embed_queries([query])[0].astype(np.float32)
+        namespace = (index_fingerprint(), *embedding_model())
+    except Exception as exc:
+        logger.debug("Semantic answer cache unavailable: %s", exc)
+        return None
+    return namespace, vector / (np.linalg.norm(vector) + 1e-12)
+
+
+class _AnswerKeys(NamedTuple):
+    style: str
+    top_policy: Optional[str]
+    sources: Sources
+    exact: Optional[str]
+    semantic: Optional[Tuple[Namespace, np.ndarray]]
+
 
+def _cached_answer(
+    query: str, hits: List[Dict], focused_hits: List[Dict], style: str
+) -> Tuple[Optional[str], _AnswerKeys]:
+    """Look the answer up in the exact and semantic caches; also returns the keys to store."""
+    use_llm = style == "llm" and settings.USE_LLM
+    top_policy = focused_hits[0].get("policy_id")
+    sources = tuple(hit.get("id") for hit in focused_hits)
+    cache = get_result_cache()
+    exact = None
+    if cache.enabled:
+        # Offline answers depend only on the hits; LLM answers also on the question and model.
+        question = (normalize_query(query), settings.GEN_MODEL) if use_llm else None
+        focus = (settings.FOCUS_MIN_SCORE, settings.FOCUS_RELATIVE_SCORE)
+        exact = result_key("answer", style, hits, focus, question)
+        cached = cache.get(exact)
+        if cached is not None:
+            incr("result_cache", kind="answer", result="hit")
+            return cached, _AnswerKeys(style, top_policy, sources, None, None)
+        incr("result_cache", kind="answer", result="miss")
+
+    # LLM answers to paraphrases of an answered question reuse its answer when they would
+    # cite the same chunks, so a different filter or retrieval never serves other sources.
+    semantic = None
+    if use_llm and style in semantic_styles() and get_semantic_cache().max_entries > 0:
+        semantic = _semantic_key(query)
+    if semantic is not None:
+        answer = get_semantic_cache().lookup(semantic[0], style, sources, semantic[1])
+        incr("semantic_cache", result="miss" if answer is None else "hit")
+        if answer is not None:
+            if exact is not None:
+                cache.put(exact, answer)
+            return answer, _AnswerKeys(style, top_policy, sources, None, None)
+    return None, _AnswerKeys(style, top_policy, sources, exact, semantic)
+
+
+def _remember_answer(keys: _AnswerKeys, answer: str) -> None:
+    if keys.exact is not None:
+        get_result_cache().put(keys.exact, answer)
+    if keys.semantic is not None:
+        namespace, vector = keys.semantic
+        get_semantic_cache().store(namespace, keys.style, keys.sources, vector, answer)
+
+
+def _render(title: str, body: str, focused_hits: List[Dict]) -> str:
     return (
         f"## {title}\n\n"
         f"{body}\n\n"
@@ -166,3 +222,88 @@ def generate_answer(query: str, hits: List[Dict], style: str = "bullets") -> str
         "### Policy sources\n\n"
         f"{_sources_numbered(focused_hits)}"
     )
+
+
+def generate_answer(query: str, hits: List[Dict], style: str = "bullets") -> str:
+    if not hits:
+        return NO_MATCH_ANSWER
+    with profile_call("answer", query), span("answer"):
+        return _generate_answer(query, hits, style)
+
+
+def _generate_answer(query: str, hits: List[Dict], style: str) -> str:
+    focused_hits = _focused_hits(hits)
+    with span("answer.cache_lookup"):
+        answer, keys = _cached_answer(query, hits, focused_hits, style)
+    if answer is not None:
+        return answer
+    title = _policy_title(keys.top_policy)
+
+    cacheable = True
+    if style == "llm" and settings.USE_LLM:
+        try:
+            with span("answer.llm"):
+                body = _paragraph_llm_openai(query, focused_hits)
+        except Exception as exc:
+            incr("llm_fallbacks", error=type(exc).__name__)
+            with span("answer.offline"):
+                body = _offline_body(focused_hits, "paragraph")
+            cacheable = False  # retry the LLM next time
+    else:
+        with span("answer.offline"):
+            body = _offline_body(focused_hits, style)
+
+    with span("answer.render"):
+        answer = _render(title, body, focused_hits)
+    if cacheable:
+        _remember_answer(keys, answer)
+    return answer
+
+
+def generate_answer_stream(query: str, hits: List[Dict], style: str = "bullets") -> Iterator[str]:
+    """Yield progressively longer renderings of the answer's Markdown.
+
+    The first rendering already carries the title and the sources block; with the LLM
+    style the body then grows as tokens arrive. The last value equals what
+    ``generate_answer`` returns. If the stream fails midway, the last rendering swaps the
+    partial body for the offline answer.
+    """
+    if not hits:
+        yield NO_MATCH_ANSWER
+        return
+
+    focused_hits = _focused_hits(hits)
+    with span("answer.cache_lookup"):
+        answer, keys = _cached_answer(query, hits, focused_hits, style)
+    if answer is not None:
+        yield answer
+        return
+    title = _policy_title(keys.top_policy)
+
+    if not (style == "llm" and settings.USE_LLM):
+        with span("answer.offline"):
+            answer = _render(title, _offline_body(focused_hits, style), focused_hits)
+        _remember_answer(keys, answer)
+        yield answer
+        return
+
+    yield _render(title, STREAM_PLACEHOLDER, focused_hits)
+    body = ""
+    started = time.perf_counter()
+    try:
+        for token in _stream_llm_openai(query, focused_hits):
+            if not body:
+                observe("answer.llm_first_token", time.perf_counter() - started)
+            body += token
+            yield _render(title, body, focused_hits)
+        if not body.strip():
+            raise RuntimeError("LLM returned an empty answer")
+        observe("answer.llm_stream", time.perf_counter() - started)
+    except Exception as exc:
+        logger.warning("LLM stream failed; showing the offline answer instead: %s", exc)
+        incr("llm_fallbacks", error=type(exc).__name__)
+        yield _render(title, _offline_body(focused_hits, "paragraph"), focused_hits)
+        return
+    answer = _render(title, body.strip(), focused_hits)
+    _remember_answer(keys, answer)
+    yield answer
@@ -0,0 +1,118 @@
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from src.core.config import settings
+
+Namespace = Tuple[str, ...]
+Sources = Tuple[Optional[str], ...]
+
+
+def semantic_styles() -> Set[str]:
+    """Answer styles that may be served from a paraphrase's cached answer."""
+    return {style.strip() for style in settings.SEMANTIC_CACHE_STYLES.split(",") if style.strip()}
+
+
+class SemanticAnswerCache:
+    """Answers of recent questions, looked up by cosine similarity of query embeddings.
+
+    Vectors live in one preallocated matrix that is scanned with a single matrix-vector
+    product; when it is full the least recently used slot is overwritten. Every entry
+    belongs to a namespace (index fingerprint plus embedding model) and the cache is
+    emptied as soon as a different namespace is used, so answers never outlive the
+    index version they were generated from.
+    """
+
+    def __init__(self, max_entries: int, threshold: float):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._namespace: Optional[Namespace] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._last_used = np.zeros(max(0, max_entries), dtype=np.int64)
+        self._keys: List[Optional[Tuple[str, Sources]]] = [None] * max(0, max_entries)
+        self._answers: List[Optional[str]] = [None] * max(0, max_entries)
+        self._count = 0
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    def _use_namespace(self, namespace: Namespace, dimension: int) -> None:
+        """Start over for a new index version or embedding model (must hold the lock)."""
+        if self._namespace == namespace and self._vectors is not None:
+            return
+        self._namespace = namespace
+        self._vectors = np.zeros((self.max_entries, dimension), dtype=np.float32)
+        self._last_used[:] = 0
+        self._keys = [None] * self.max_entries
+        self._answers = [None] * self.max_entries
+        self._count = 0
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def lookup(
+        self, namespace: Namespace, style: str, sources: Sources, vector: np.ndarray
+    ) -> Optional[str]:
+        """Cached answer for a question similar to ``vector`` built from the same chunks."""
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            self._use_namespace(namespace, len(vector))
+            if self._count:
+                scores = self._vectors[: self._count] @ vector
+                for slot in np.argsort(-scores):
+                    if scores[slot] < self.threshold:
+                        break
+                    if self._keys[slot] == (style, sources):
+                        self._last_used[slot] = self._tick()
+                        self.hits += 1
+                        return self._answers[slot]
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        namespace: Namespace,
+        style: str,
+        sources: Sources,
+        vector: np.ndarray,
+        answer: str,
+    ) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._use_namespace(namespace, len(vector))
+            if self._count < self.max_entries:
+                slot = self._count
+                self._count += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+            self._vectors[slot] = vector
+            self._keys[slot] = (style, sources)
+            self._answers[slot] = answer
+            self._last_used[slot] = self._tick()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": self._count,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._namespace = None
+            self._vectors = None
+            self._count = 0
+            self.hits = self.misses = 0
+
+
+@lru_cache(maxsize=1)
+def get_semantic_cache() -> SemanticAnswerCache:
+    return SemanticAnswerCache(settings.SEMANTIC_CACHE_SIZE, settings.SEMANTIC_CACHE_THRESHOLD)
@@ -0,0 +1,61 @@
+import re
+from typing import Dict, List, Tuple
+
+# Bump when cleaning or splitting changes so stored segments from older builds are redone.
+SEGMENTS_VERSION = 1
+
+SYNTHETIC_NOTICE_RE = re.compile(
+    r"Disclaimer:\s*This is a synthetic document generated for a model training dataset\.\s*"
+    r"It is not a real policy and should not be used as such\.\s*",
+    re.IGNORECASE,
+)
+POLICY_HEADER_RE = re.compile(
+    r"^[A-Z][A-Za-z0-9 &()/,'-]+ Policy\s+Effective Date:\s*"
+    r"[A-Za-z]+\s+\d{1,2},\s+\d{4}\s+I\.\s+Policy Statement\s+",
+)
+SECTION_HEADING_RE = re.compile(
+    r"\s+[IVX]{1,5}\.\s+[A-Z][A-Za-z &/()'-]{2,40}?"
+    r"(?=\s+(?:The|This|Employees|All|Eligible|Any|There|Business|Non|An|A)\b)"
+)
+SECTION_MARKER_RE = re.compile(r"\s+[IVX]{1,5}\.\s+(?=[A-Z])")
+WHITESPACE_RE = re.compile(r"\s+")
+SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def clean_text(text: str) -> str:
+    """Strip the synthetic-data notice, policy header and section numbering from a chunk."""
+    text = SYNTHETIC_NOTICE_RE.sub("", text or "")
+    text = POLICY_HEADER_RE.sub("", text)
+    text = text.replace("[Company Name]", "the company")
+    text = SECTION_HEADING_RE.sub(". ", text)
+    text = SECTION_MARKER_RE.sub(". ", text)
+    return WHITESPACE_RE.sub(" ", text).strip()
+
+
+def segment(text: str) -> Dict:
+    """Cleaned chunk text plus ``[start, end, complete]`` spans of its sentences.
+
+    Computed once per chunk when the index is built and stored with its metadata;
+    ``complete`` marks sentences ending in terminal punctuation.
+    """
+    cleaned = clean_text(text)
+    spans: List[List] = []
+    start = 0
+    breaks = [(match.start(), match.end()) for match in SENTENCE_BREAK_RE.finditer(cleaned)]
+    for end, next_start in breaks + [(len(cleaned), len(cleaned))]:
+        piece = cleaned[start:end]
+        stripped = piece.strip()
+        if stripped:
+            begin = start + len(piece) - len(piece.lstrip())
+            spans.append([begin, begin + len(stripped), stripped.endswith((".", "!", "?"))])
+        start = next_start
+    return {"clean": cleaned, "spans": spans}
+
+
+def sentences(segments: Dict) -> List[Tuple[str, bool]]:
+    """Sentences of a segmented chunk, first letter capitalized, with completeness flags."""
+    cleaned = segments["clean"]
+    return [
+        (cleaned[start : start + 1].upper() + cleaned[start + 1 : end], complete)
+        for start, end, complete in segments["spans"]
+    ]
@@ -0,0 +1,177 @@
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+
+RERANK_FACTOR = 4  # approximate neighbours fetched per requested hit before exact rescoring
+
+
+def _unit_rows(vecs: np.ndarray) -> np.ndarray:
+    return vecs / (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12)
+
+
+def faiss_available() -> bool:
+    try:
+        import faiss  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class IVFIndex:
+    """Pure-NumPy inverted-file index: spherical k-means cells listing their member rows.
+
+    A query probes the ``nprobe`` closest cells and returns their rows as candidates;
+    exact scores are computed by the caller, so the only approximation is which cells
+    are visited.
+    """
+
+    def __init__(
+        self, centroids: np.ndarray, offsets: np.ndarray, ids: np.ndarray, nprobe: int = 8
+    ):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.nprobe = nprobe
+
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        nlist: int,
+        iterations: int = 10,
+        seed: int = 0,
+        batch_size: int = 65536,
+    ) -> "IVFIndex":
+        rng = np.random.default_rng(seed)
+        nlist = max(1, min(nlist, len(vectors)))
+        sample_size = min(len(vectors), nlist * 32)
+        sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].astype(np.float32)
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=nlist) == 0
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            centroids = _unit_rows(sums).astype(np.float32)
+
+        assignment = np.concatenate(
+            [
+                np.argmax(np.asarray(vectors[start : start + batch_size]) @ centroids.T, axis=1)
+                for start in range(0, len(vectors), batch_size)
+            ]
+        )
+        ids = np.argsort(assignment, kind="stable").astype(np.int64)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=nlist), out=offsets[1:])
+        return cls(centroids, offsets, ids)
+
+    def search(self, query_vectors: np.ndarray, count: int) -> List[np.ndarray]:
+        nprobe = max(1, min(self.nprobe, len(self.centroids)))
+        candidates = []
+        for query_vector in query_vectors:
+            cell_scores = self.centroids @ query_vector
+            cells = np.argpartition(-cell_scores, nprobe - 1)[:nprobe]
+            members = [self.ids[self.offsets[cell] : self.offsets[cell + 1]] for cell in cells]
+            candidates.append(np.concatenate(members))
+        return candidates
+
+    def save(self, path: Path) -> None:
+        with path.open("wb") as f:
+            np.savez(f, centroids=self.centroids, offsets=self.offsets, ids=self.ids)
+
+    @classmethod
+    def load(cls, path: Path, nprobe: int) -> "IVFIndex":
+        with np.load(path) as data:
+            return cls(data["centroids"], data["offsets"], data["ids"], nprobe)
+
+
+class FaissIndex:
+    """FAISS HNSW or IVF-Flat index over inner product (vectors are unit length)."""
+
+    def __init__(self, index):
+        self.index = index
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, kind: str, nlist: int, hnsw_m: int) -> "FaissIndex":
+        import faiss
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        dimension = vectors.shape[1]
+        if kind == "hnsw":
+            index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        else:
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFFlat(
+                quantizer, dimension, max(1, min(nlist, len(vectors))), faiss.METRIC_INNER_PRODUCT
+            )
+            index.train(vectors)
+        index.add(vectors)
+        return cls(index)
+
+    def configure(self, nprobe: int, ef_search: int) -> "FaissIndex":
+        if hasattr(self.index, "hnsw"):
+            self.index.hnsw.efSearch = ef_search
+        if hasattr(self.index, "nprobe"):
+            self.index.nprobe = nprobe
+        return self
+
+    def search(self, query_vectors: np.ndarray, count: int) -> List[np.ndarray]:
+        count = max(1, min(count, self.index.ntotal))
+        _, ids = self.index.search(np.ascontiguousarray(query_vectors, dtype=np.float32), count)
+        return [row[row >= 0].astype(np.int64) for row in ids]
+
+    def save(self, path: Path) -> None:
+        import faiss
+
+        faiss.write_index(self.index, str(path))
+
+    @classmethod
+    def load(cls, path: Path) -> "FaissIndex":
+        import faiss
+
+        return cls(faiss.read_index(str(path)))
+
+
+AnnIndex = Union[IVFIndex, FaissIndex]
+
+
+def resolve_backend(backend: str, vector_count: int, min_vectors: int) -> str:
+    """Map the configured ANN_BACKEND to one of flat, ivf, faiss-hnsw or faiss-ivf."""
+    backend = backend.lower()
+    if backend == "auto":
+        if vector_count < min_vectors:
+            return "flat"
+        return "faiss-hnsw" if faiss_available() else "ivf"
+    if backend not in {"flat", "ivf", "faiss-hnsw", "faiss-ivf"}:
+        raise ValueError(f"Unsupported ANN backend: {backend}")
+    return backend
+
+
+def default_nlist(vector_count: int) -> int:
+    return max(1, int(round(4 * np.sqrt(vector_count))))
+
+
+def brute_force_top_k(vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> List[np.ndarray]:
+    scores = query_vectors @ np.asarray(vectors).T
+    return [np.argsort(-row, kind="stable")[:k] for row in scores]
+
+
+def recall_at_k(
+    ann: AnnIndex,
+    vectors: np.ndarray,
+    query_vectors: np.ndarray,
+    k: int,
+    count: Optional[int] = None,
+) -> float:
+    """Fraction of exact top-k neighbours found after rescoring the ANN candidates."""
+    if not len(query_vectors) or k <= 0:
+        return 1.0
+    expected = brute_force_top_k(vectors, query_vectors, k)
+    candidates = ann.search(query_vectors, count or k * RERANK_FACTOR)
+    found = 0
+    for query_vector, truth, ids in zip(query_vectors, expected, candidates):
+        exact = np.asarray(vectors[ids]) @ query_vector
+        found += len(set(truth.tolist()) & set(ids[np.argsort(-exact, kind="stable")[:k]].tolist()))
+    return found / (len(query_vectors) * min(k, len(vectors)))
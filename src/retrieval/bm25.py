@@ -0,0 +1,382 @@
+import math
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:['-][a-z0-9]+)?")
+# Bump when tokenize or searchable_text change so persisted BM25 files are rebuilt.
+TOKENIZER_VERSION = 1
+# Arrays persisted by BM25Index.save, in file order; each section starts 64-byte aligned.
+BM25_SECTIONS = ("offsets", "doc_ids", "term_freqs", "idf", "doc_norms", "upper_bounds")
+SECTION_ALIGNMENT = 64
+# top_k accumulates into corpus-sized buffers once a query's postings reach this share
+# of the corpus; below it, cost follows the postings only.
+DENSE_ACCUMULATOR_SHARE = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def searchable_text(item: Dict) -> str:
+    """Include policy and section names so direct policy questions rank reliably."""
+    policy_name = str(item.get("policy_id", "")).replace("_", " ")
+    section_name = str(item.get("section", "")).replace("_", " ")
+    return f"{policy_name} {section_name} {item.get('text', '')}"
+
+
+def _lower(threshold: float) -> float:
+    """Pruning threshold with slack for summation-order rounding differences."""
+    return threshold - 1e-9 * abs(threshold)
+
+
+def _members(docs: np.ndarray, allowed: np.ndarray) -> np.ndarray:
+    """Mask of the sorted ``docs`` that appear in the sorted ``allowed`` ids."""
+    positions = np.searchsorted(allowed, docs)
+    found = positions < len(allowed)
+    found[found] = allowed[positions[found]] == docs[found]
+    return found
+
+
+def _accumulate(
+    candidates: np.ndarray, partial: np.ndarray, docs: np.ndarray, contributions: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Add ``contributions`` of sorted ``docs`` into sorted (candidates, partial scores).
+
+    Costs O(touched documents), never O(corpus): known documents are updated in place
+    and new ones are spliced in at their sorted positions.
+    """
+    positions = np.searchsorted(candidates, docs)
+    known = positions < len(candidates)
+    known[known] = candidates[positions[known]] == docs[known]
+    partial = partial.copy()
+    partial[positions[known]] += contributions[known]
+    new = ~known
+    return (
+        np.insert(candidates, positions[new], docs[new]),
+        np.insert(partial, positions[new], contributions[new]),
+    )
+
+
+class BM25Index:
+    """Okapi BM25 over CSR posting lists, scored like ``rank_bm25.BM25Okapi``.
+
+    Postings for term ``t`` live in ``doc_ids[offsets[t]:offsets[t + 1]]`` (sorted by
+    document) with matching raw term frequencies in ``term_freqs``. IDF, per-document
+    length norms and per-term score upper bounds are precomputed so a query only
+    touches the postings of its own terms.
+    """
+
+    def __init__(
+        self,
+        vocab: Dict[str, int],
+        offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        term_freqs: np.ndarray,
+        idf: np.ndarray,
+        doc_norms: np.ndarray,
+        upper_bounds: np.ndarray,
+        k1: float = 1.5,
+    ):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.idf = idf
+        self.doc_norms = doc_norms
+        self.upper_bounds = upper_bounds
+        self.k1 = k1
+
+    @classmethod
+    def build(
+        cls,
+        corpus: Sequence[List[str]],
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ) -> "BM25Index":
+        vocab: Dict[str, int] = {}
+        rows_term: List[int] = []
+        rows_doc: List[int] = []
+        rows_tf: List[int] = []
+        doc_len = np.zeros(len(corpus), dtype=np.int64)
+        for doc_id, tokens in enumerate(corpus):
+            doc_len[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                rows_term.append(vocab.setdefault(term, len(vocab)))
+                rows_doc.append(doc_id)
+                rows_tf.append(tf)
+
+        terms = np.asarray(rows_term, dtype=np.int64)
+        order = np.argsort(terms, kind="stable")  # keeps each posting list in document order
+        doc_ids = np.asarray(rows_doc, dtype=np.int32)[order]
+        term_freqs = np.asarray(rows_tf, dtype=np.float64)[order]
+        doc_freqs = np.bincount(terms, minlength=len(vocab))
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(doc_freqs, out=offsets[1:])
+
+        # Same IDF floor as BM25Okapi: negative IDFs become epsilon * average IDF.
+        corpus_size = len(corpus)
+        idf = np.array(
+            [math.log(corpus_size - df + 0.5) - math.log(df + 0.5) for df in doc_freqs.tolist()],
+            dtype=np.float64,
+        )
+        idf_sum = 0.0
+        for value in idf.tolist():
+            idf_sum += value
+        if idf.size:
+            idf[idf < 0] = epsilon * (idf_sum / idf.size)
+
+        avgdl = float(doc_len.sum()) / corpus_size if corpus_size else 0.0
+        if avgdl:
+            doc_norms = k1 * (1 - b + b * doc_len / avgdl)
+        else:
+            doc_norms = np.full(corpus_size, k1 * (1 - b))
+        index = cls(vocab, offsets, doc_ids, term_freqs, idf, doc_norms, np.zeros(len(vocab)), k1)
+        if len(term_freqs):
+            weights = index._weights(doc_ids, term_freqs)
+            index.upper_bounds = np.maximum.reduceat(weights, offsets[:-1]) * idf
+            index.upper_bounds[doc_freqs == 0] = 0.0
+        return index
+
+    def subset(self, rows: np.ndarray) -> "BM25Index":
+        """An index over only the sorted doc ids ``rows``, renumbered from 0.
+
+        IDF and length norms are copied rather than recomputed from the subset, so each
+        of its documents scores exactly as it does here; only the upper bounds tighten.
+        """
+        local = np.full(len(self), -1, dtype=np.int64)
+        local[rows] = np.arange(len(rows))
+        mapped = local[self.doc_ids]
+        keep = mapped >= 0
+        posting_terms = np.repeat(np.arange(len(self.vocab)), np.diff(self.offsets))[keep]
+        used, terms = np.unique(posting_terms, return_inverse=True)
+        offsets = np.zeros(len(used) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(used)), out=offsets[1:])
+        names = sorted(self.vocab, key=self.vocab.__getitem__)
+        vocab = {names[term]: number for number, term in enumerate(used.tolist())}
+        doc_ids, term_freqs = mapped[keep].astype(np.int32), self.term_freqs[keep]
+        index = BM25Index(
+            vocab,
+            offsets,
+            doc_ids,
+            term_freqs,
+            self.idf[used],
+            self.doc_norms[rows],
+            np.zeros(len(used)),
+            self.k1,
+        )
+        if len(term_freqs):
+            weights = index._weights(doc_ids, term_freqs)
+            index.upper_bounds = np.maximum.reduceat(weights, offsets[:-1]) * index.idf
+        return index
+
+    def save(self, path: Path) -> Dict:
+        """Write the index to one binary file; returns the layout for index_info.json.
+
+        Sections are raw little-endian arrays, so ``load`` maps them without parsing.
+        The vocabulary is stored as newline-separated terms in term-id order.
+        """
+        vocab = "\n".join(sorted(self.vocab, key=self.vocab.__getitem__)).encode("utf-8")
+        arrays = [(name, np.ascontiguousarray(getattr(self, name))) for name in BM25_SECTIONS]
+        arrays.append(("vocab", np.frombuffer(vocab, dtype=np.uint8)))
+        sections = {}
+        position = 0
+        with path.open("wb") as f:
+            for name, array in arrays:
+                padding = -position % SECTION_ALIGNMENT
+                f.write(b"\0" * padding)
+                position += padding
+                array = array.astype(array.dtype.newbyteorder("<"), copy=False)
+                sections[name] = {
+                    "offset": position,
+                    "dtype": array.dtype.str,
+                    "length": len(array),
+                }
+                f.write(array.tobytes())
+                position += array.nbytes
+        return {
+            "path": path.name,
+            "bytes": position,
+            "documents": len(self),
+            "terms": len(self.vocab),
+            "k1": self.k1,
+            "tokenizer": TOKENIZER_VERSION,
+            "sections": sections,
+        }
+
+    @classmethod
+    def load(cls, path: Path, info: Dict) -> "BM25Index":
+        """Memory-map a file written by ``save``; only the vocabulary dict is rebuilt."""
+        raw = np.memmap(path, dtype=np.uint8, mode="r")
+
+        def section(name: str) -> np.ndarray:
+            layout = info["sections"][name]
+            dtype = np.dtype(layout["dtype"])
+            start = layout["offset"]
+            return raw[start : start + layout["length"] * dtype.itemsize].view(dtype)
+
+        vocab_bytes = section("vocab").tobytes().decode("utf-8")
+        terms = vocab_bytes.split("\n") if info["terms"] else []
+        vocab = dict(zip(terms, range(len(terms))))
+        return cls(vocab, *(section(name) for name in BM25_SECTIONS), k1=info["k1"])
+
+    def __len__(self) -> int:
+        return len(self.doc_norms)
+
+    def _weights(self, docs: np.ndarray, tfs: np.ndarray) -> np.ndarray:
+        return tfs * (self.k1 + 1) / (tfs + self.doc_norms[docs])
+
+    def _postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.offsets[term], self.offsets[term + 1]
+        return self.doc_ids[start:end], self.term_freqs[start:end]
+
+    def _lookup(self, term: int, docs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return a mask of sorted ``docs`` containing ``term`` and their term frequencies."""
+        posting_docs, posting_tfs = self._postings(term)
+        positions = np.searchsorted(posting_docs, docs)
+        found = positions < len(posting_docs)
+        found[found] = posting_docs[positions[found]] == docs[found]
+        return found, posting_tfs[positions[found]]
+
+    def _term_scores(
+        self,
+        term: int,
+        docs: Optional[np.ndarray] = None,
+        cache: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (docs, contributions) for ``term``, optionally restricted to sorted ``docs``."""
+        if docs is None:
+            if cache is not None and term in cache:
+                return cache[term]
+            docs, tfs = self._postings(term)
+            scored = docs, self.idf[term] * self._weights(docs, tfs)
+            if cache is not None:
+                cache[term] = scored
+            return scored
+        found, tfs = self._lookup(term, docs)
+        docs = docs[found]
+        return docs, self.idf[term] * self._weights(docs, tfs)
+
+    def _query_terms(self, tokens: Sequence[str]) -> List[int]:
+        return [self.vocab[token] for token in tokens if token in self.vocab]
+
+    def get_scores(self, tokens: Sequence[str]) -> np.ndarray:
+        """Score every document; equivalent to ``BM25Okapi.get_scores``."""
+        scores = np.zeros(len(self), dtype=np.float64)
+        for term in self._query_terms(tokens):
+            docs, contributions = self._term_scores(term)
+            scores[docs] += contributions
+        return scores
+
+    def _rescore(self, terms: Sequence[int], docs: np.ndarray) -> np.ndarray:
+        """Exact scores for ``docs``, summed in query order so they match ``get_scores``."""
+        scores = np.zeros(len(docs), dtype=np.float64)
+        for term in terms:
+            found, tfs = self._lookup(term, docs)
+            contributions = np.zeros(len(docs), dtype=np.float64)
+            contributions[found] = self.idf[term] * self._weights(docs[found], tfs)
+            scores += contributions
+        return scores
+
+    def _ranked(
+        self, terms: Sequence[int], candidates: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self._rescore(terms, candidates)
+        positive = scores > 0
+        candidates, scores = candidates[positive], scores[positive]
+        order = np.lexsort((candidates, -scores))[:k]
+        return candidates[order].astype(np.int64), scores[order]
+
+    def top_k(
+        self,
+        tokens: Sequence[str],
+        k: int,
+        cache: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None,
+        allowed: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the ``k`` best positive-scoring documents as (doc ids, scores).
+
+        Uses MaxScore pruning: terms are visited by decreasing upper bound, and once the
+        bounds of the remaining terms cannot lift an unseen document above the current
+        k-th score, those terms are only probed for already-seen candidates. Results are
+        ordered by score, then document id.
+
+        ``allowed`` (sorted doc ids) restricts scoring to those documents. Small subsets
+        are scored directly by probing the query's postings; larger ones drop disallowed
+        postings before they reach the accumulator.
+        """
+        terms = self._query_terms(tokens)
+        empty = np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+        if not terms or k <= 0 or (allowed is not None and allowed.size == 0):
+            return empty
+
+        weights = Counter(terms)
+        unique_terms = sorted(weights, key=lambda term: -self.upper_bounds[term] * weights[term])
+        postings = sum(int(self.offsets[term + 1] - self.offsets[term]) for term in weights)
+        if allowed is not None and len(allowed) * len(unique_terms) <= postings:
+            return self._ranked(terms, allowed, k)
+        bounds = [self.upper_bounds[term] * weights[term] for term in unique_terms]
+        exhaustive = any(self.idf[term] <= 0 for term in unique_terms)
+
+        # Selective queries keep partial scores only for the documents their postings
+        # touch, in sorted arrays. Broad ones touch much of the corpus anyway, and a
+        # scatter-add into corpus-sized buffers is then cheaper than merging arrays.
+        dense = postings >= DENSE_ACCUMULATOR_SHARE * len(self)
+        if dense:
+            accumulator = np.zeros(len(self), dtype=np.float64)
+            seen = np.zeros(len(self), dtype=bool)
+            if allowed is not None:
+                allowed_mask = np.zeros(len(self), dtype=bool)
+                allowed_mask[allowed] = True
+        candidates = np.array([], dtype=np.int64)
+        partial = np.array([], dtype=np.float64)
+        remaining = float(sum(bounds))
+        theta = 0.0
+        for position, term in enumerate(unique_terms):
+            if not exhaustive and theta > 0 and remaining < _lower(theta):
+                break
+            docs, contributions = self._term_scores(term, cache=cache)
+            if allowed is not None:
+                keep = allowed_mask[docs] if dense else _members(docs, allowed)
+                docs, contributions = docs[keep], contributions[keep]
+            if dense:
+                accumulator[docs] += weights[term] * contributions
+                seen[docs] = True
+                candidates = np.flatnonzero(seen)
+                partial = accumulator[candidates]
+            else:
+                candidates, partial = _accumulate(
+                    candidates, partial, docs, weights[term] * contributions
+                )
+            remaining -= bounds[position]
+            if len(candidates) >= k:
+                theta = float(np.partition(partial, -k)[-k])
+        else:
+            position = len(unique_terms)
+
+        # Non-essential terms: only probe documents that can still reach the top k.
+        for offset, term in enumerate(unique_terms[position:], position):
+            keep = partial + remaining >= _lower(theta)
+            candidates, partial = candidates[keep], partial[keep]
+            found, tfs = self._lookup(term, candidates)
+            partial[found] += weights[term] * self.idf[term] * self._weights(candidates[found], tfs)
+            remaining -= bounds[offset]
+            if len(candidates) >= k:
+                theta = max(theta, float(np.partition(partial, -k)[-k]))
+
+        candidates = candidates[partial >= _lower(theta)]
+        return self._ranked(terms, candidates, k)
+
+    def top_k_many(
+        self,
+        token_lists: Sequence[Sequence[str]],
+        k: int,
+        allowed: Optional[np.ndarray] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Run ``top_k`` for a batch, scoring each distinct term's postings once."""
+        cache: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        return [self.top_k(tokens, k, cache, allowed) for tokens in token_lists]
@@ -0,0 +1,158 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.core.config import settings
+from src.core.metrics import incr
+
+ROOT = Path(__file__).resolve().parents[2]
+CacheKey = Tuple[str, str, str]
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form used as the cache key."""
+    return " ".join((text or "").split()).casefold()
+
+
+class QueryEmbeddingCache:
+    """Two-tier cache of query embeddings keyed by (provider, model, normalized text).
+
+    The first tier is a bounded in-process LRU. The optional second tier is a SQLite
+    file shared by every worker on the host and kept across restarts. Entries for any
+    other provider/model are purged as soon as a different model is used.
+    """
+
+    def __init__(self, max_entries: int, path: Optional[Path]):
+        self.max_entries = max_entries
+        self.path = path
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._active_model: Optional[Tuple[str, str]] = None
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "provider TEXT NOT NULL, model TEXT NOT NULL, query TEXT NOT NULL, "
+                "vector BLOB NOT NULL, PRIMARY KEY (provider, model, query))"
+            )
+        return self._connection
+
+    def _use_model(self, provider: str, model: str) -> None:
+        """Drop entries written for another embedding model (must hold the lock)."""
+        if self._active_model == (provider, model):
+            return
+        self._memory.clear()
+        db = self._db()
+        if db is not None:
+            with db:
+                db.execute(
+                    "DELETE FROM query_embeddings WHERE provider != ? OR model != ?",
+                    (provider, model),
+                )
+        self._active_model = (provider, model)
+
+    def _remember(self, key: CacheKey, vector: np.ndarray) -> None:
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(
+        self, provider: str, model: str, texts: Sequence[str]
+    ) -> List[Optional[np.ndarray]]:
+        keys = [(provider, model, normalize_query(text)) for text in texts]
+        found: List[Optional[np.ndarray]] = [None] * len(keys)
+        with self._lock:
+            self._use_model(provider, model)
+            on_disk = []
+            for position, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    incr("query_embed_cache", result="memory_hit")
+                    found[position] = vector
+                else:
+                    on_disk.append(position)
+
+            db = self._db()
+            for position in on_disk:
+                row = None
+                if db is not None:
+                    row = db.execute(
+                        "SELECT vector FROM query_embeddings "
+                        "WHERE provider = ? AND model = ? AND query = ?",
+                        keys[position],
+                    ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    incr("query_embed_cache", result="miss")
+                    continue
+                vector = np.frombuffer(row[0], dtype=np.float32)
+                self.disk_hits += 1
+                incr("query_embed_cache", result="disk_hit")
+                self._remember(keys[position], vector)
+                found[position] = vector
+        return found
+
+    def put_many(
+        self, provider: str, model: str, texts: Sequence[str], vectors: np.ndarray
+    ) -> None:
+        rows = []
+        with self._lock:
+            self._use_model(provider, model)
+            for text, vector in zip(texts, vectors):
+                vector = np.asarray(vector, dtype=np.float32)
+                key = (provider, model, normalize_query(text))
+                self._remember(key, vector)
+                rows.append((*key, vector.tobytes()))
+            db = self._db()
+            if db is not None and rows:
+                with db:
+                    db.executemany(
+                        "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?)", rows
+                    )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+        }
+
+    def clear(self) -> None:
+        """Forget every cached vector, on disk too, and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            db = self._db()
+            if db is not None:
+                with db:
+                    db.execute("DELETE FROM query_embeddings")
+            self.memory_hits = self.disk_hits = self.misses = 0
+
+
+@lru_cache(maxsize=1)
+def get_query_cache() -> QueryEmbeddingCache:
+    path = settings.QUERY_EMBED_CACHE_PATH
+    resolved = None
+    if path:
+        resolved = Path(path) if Path(path).is_absolute() else ROOT / path
+    return QueryEmbeddingCache(settings.QUERY_EMBED_CACHE_SIZE, resolved)
@@ -0,0 +1,81 @@
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, Sequence
+
+import numpy as np
+
+_BATCH = 500  # stays below SQLite's bound-parameter limit
+
+
+class EmbeddingStore:
+    """Chunk embeddings persisted in SQLite, keyed by (chunk id, provider, model).
+
+    Chunk ids are content hashes from ingestion, so an id only matches when the chunk
+    text is unchanged and its stored vector can be reused by the next build.
+    """
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_embeddings ("
+            "chunk_id TEXT NOT NULL, provider TEXT NOT NULL, model TEXT NOT NULL, "
+            "vector BLOB NOT NULL, PRIMARY KEY (chunk_id, provider, model))"
+        )
+
+    def __enter__(self) -> "EmbeddingStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def get_many(
+        self, provider: str, model: str, chunk_ids: Sequence[str]
+    ) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        unique_ids = list(dict.fromkeys(chunk_ids))
+        for start in range(0, len(unique_ids), _BATCH):
+            batch = unique_ids[start : start + _BATCH]
+            rows = self.connection.execute(
+                "SELECT chunk_id, vector FROM chunk_embeddings "
+                f"WHERE provider = ? AND model = ? AND chunk_id IN ({','.join('?' * len(batch))})",
+                (provider, model, *batch),
+            )
+            for chunk_id, blob in rows:
+                found[chunk_id] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(
+        self, provider: str, model: str, chunk_ids: Sequence[str], vectors: np.ndarray
+    ) -> None:
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO chunk_embeddings VALUES (?, ?, ?, ?)",
+                (
+                    (chunk_id, provider, model, np.asarray(vector, dtype=np.float32).tobytes())
+                    for chunk_id, vector in zip(chunk_ids, vectors)
+                ),
+            )
+
+    def prune(self, live_ids: Iterable[str]) -> int:
+        """Delete vectors of chunks that no longer exist; returns the number of chunks dropped."""
+        with self.connection:
+            self.connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS live_ids (chunk_id TEXT PRIMARY KEY)"
+            )
+            self.connection.execute("DELETE FROM live_ids")
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO live_ids VALUES (?)", ((chunk_id,) for chunk_id in live_ids)
+            )
+            dropped = self.connection.execute(
+                "SELECT COUNT(DISTINCT chunk_id) FROM chunk_embeddings "
+                "WHERE chunk_id NOT IN (SELECT chunk_id FROM live_ids)"
+            ).fetchone()[0]
+            self.connection.execute(
+                "DELETE FROM chunk_embeddings WHERE chunk_id NOT IN (SELECT chunk_id FROM live_ids)"
+            )
+        return dropped
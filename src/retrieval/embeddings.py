@@ -1,7 +1,9 @@
 from functools import lru_cache
-from typing import List
+from typing import List, Tuple
 import numpy as np
 from src.core.config import settings
+from src.core.openai_client import create_embeddings
+from src.retrieval.embedding_cache import get_query_cache, normalize_query
 
 @lru_cache(maxsize=2)
 def _get_st_model(name: str):
@@ -22,11 +24,7 @@ def embed_texts(texts: List[str]) -> np.ndarray:
     if provider == "openai":
         if not settings.OPENAI_API_KEY:
             raise RuntimeError("OPENAI_API_KEY is required when EMBEDDINGS_PROVIDER=openai")
-        from openai import OpenAI
-
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        resp = client.embeddings.create(model=settings.EMBEDDINGS_MODEL, input=texts)
-        vecs = np.array([d.embedding for d in resp.data], dtype=np.float32)
+        vecs = create_embeddings(texts, settings.EMBEDDINGS_MODEL)
         return _normalize_rows(vecs)
 
     # ---- Local SentenceTransformers fallback ----
@@ -37,5 +35,30 @@ def embed_texts(texts: List[str]) -> np.ndarray:
     vecs = np.array(model.encode(texts, normalize_embeddings=True), dtype=np.float32)
     return vecs
 
+def embedding_model() -> Tuple[str, str]:
+    """Return the active (provider, model) pair that produced or will produce vectors."""
+    provider = settings.EMBEDDINGS_PROVIDER.lower()
+    return provider, settings.EMBEDDINGS_MODEL if provider == "openai" else settings.ST_MODEL
+
+def embed_queries(texts: List[str]) -> np.ndarray:
+    """Embed search queries through the query cache; misses share one embed_texts call."""
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    provider, model = embedding_model()
+    cache = get_query_cache()
+    vectors = cache.get_many(provider, model, texts)
+    missing = {}
+    for position, vector in enumerate(vectors):
+        if vector is None:
+            missing.setdefault(normalize_query(texts[position]), []).append(position)
+    if missing:
+        first_texts = [texts[positions[0]] for positions in missing.values()]
+        fresh = embed_texts(first_texts)
+        cache.put_many(provider, model, first_texts, fresh)
+        for positions, vector in zip(missing.values(), fresh):
+            for position in positions:
+                vectors[position] = vector
+    return np.stack(vectors).astype(np.float32, copy=False)
+
 def embed_query(text: str) -> np.ndarray:
-    return embed_texts([text])[0]
+    return embed_queries([text])[0]
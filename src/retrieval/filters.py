@@ -0,0 +1,128 @@
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+
+class SearchFilter(NamedTuple):
+    """Restricts a search to chunks matching every given field; None means any value."""
+
+    regions: Optional[FrozenSet[str]] = None
+    policy_ids: Optional[FrozenSet[str]] = None
+    effective_as_of: Optional[str] = None  # ISO date; keeps chunks effective on or before it
+
+    @classmethod
+    def of(
+        cls,
+        region: Union[str, Iterable[str], None] = None,
+        policy_ids: Union[str, Iterable[str], None] = None,
+        effective_as_of: Optional[str] = None,
+    ) -> "SearchFilter":
+        """Build a filter from single values or collections."""
+
+        def as_set(value):
+            if value is None:
+                return None
+            return frozenset([value] if isinstance(value, str) else value)
+
+        return cls(as_set(region), as_set(policy_ids), effective_as_of)
+
+    def is_empty(self) -> bool:
+        return self.regions is None and self.policy_ids is None and not self.effective_as_of
+
+    def cache_key(self) -> Tuple:
+        return (
+            sorted(self.regions) if self.regions is not None else None,
+            sorted(self.policy_ids) if self.policy_ids is not None else None,
+            self.effective_as_of,
+        )
+
+
+def _postings(values: List[Optional[str]]) -> Dict[str, np.ndarray]:
+    """Rows per distinct value: a packed bitmap for common values, sorted row ids otherwise.
+
+    Each value keeps whichever form is smaller (a bitmap costs ``rows / 8`` bytes, a row
+    list four bytes per matching row), so high-cardinality fields such as ``policy_id``
+    stay linear in the row count instead of one full bitmap per value.
+    """
+    column = np.array(["" if value is None else str(value) for value in values], dtype=str)
+    distinct, inverse = np.unique(column, return_inverse=True)
+    order = np.argsort(inverse, kind="stable").astype(np.int32)
+    counts = np.bincount(inverse, minlength=len(distinct))
+    groups = np.split(order, np.cumsum(counts)[:-1])
+    postings = {}
+    for number, (value, rows) in enumerate(zip(distinct.tolist(), groups)):
+        if value:
+            dense = len(rows) * 32 > len(column)
+            postings[value] = np.packbits(inverse == number) if dense else rows
+    return postings
+
+
+class MetadataIndex:
+    """Row postings for ``region`` and ``policy_id`` plus rows sorted by ``effective_from``.
+
+    Built once per index generation. Each field's selection is resolved to a bitmap
+    packed eight rows per byte, so combining filters is a few vectorized OR/AND passes
+    over ``rows / 8`` bytes. Chunks without an ``effective_from`` date count as always
+    in effect.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        regions: Dict[str, np.ndarray],
+        policies: Dict[str, np.ndarray],
+        dates: np.ndarray,
+        date_order: np.ndarray,
+        undated: np.ndarray,
+    ):
+        self.size = size
+        self.regions = regions
+        self.policies = policies
+        self.dates = dates
+        self.date_order = date_order
+        self.undated = undated
+
+    @classmethod
+    def build(cls, meta: List[Dict]) -> "MetadataIndex":
+        dates = np.array([str(item.get("effective_from") or "") for item in meta], dtype=str)
+        dated = np.flatnonzero(dates != "")
+        date_order = dated[np.argsort(dates[dated], kind="stable")]
+        return cls(
+            len(meta),
+            _postings([item.get("region") for item in meta]),
+            _postings([item.get("policy_id") for item in meta]),
+            dates[date_order],
+            date_order,
+            np.packbits(dates == ""),
+        )
+
+    def _any_of(self, postings: Dict[str, np.ndarray], values: FrozenSet[str]) -> np.ndarray:
+        combined = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        listed = np.zeros(self.size, dtype=bool)
+        for value in values:
+            rows = postings.get(value)
+            if rows is None:
+                continue
+            if rows.dtype == np.uint8:  # packed bitmap
+                combined |= rows
+            else:
+                listed[rows] = True
+        return combined | np.packbits(listed)
+
+    def _effective_as_of(self, date: str) -> np.ndarray:
+        in_effect = np.zeros(self.size, dtype=bool)
+        in_effect[self.date_order[: np.searchsorted(self.dates, date, side="right")]] = True
+        return np.packbits(in_effect) | self.undated
+
+    def rows(self, search_filter: Optional[SearchFilter]) -> Optional[np.ndarray]:
+        """Sorted row ids allowed by ``search_filter``, or None when nothing is filtered."""
+        if search_filter is None or search_filter.is_empty():
+            return None
+        selected = np.full((self.size + 7) // 8, 0xFF, dtype=np.uint8)
+        if search_filter.regions is not None:
+            selected &= self._any_of(self.regions, search_filter.regions)
+        if search_filter.policy_ids is not None:
+            selected &= self._any_of(self.policies, search_filter.policy_ids)
+        if search_filter.effective_as_of:
+            selected &= self._effective_as_of(search_filter.effective_as_of)
+        return np.flatnonzero(np.unpackbits(selected, count=self.size))
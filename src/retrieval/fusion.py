@@ -0,0 +1,119 @@
+"""Combine dense and BM25 candidate lists into one ranking with NumPy.
+
+Each list is a pair of arrays: chunk ids in rank order and their raw scores. The
+strategies (``FUSION_METHOD``) all map their result into [0, 1], so ``MIN_RELEVANCE_SCORE``
+and the answer focus thresholds mean the same thing whichever one is used:
+
+- ``weighted``: min-max normalize each list, then ``w * dense + (1 - w) * bm25``.
+- ``rrf``: reciprocal rank fusion, ``w / (k + rank)`` summed over the lists, divided by
+  the score of a chunk ranked first in both.
+- ``zscore``: standardize each list, squash with the normal CDF, then weight as above.
+
+``w`` is ``FUSION_DENSE_WEIGHT``. When the dense list is empty (dense retrieval off or
+unavailable) the BM25 list alone decides, with full weight.
+"""
+
+import math
+from typing import Tuple
+
+import numpy as np
+
+from src.core.config import FUSION_METHODS
+
+Candidates = Tuple[np.ndarray, np.ndarray]  # (chunk ids in rank order, scores)
+
+# Abramowitz & Stegun 7.1.26 erf coefficients; absolute error below 1.5e-7.
+_ERF_P = 0.3275911
+_ERF_A = (1.061405429, -1.453152027, 1.421413741, -0.284496736, 0.254829592)
+
+
+def _erf(x: np.ndarray) -> np.ndarray:
+    """Vectorized error function (NumPy has none and SciPy is not a dependency)."""
+    magnitude = np.abs(x)
+    t = 1.0 / (1.0 + _ERF_P * magnitude)
+    polynomial = np.zeros_like(t)
+    for coefficient in _ERF_A:  # Horner's rule, highest power first
+        polynomial = (polynomial + coefficient) * t
+    return np.sign(x) * (1.0 - polynomial * np.exp(-magnitude * magnitude))
+
+
+def min_max(scores: np.ndarray) -> np.ndarray:
+    scores = np.asarray(scores, dtype=np.float32)
+    if scores.size == 0:
+        return scores
+    minimum, maximum = float(scores.min()), float(scores.max())
+    if maximum - minimum < 1e-9:
+        return np.ones_like(scores) if maximum > 0 else np.zeros_like(scores)
+    return (scores - minimum) / (maximum - minimum)
+
+
+def _zscore(scores: np.ndarray) -> np.ndarray:
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.size == 0:
+        return scores
+    deviation = float(scores.std())
+    if deviation < 1e-9:
+        return np.ones_like(scores)
+    return 0.5 * (1.0 + _erf((scores - scores.mean()) / (deviation * math.sqrt(2))))
+
+
+def _reciprocal_ranks(count: int, rrf_k: int) -> np.ndarray:
+    return 1.0 / (rrf_k + np.arange(1, count + 1, dtype=np.float64))
+
+
+def _list_scores(candidates: Candidates, method: str, rrf_k: int) -> np.ndarray:
+    ids, scores = candidates
+    if method == "weighted":
+        # float64 of the float32 normalized score, exactly as the former per-item loop did
+        return min_max(scores).astype(np.float64)
+    if method == "rrf":
+        return _reciprocal_ranks(len(ids), rrf_k) * (rrf_k + 1)
+    return _zscore(scores)
+
+
+def fuse(
+    dense: Candidates,
+    lexical: Candidates,
+    top_k: int,
+    method: str = "weighted",
+    dense_weight: float = 0.6,
+    min_score: float = 0.0,
+    rrf_k: int = 60,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Top ``top_k`` (ids, fused scores) by score, ties broken by chunk id.
+
+    Chunks scoring below ``min_score`` are dropped before the cut.
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method {method!r}; expected one of {FUSION_METHODS}")
+    lists = [(np.asarray(ids, dtype=np.int64), scores) for ids, scores in (dense, lexical)]
+    if not lists[0][0].size:  # BM25 alone, with full weight
+        weights = [0.0, 1.0]
+    else:
+        weights = [dense_weight, 1.0 - dense_weight]
+    id_parts, score_parts = [], []
+    for (ids, scores), weight in zip(lists, weights):
+        if ids.size:
+            id_parts.append(ids)
+            score_parts.append(weight * _list_scores((ids, scores), method, rrf_k))
+    if not id_parts:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+
+    # Scatter-add both lists' contributions per chunk id: one stable sort, one reduceat.
+    all_ids = np.concatenate(id_parts)
+    order = np.argsort(all_ids, kind="stable")
+    all_ids, contributions = all_ids[order], np.concatenate(score_parts)[order]
+    starts = np.flatnonzero(np.concatenate(([True], all_ids[1:] != all_ids[:-1])))
+    ids, fused = all_ids[starts], np.add.reduceat(contributions, starts)
+
+    keep = fused >= min_score
+    ids, fused = ids[keep], fused[keep]
+    if top_k <= 0 or ids.size == 0:
+        return ids[:0], fused[:0]
+    if ids.size > top_k:
+        # Everything tied with the k-th best survives, so the tie-break below stays exact.
+        kth = fused[np.argpartition(-fused, top_k - 1)[top_k - 1]]
+        shortlist = np.flatnonzero(fused >= kth)
+        ids, fused = ids[shortlist], fused[shortlist]
+    order = np.lexsort((ids, -fused))[:top_k]
+    return ids[order], fused[order]
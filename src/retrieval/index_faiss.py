@@ -1,55 +1,506 @@
 import hashlib
 import json
+import os
+import shutil
+import time
+from collections import Counter
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Iterator, List, Dict, Optional, Sequence, Tuple
 import numpy as np
 from src.core.config import settings
-from src.retrieval.embeddings import embed_texts
+from src.core.metrics import incr, span
+from src.llm.sentences import SEGMENTS_VERSION, segment
+from src.retrieval.ann import (
+    AnnIndex,
+    FaissIndex,
+    IVFIndex,
+    default_nlist,
+    recall_at_k,
+    resolve_backend,
+)
+from src.retrieval.bm25 import TOKENIZER_VERSION, BM25Index, searchable_text, tokenize
+from src.retrieval.embedding_store import EmbeddingStore
+from src.retrieval.embeddings import embed_texts, embedding_model
+from src.retrieval.vector_store import SCAN_BLOCK_BYTES, CompactVectors
 
 ROOT      = Path(__file__).resolve().parents[2]
 DOCS_PATH = ROOT / "data" / "processed" / "corpus.jsonl"
 INDEX_DIR = ROOT / "data" / "index"
-VECS_PATH = INDEX_DIR / "vectors.npy"
-META_PATH = INDEX_DIR / "meta.jsonl"
-INFO_PATH = INDEX_DIR / "index_info.json"
+VERSIONS_DIR = INDEX_DIR / "versions"
+STAGING_DIR = INDEX_DIR / "staging"
+CURRENT_PATH = INDEX_DIR / "CURRENT"
+EMBED_STORE_PATH = INDEX_DIR / "embeddings.sqlite"
+# File names inside an index directory: a published version, the staging build or the
+# legacy flat layout directly in INDEX_DIR.
+VECS_NAME = "vectors.npy"
+META_NAME = "meta.jsonl"
+INFO_NAME = "index_info.json"
+CHECKPOINT_NAME = "build_checkpoint.json"
+ANN_FAISS_NAME = "ann.faiss"
+ANN_IVF_NAME = "ann_ivf.npz"
+COMPACT_NAME = "vectors_compact.npy"
+COMPACT_PARAMS_NAME = "vectors_compact_params.npy"
+BM25_NAME = "bm25.bin"
+# A sharded index keeps meta.jsonl at the top and one directory per shard holding that
+# shard's vectors, compact copy, ANN and BM25 files plus its global row ids.
+SHARD_ROWS_NAME = "rows.npy"
+SHARD_METHODS = ("hash", "policy_id")
+RECALL_SAMPLE_SIZE = 200
 
-def build_index() -> None:
+
+def _chunk_id(document: Dict) -> str:
+    """Ingestion ids are content hashes; hash the text for records that lack one."""
+    return document.get("id") or hashlib.sha256(document["text"].encode("utf-8")).hexdigest()
+
+
+def _iter_batches(start: int, batch_size: int) -> Iterator[List[Dict]]:
+    """Stream corpus.jsonl records from row ``start`` in lists of ``batch_size``."""
+    with DOCS_PATH.open("r", encoding="utf-8") as f:
+        batch: List[Dict] = []
+        for line in islice(f, start, None):
+            batch.append(json.loads(line))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _iter_chunk_ids() -> Iterator[str]:
+    for batch in _iter_batches(0, 1024):
+        yield from (_chunk_id(document) for document in batch)
+
+
+def _scan_corpus() -> Tuple[int, str]:
+    """Count the records of corpus.jsonl and hash it in one streaming pass."""
+    digest = hashlib.sha256()
+    count = 0
+    with DOCS_PATH.open("rb") as f:
+        for line in f:
+            digest.update(line)
+            count += 1
+    return count, digest.hexdigest()
+
+
+def _embed_batch(
+    store: EmbeddingStore, docs: List[Dict], provider: str, model: str
+) -> Tuple[np.ndarray, int, int]:
+    """Reuse stored vectors for unchanged chunks and embed only new or edited ones.
+
+    Returns the batch's vectors and the number of chunk ids reused and embedded.
+    """
+    chunk_ids = [_chunk_id(document) for document in docs]
+    stored = store.get_many(provider, model, chunk_ids)
+    missing = {}
+    for chunk_id, document in zip(chunk_ids, docs):
+        if chunk_id not in stored:
+            missing.setdefault(chunk_id, document["text"])
+    if missing:
+        fresh = embed_texts(list(missing.values())).astype("float32")
+        fresh /= np.linalg.norm(fresh, axis=1, keepdims=True) + 1e-12
+        store.put_many(provider, model, list(missing), fresh)
+        stored.update(zip(missing, fresh))
+    vecs = np.stack([stored[chunk_id] for chunk_id in chunk_ids]).astype("float32", copy=False)
+    return vecs, len(set(chunk_ids)) - len(missing), len(missing)
+
+
+def _write_json(path: Path, payload: Dict) -> None:
+    """Write JSON through a temporary file so readers never see a partial document."""
+    temp_path = path.with_name(path.name + ".tmp")
+    temp_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    temp_path.replace(path)
+
+
+def _load_checkpoint(target: Dict) -> Optional[Dict]:
+    """Return the checkpoint of an interrupted build of the same corpus and model, if any."""
+    checkpoint_path = STAGING_DIR / CHECKPOINT_NAME
+    if not checkpoint_path.exists():
+        return None
+    checkpoint = json.loads(checkpoint_path.read_text(encoding="utf-8"))
+    meta_path = STAGING_DIR / META_NAME
+    if (
+        any(checkpoint.get(key) != value for key, value in target.items())
+        or not (STAGING_DIR / VECS_NAME).exists()
+        or not meta_path.exists()
+        or meta_path.stat().st_size < checkpoint["meta_bytes"]
+    ):
+        return None
+    return checkpoint
+
+
+def _recall_sample(vecs: np.ndarray) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return vecs[np.sort(rng.choice(len(vecs), min(len(vecs), RECALL_SAMPLE_SIZE), replace=False))]
+
+
+def _build_ann(vecs: np.ndarray, directory: Path) -> Optional[Dict]:
+    """Build the configured ANN index next to the vectors and measure its recall."""
+    backend = resolve_backend(settings.ANN_BACKEND, len(vecs), settings.ANN_MIN_VECTORS)
+    if backend == "flat" or not len(vecs):  # an empty index is searched exactly
+        return None
+    nlist = settings.ANN_NLIST or default_nlist(len(vecs))
+    if backend == "ivf":
+        ann = IVFIndex.train(vecs, nlist)
+        ann.nprobe = settings.ANN_NPROBE
+        path = directory / ANN_IVF_NAME
+        ann.save(path)
+    else:
+        ann = FaissIndex.build(vecs, backend.split("-", 1)[1], nlist, settings.ANN_HNSW_M)
+        ann.configure(settings.ANN_NPROBE, settings.ANN_EF_SEARCH)
+        path = directory / ANN_FAISS_NAME
+        ann.save(path)
+
+    recall = recall_at_k(ann, vecs, _recall_sample(vecs), settings.TOP_K)
+    print(f"   - ANN {backend}: recall@{settings.TOP_K}={recall:.3f} vs brute force")
+    return {"backend": backend, "path": path.name, "nlist": nlist, "recall_at_k": recall}
+
+
+def _build_compact(vecs: np.ndarray, directory: Path) -> Dict:
+    """Write the reduced-precision copy used for coarse scans, if one is configured."""
+    dtype = settings.VECTOR_STORAGE.lower()
+    if dtype == "float32" or not len(vecs):  # nothing to quantize in an empty index
+        return {"dtype": "float32", "path": VECS_NAME}
+    compact = CompactVectors.quantize(vecs, dtype)
+    info = compact.save(directory / COMPACT_NAME, directory / COMPACT_PARAMS_NAME)
+    info["recall_at_k"] = recall_at_k(compact, vecs, _recall_sample(vecs), settings.TOP_K)
+    recall = info["recall_at_k"]
+    print(f"   - {dtype} vectors: recall@{settings.TOP_K}={recall:.3f} after rescoring")
+    return info
+
+
+def _build_bm25(directory: Path, corpus_sha256: str) -> Dict:
+    """Tokenize the finished metadata once and persist the BM25 statistics."""
+    with (directory / META_NAME).open("r", encoding="utf-8") as f:
+        corpus = [tokenize(searchable_text(json.loads(line))) for line in f]
+    info = BM25Index.build(corpus).save(directory / BM25_NAME)
+    print(f"   - BM25: {info['terms']} terms over {info['documents']} chunks")
+    return {**info, "corpus_sha256": corpus_sha256}
+
+
+def shard_assignment(items: Sequence[Dict], count: int, by: str = "hash") -> np.ndarray:
+    """Shard number of every chunk.
+
+    ``hash`` spreads chunks by a hash of their id; ``policy_id`` keeps each policy in one
+    shard, placing policies largest first on the emptiest shard, so a policy filter only
+    touches the shards holding those policies.
+    """
+    if by not in SHARD_METHODS:
+        raise ValueError(f"Unknown shard method {by!r}; expected one of {SHARD_METHODS}")
+    if by == "hash":
+        return np.array(
+            [
+                int.from_bytes(hashlib.sha256(_chunk_id(item).encode("utf-8")).digest()[:8], "big")
+                % count
+                for item in items
+            ],
+            dtype=np.int64,
+        )
+    policies = [str(item.get("policy_id", "")) for item in items]
+    sizes = Counter(policies)
+    loads = [0] * count
+    placement = {}
+    for policy in sorted(sizes, key=lambda policy: (-sizes[policy], policy)):
+        shard = loads.index(min(loads))
+        placement[policy] = shard
+        loads[shard] += sizes[policy]
+    return np.array([placement[policy] for policy in policies], dtype=np.int64)
+
+
+def _build_shards(vecs: np.ndarray, directory: Path, corpus_sha256: str) -> Dict:
+    """Split the staged vectors and BM25 statistics into INDEX_SHARDS shard directories.
+
+    Every shard gets its own compact copy and ANN index. Its BM25 file is a slice of the
+    statistics of the whole corpus, so a shard scores a chunk exactly like an unsharded
+    index would and the merged per-shard top k equals the global one.
+    """
+    with (directory / META_NAME).open("r", encoding="utf-8") as f:
+        items = [json.loads(line) for line in f]
+    by = settings.INDEX_SHARD_BY
+    assignment = shard_assignment(items, settings.INDEX_SHARDS, by)
+    with span("build.bm25"):
+        bm25 = BM25Index.build([tokenize(searchable_text(item)) for item in items])
+    del items
+
+    shards = []
+    block = max(1, SCAN_BLOCK_BYTES // (4 * max(1, vecs.shape[1])))
+    for number in range(settings.INDEX_SHARDS):
+        rows = np.flatnonzero(assignment == number)
+        if not rows.size:
+            continue
+        shard_dir = directory / f"shard-{number:03d}"
+        shard_dir.mkdir()
+        np.save(shard_dir / SHARD_ROWS_NAME, rows)
+        shard_vecs = np.lib.format.open_memmap(
+            shard_dir / VECS_NAME, mode="w+", dtype=np.float32, shape=(len(rows), vecs.shape[1])
+        )
+        for start in range(0, len(rows), block):
+            shard_vecs[start : start + block] = vecs[rows[start : start + block]]
+        shard_vecs.flush()
+        print(f"   - shard {number}: {len(rows)} chunks")
+        info = {"shard": number, "document_count": len(rows), "corpus_sha256": corpus_sha256}
+        with span("build.compact"):
+            info["storage"] = _build_compact(shard_vecs, shard_dir)
+        with span("build.ann"):
+            info["ann"] = _build_ann(shard_vecs, shard_dir)
+        with span("build.bm25"):
+            bm25_info = bm25.subset(rows).save(shard_dir / BM25_NAME)
+            info["bm25"] = {**bm25_info, "corpus_sha256": corpus_sha256}
+        del shard_vecs
+        _write_json(shard_dir / INFO_NAME, info)
+        shards.append({"path": shard_dir.name, "documents": len(rows)})
+    return {"count": settings.INDEX_SHARDS, "by": by, "shards": shards}
+
+
+def _new_version_name(corpus_sha256: str) -> str:
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{corpus_sha256[:12]}"
+    suffix = 1
+    while (VERSIONS_DIR / name).exists():
+        suffix += 1
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{corpus_sha256[:12]}-{suffix}"
+    return name
+
+
+def _publish(version: str) -> None:
+    """Point CURRENT at ``version`` with an atomic rename, then drop surplus old versions."""
+    temp_path = CURRENT_PATH.with_name(CURRENT_PATH.name + ".tmp")
+    temp_path.write_text(version + "\n", encoding="utf-8")
+    temp_path.replace(CURRENT_PATH)
+
+    # Processes still serving an older version keep their open memory maps on POSIX; on
+    # Windows the files are in use, so deletion is retried after a later build.
+    keep = max(1, settings.INDEX_KEEP_VERSIONS)
+    for old in sorted(path for path in VERSIONS_DIR.iterdir() if path.is_dir())[:-keep]:
+        if old.name != version:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def build_index() -> str:
+    """Build a new index version from corpus.jsonl and publish it; returns the version name.
+
+    The build streams the corpus in INDEX_BATCH_SIZE batches into ``staging/``: vectors go
+    straight into a memory-mapped vectors.npy, metadata is appended to meta.jsonl together
+    with each chunk's precomputed sentence segmentation, and build_checkpoint.json records
+    the rows done after every batch, so a rerun over the same corpus and model resumes
+    from there. The finished directory is moved under
+    ``versions/`` and made live by rewriting CURRENT, which running processes poll.
+    With INDEX_SHARDS > 1 the vectors and search structures are split into that many
+    ``shard-NNN/`` directories instead (see ``_build_shards``).
+    """
+    with span("build"):
+        return _build_index()
+
+
+def _build_index() -> str:
     INDEX_DIR.mkdir(parents=True, exist_ok=True)
     if not DOCS_PATH.exists():
         raise FileNotFoundError(f"Missing {DOCS_PATH}. Run ingestion first.")
-    docs = [json.loads(line) for line in DOCS_PATH.open("r", encoding="utf-8")]
-    texts = [d["text"] for d in docs]
 
-    provider = settings.EMBEDDINGS_PROVIDER.lower()
-    model = settings.EMBEDDINGS_MODEL if provider == "openai" else settings.ST_MODEL
+    provider, model = embedding_model()
     print(f"🔧 building index using provider={provider}, model={model}")
 
-    vecs = embed_texts(texts).astype("float32")
-    norms = np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12
-    vecs = vecs / norms
-    np.save(VECS_PATH, vecs)
+    document_count, corpus_sha256 = _scan_corpus()
+    target = {
+        "provider": provider,
+        "model": model,
+        "corpus_sha256": corpus_sha256,
+        "document_count": document_count,
+        "segments": SEGMENTS_VERSION,
+    }
+    checkpoint = _load_checkpoint(target)
+    vecs_path, meta_path = STAGING_DIR / VECS_NAME, STAGING_DIR / META_NAME
+    if checkpoint:
+        done, counts = checkpoint["rows_done"], checkpoint["embeddings"]
+        vecs = np.load(vecs_path, mmap_mode="r+")
+        print(f"   - resuming from checkpoint at {done}/{document_count} chunks")
+    else:
+        shutil.rmtree(STAGING_DIR, ignore_errors=True)
+        STAGING_DIR.mkdir(parents=True)
+        done, counts, vecs = 0, {"reused": 0, "embedded": 0}, None
 
-    with META_PATH.open("w", encoding="utf-8") as f:
-        for document in docs:
-            f.write(json.dumps(document, ensure_ascii=False) + "\n")
+    batch_size = max(1, settings.INDEX_BATCH_SIZE)
+    with EmbeddingStore(EMBED_STORE_PATH) as store, meta_path.open(
+        "r+b" if checkpoint else "wb"
+    ) as meta_file:
+        meta_file.truncate(checkpoint["meta_bytes"] if checkpoint else 0)
+        meta_file.seek(0, os.SEEK_END)
+        for docs in _iter_batches(done, batch_size):
+            with span("build.embed"):
+                batch_vecs, reused, embedded = _embed_batch(store, docs, provider, model)
+            incr("build_embeddings", reused, source="store")
+            incr("build_embeddings", embedded, source="model")
+            if vecs is None:
+                vecs = np.lib.format.open_memmap(
+                    vecs_path,
+                    mode="w+",
+                    dtype=np.float32,
+                    shape=(document_count, batch_vecs.shape[1]),
+                )
+            vecs[done : done + len(docs)] = batch_vecs
+            vecs.flush()
+            meta_file.write(
+                "".join(
+                    json.dumps({**d, "segments": segment(d["text"])}, ensure_ascii=False) + "\n"
+                    for d in docs
+                ).encode("utf-8")
+            )
+            meta_file.flush()
+            os.fsync(meta_file.fileno())
+            done += len(docs)
+            counts = {
+                "reused": counts["reused"] + reused,
+                "embedded": counts["embedded"] + embedded,
+            }
+            checkpoint = {**target, "rows_done": done, "meta_bytes": meta_file.tell()}
+            _write_json(STAGING_DIR / CHECKPOINT_NAME, {**checkpoint, "embeddings": counts})
+        dropped = store.prune(_iter_chunk_ids())
 
+    if vecs is None:  # empty corpus
+        np.save(vecs_path, np.empty((0, 0), dtype=np.float32))
+    del vecs  # close the memory map before the directory is moved
+    embed_info = {**counts, "dropped": dropped}
+    print(
+        f"   - embeddings: {counts['reused']} reused, {counts['embedded']} embedded, "
+        f"{dropped} orphaned dropped"
+    )
+
+    vecs = np.load(vecs_path, mmap_mode="r")
+    version = _new_version_name(corpus_sha256)
     info = {
-        "provider": provider,
-        "model": model,
+        "version": version,
+        **target,
         "dimension": int(vecs.shape[1]),
-        "document_count": len(docs),
-        "corpus_sha256": hashlib.sha256(DOCS_PATH.read_bytes()).hexdigest(),
+        "embeddings": embed_info,
     }
-    INFO_PATH.write_text(json.dumps(info, indent=2), encoding="utf-8")
+    if settings.INDEX_SHARDS > 1:
+        with span("build.shards"):
+            info["shards"] = _build_shards(vecs, STAGING_DIR, corpus_sha256)
+    else:
+        with span("build.compact"):
+            info["storage"] = _build_compact(vecs, STAGING_DIR)
+        with span("build.ann"):
+            info["ann"] = _build_ann(vecs, STAGING_DIR)
+        with span("build.bm25"):
+            info["bm25"] = _build_bm25(STAGING_DIR, corpus_sha256)
+    del vecs
+    if "shards" in info:  # every row now lives in exactly one shard
+        vecs_path.unlink()
+    _write_json(STAGING_DIR / INFO_NAME, info)
+    (STAGING_DIR / CHECKPOINT_NAME).unlink(missing_ok=True)
+
+    VERSIONS_DIR.mkdir(parents=True, exist_ok=True)
+    STAGING_DIR.rename(VERSIONS_DIR / version)
+    _publish(version)
+
+    print(f"✅ Built dense index {version}: {document_count} chunks, dim={info['dimension']}")
+    print(f"   - {VERSIONS_DIR / version}")
+    return version
+
+
+def current_version() -> Optional[str]:
+    """Name of the published index version, or None for the legacy flat layout."""
+    if not CURRENT_PATH.exists():
+        return None
+    return CURRENT_PATH.read_text(encoding="utf-8").strip() or None
+
 
-    print(f"✅ Built dense index: {len(docs)} chunks, dim={vecs.shape[1]}")
-    print(f"   - {VECS_PATH}\n   - {META_PATH}")
+def index_dir(version: Optional[str] = None) -> Path:
+    """Directory holding ``version`` (default: the published one) or the legacy files."""
+    version = version or current_version()
+    return VERSIONS_DIR / version if version else INDEX_DIR
 
-def load_index() -> Tuple[np.ndarray, List[Dict]]:
-    vecs = np.load(VECS_PATH)
-    meta = [json.loads(line) for line in META_PATH.open("r", encoding="utf-8")]
+
+def read_info(directory: Optional[Path] = None) -> Dict:
+    """index_info.json of an index directory; {} for indexes built before it existed."""
+    path = (directory or index_dir()) / INFO_NAME
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def load_meta(directory: Optional[Path] = None) -> List[Dict]:
+    """Parse the chunk metadata of an index directory, in row order."""
+    directory = directory or index_dir()
+    with (directory / META_NAME).open("r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def load_vectors(directory: Optional[Path] = None) -> np.ndarray:
+    """Open the full-precision vectors of an index or shard directory memory-mapped."""
+    vecs = np.load((directory or index_dir()) / VECS_NAME, mmap_mode="r")
     if vecs.ndim != 2:
         raise ValueError(f"Invalid vector index shape: {vecs.shape}")
+    return vecs
+
+
+def load_shard_layout(directory: Optional[Path] = None) -> List[Tuple[Path, Optional[np.ndarray]]]:
+    """(directory, global row ids) of every shard; one (directory, None) when unsharded."""
+    directory = directory or index_dir()
+    shards = read_info(directory).get("shards")
+    if not shards:
+        return [(directory, None)]
+    layout = []
+    for shard in shards["shards"]:
+        shard_dir = directory / shard["path"]
+        rows = np.load(shard_dir / SHARD_ROWS_NAME)
+        if len(rows) != shard["documents"]:
+            raise ValueError(f"Index is corrupt: {shard['path']} row count differs")
+        layout.append((shard_dir, rows))
+    return layout
+
+
+def load_index(directory: Optional[Path] = None) -> Tuple[np.ndarray, List[Dict]]:
+    """Open the full-precision vectors memory-mapped and parse the chunk metadata.
+
+    Only for unsharded indexes; search opens a sharded one shard by shard.
+    """
+    directory = directory or index_dir()
+    if read_info(directory).get("shards"):
+        raise ValueError(f"{directory.name} is sharded; open it with load_shard_layout")
+    vecs, meta = load_vectors(directory), load_meta(directory)
     if len(vecs) != len(meta):
         raise ValueError("Index is corrupt: vector and metadata counts differ")
     return vecs, meta
+
+
+def load_ann_index(directory: Optional[Path] = None) -> Optional[AnnIndex]:
+    """Open the ANN index recorded in index_info.json, or None for brute-force search."""
+    directory = directory or index_dir()
+    ann_info = read_info(directory).get("ann")
+    if not ann_info:
+        return None
+    path = directory / ann_info["path"]
+    if ann_info["backend"] == "ivf":
+        return IVFIndex.load(path, settings.ANN_NPROBE)
+    return FaissIndex.load(path).configure(settings.ANN_NPROBE, settings.ANN_EF_SEARCH)
+
+
+def load_bm25_index(directory: Optional[Path] = None) -> Optional[BM25Index]:
+    """Memory-map the BM25 statistics recorded in index_info.json.
+
+    Returns None when the index has none or they were written by another tokenizer
+    version; raises ValueError when the file does not match index_info.json.
+    """
+    directory = directory or index_dir()
+    info = read_info(directory)
+    bm25_info = info.get("bm25")
+    if not bm25_info or bm25_info.get("tokenizer") != TOKENIZER_VERSION:
+        return None
+    if (
+        bm25_info["documents"] != info["document_count"]
+        or bm25_info["corpus_sha256"] != info["corpus_sha256"]
+    ):
+        raise ValueError("BM25 statistics were built from a different corpus")
+    path = directory / bm25_info["path"]
+    if path.stat().st_size != bm25_info["bytes"]:
+        raise ValueError(f"{path.name} is truncated or was modified after the build")
+    return BM25Index.load(path, bm25_info)
+
+
+def load_compact_vectors(directory: Optional[Path] = None) -> Optional[CompactVectors]:
+    """Open the float16/int8 copy recorded in index_info.json, if the index has one."""
+    directory = directory or index_dir()
+    storage = read_info(directory).get("storage")
+    if not storage or storage["dtype"] == "float32":
+        return None
+    return CompactVectors.load(directory, storage)
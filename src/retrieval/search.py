@@ -1,110 +1,473 @@
+import hashlib
+import heapq
 import logging
-import re
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
-from typing import Dict, List, Tuple
+from itertools import islice
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 
 import numpy as np
-from rank_bm25 import BM25Okapi
 
 from src.core.config import settings
-from src.retrieval.embeddings import embed_query
-from src.retrieval.index_faiss import load_index
+from src.core.metrics import incr, span
+from src.core.profiler import profile_call
+from src.core.result_cache import get_result_cache, result_key
+from src.llm.sentences import SEGMENTS_VERSION, segment
+from src.retrieval.bm25 import BM25Index, searchable_text, tokenize
+from src.retrieval.embedding_cache import normalize_query
+from src.retrieval.filters import MetadataIndex, SearchFilter
+from src.retrieval.fusion import Candidates, fuse
+from src.retrieval.embeddings import embed_queries
+from src.retrieval.ann import RERANK_FACTOR, AnnIndex
+from src.retrieval.index_faiss import (
+    META_NAME,
+    current_version,
+    index_dir,
+    load_ann_index,
+    load_bm25_index,
+    load_compact_vectors,
+    load_meta,
+    load_shard_layout,
+    load_vectors,
+    read_info,
+)
+from src.retrieval.vector_store import SCAN_BLOCK_BYTES, CompactVectors
 
 logger = logging.getLogger(__name__)
-TOKEN_RE = re.compile(r"[a-z0-9]+(?:['-][a-z0-9]+)?")
+DENSE_SHORTLIST_SLACK = 1e-3  # well above float32 matmul rounding for unit vectors
+_EMPTY: Candidates = (np.array([], dtype=int), np.array([], dtype=np.float32))
 
 
-def _tokenize(text: str) -> List[str]:
-    return TOKEN_RE.findall((text or "").lower())
+class IndexShard(NamedTuple):
+    """Dense and lexical structures over one shard's chunks."""
 
+    rows: Optional[np.ndarray]  # global row ids, ascending; None for an unsharded index
+    vectors: np.ndarray  # full precision, memory-mapped
+    bm25: BM25Index
+    ann: Optional[AnnIndex]
+    compact: Optional[CompactVectors]
 
-def _searchable_text(item: Dict) -> str:
-    """Include policy and section names so direct policy questions rank reliably."""
-    policy_name = str(item.get("policy_id", "")).replace("_", " ")
-    section_name = str(item.get("section", "")).replace("_", " ")
-    return f"{policy_name} {section_name} {item.get('text', '')}"
 
+class SearchIndex(NamedTuple):
+    """One loaded index generation; queries hold a reference for their whole run."""
 
-@lru_cache(maxsize=1)
-def _load_meta_corpus() -> Tuple[np.ndarray, List[Dict], BM25Okapi]:
-    vectors, meta = load_index()
-    if len(vectors) != len(meta):
-        raise ValueError("Index is corrupt: vector and metadata counts differ")
-    bm25 = BM25Okapi([_tokenize(_searchable_text(item)) for item in meta])
-    return vectors, meta, bm25
+    version: Optional[str]  # None for the legacy flat layout
+    fingerprint: str  # version plus corpus hash; part of every result cache key
+    meta: List[Dict]
+    shards: List[IndexShard]
+    metadata: MetadataIndex
+
+
+_generation: Optional[SearchIndex] = None
+_generation_lock = threading.Lock()
+_reload_thread: Optional[threading.Thread] = None
+_last_version_check = 0.0
+
+
+def _fingerprint(version: Optional[str], directory) -> str:
+    corpus_sha256 = read_info(directory).get("corpus_sha256")
+    if corpus_sha256 is None:  # legacy index without index_info.json
+        corpus_sha256 = hashlib.sha256((directory / META_NAME).read_bytes()).hexdigest()
+    return f"{version or 'legacy'}:{corpus_sha256}"
+
+
+def _load_bm25(directory, meta: List[Dict], rows: Optional[np.ndarray]) -> BM25Index:
+    """BM25 statistics persisted by build_index, or built from ``meta`` for older indexes.
+
+    A shard's fallback is sliced from statistics over the whole corpus so that its scores
+    still match the unsharded index.
+    """
+    try:
+        bm25 = load_bm25_index(directory)
+    except (OSError, ValueError) as exc:
+        logger.warning("Rebuilding BM25 statistics for %s: %s", directory, exc)
+        bm25 = None
+    if bm25 is not None and len(bm25) == (len(meta) if rows is None else len(rows)):
+        return bm25
+    bm25 = BM25Index.build([tokenize(searchable_text(item)) for item in meta])
+    return bm25 if rows is None else bm25.subset(rows)
+
+
+def _load_generation(version: Optional[str]) -> SearchIndex:
+    directory = index_dir(version)
+    with span("index.load"):
+        with span("index.load.vectors_meta"):
+            meta = load_meta(directory)
+            layout = load_shard_layout(directory)
+            vectors = [load_vectors(path) for path, _ in layout]
+            for rows, shard_vectors in zip((rows for _, rows in layout), vectors):
+                if len(shard_vectors) != (len(meta) if rows is None else len(rows)):
+                    raise ValueError("Index is corrupt: vector and metadata counts differ")
+        if read_info(directory).get("segments") != SEGMENTS_VERSION:
+            # Built before (or with an older) sentence segmentation: redo it once per load.
+            with span("index.load.segments"):
+                for item in meta:
+                    item["segments"] = segment(item.get("text", ""))
+        with span("index.load.bm25"):
+            bm25s = [_load_bm25(path, meta, rows) for path, rows in layout]
+        with span("index.load.ann"):
+            anns = [load_ann_index(path) for path, _ in layout]
+            compacts = [load_compact_vectors(path) for path, _ in layout]
+        with span("index.load.metadata"):
+            metadata = MetadataIndex.build(meta)
+        incr("index_loads")
+        shards = [
+            IndexShard(rows, *structures)
+            for (_, rows), *structures in zip(layout, vectors, bm25s, anns, compacts)
+        ]
+        return SearchIndex(version, _fingerprint(version, directory), meta, shards, metadata)
+
+
+def _reload(version: Optional[str]) -> None:
+    global _generation
+    try:
+        generation = _load_generation(version)
+    except Exception as exc:
+        logger.warning("Could not load index version %s; keeping the current one: %s", version, exc)
+        return
+    with _generation_lock:
+        _generation = generation
+    logger.info("Switched to index version %s", version)
+
+
+def _check_for_new_version(generation: SearchIndex) -> None:
+    """Start a background load when CURRENT names a different version than ``generation``."""
+    global _last_version_check, _reload_thread
+    interval = settings.INDEX_RELOAD_INTERVAL
+    now = time.monotonic()
+    if interval < 0 or now - _last_version_check < interval:
+        return
+    with _generation_lock:
+        if now - _last_version_check < interval or (
+            _reload_thread is not None and _reload_thread.is_alive()
+        ):
+            return
+        _last_version_check = now
+        version = current_version()
+        if version == generation.version:
+            return
+        _reload_thread = threading.Thread(
+            target=_reload, args=(version,), name="index-reload", daemon=True
+        )
+        _reload_thread.start()
+
+
+def _load_meta_corpus() -> SearchIndex:
+    """Return the live index generation, loading it synchronously only on first use.
+
+    A newly published version is loaded on a background thread and swapped in by
+    reference, so queries never wait for a reload and finish on the generation they
+    started with.
+    """
+    global _generation, _last_version_check
+    generation = _generation
+    if generation is None:
+        with _generation_lock:
+            if _generation is None:
+                _generation = _load_generation(current_version())
+                _last_version_check = time.monotonic()
+            return _generation
+    _check_for_new_version(generation)
+    return generation
+
+
+def loaded_index() -> Optional[SearchIndex]:
+    """The generation currently serving queries, or None before the first load."""
+    return _generation
+
+
+def index_fingerprint() -> str:
+    """Fingerprint of the live index generation (version plus corpus hash)."""
+    return _load_meta_corpus().fingerprint
 
 
 def clear_search_cache() -> None:
-    """Reload index files after rebuilding them in a long-running process."""
-    _load_meta_corpus.cache_clear()
+    """Drop the loaded generation; the next query reloads the published index."""
+    global _generation, _last_version_check
+    with _generation_lock:
+        _generation = None
+        _last_version_check = 0.0
 
 
-def _normalize(arr: np.ndarray) -> np.ndarray:
-    arr = np.asarray(arr, dtype=np.float32)
-    if arr.size == 0:
-        return arr
-    minimum, maximum = float(arr.min()), float(arr.max())
-    if maximum - minimum < 1e-9:
-        return np.ones_like(arr) if maximum > 0 else np.zeros_like(arr)
-    return (arr - minimum) / (maximum - minimum)
+def _shortlist(coarse_scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Rows whose coarse score is within rounding distance of the k-th best."""
+    if coarse_scores.size <= top_k:
+        return np.arange(coarse_scores.size)
+    threshold = np.partition(coarse_scores, -top_k)[-top_k] - DENSE_SHORTLIST_SLACK
+    return np.flatnonzero(coarse_scores >= threshold)
 
 
-def hybrid_search(query: str) -> List[Dict]:
-    query_tokens = _tokenize(query)
-    if not query_tokens:
-        return []
+def _rescore_dense(
+    vectors: np.ndarray, shortlist: np.ndarray, query_vector: np.ndarray, top_k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Re-rank candidate rows with per-row dot products that do not depend on batch size.
+
+    BLAS rounds a matrix-matrix product differently from a matrix-vector one, and ANN
+    indexes only approximate scores, so the final order always comes from exact scores,
+    ties broken by corpus order.
+    """
+    if top_k <= 0 or shortlist.size == 0:
+        return np.array([], dtype=int), np.array([], dtype=np.float32)
+    exact_scores = np.einsum("ij,j->i", vectors[shortlist], query_vector)
+    order = np.lexsort((shortlist, -exact_scores))[:top_k]
+    return shortlist[order], exact_scores[order]
+
+
+def _subset_scores(
+    vectors: np.ndarray, rows: np.ndarray, query_vectors: np.ndarray
+) -> np.ndarray:
+    """Inner products with only ``rows`` of ``vectors``, gathered a block at a time."""
+    scores = np.empty((len(query_vectors), len(rows)), dtype=np.float32)
+    block = max(1024, SCAN_BLOCK_BYTES // (4 * max(1, vectors.shape[1])))
+    for start in range(0, len(rows), block):
+        chunk = np.asarray(vectors[rows[start : start + block]], dtype=np.float32)
+        scores[:, start : start + len(chunk)] = query_vectors @ chunk.T
+    return scores
+
+
+@lru_cache(maxsize=None)
+def _shard_pool(workers: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard-search")
 
-    vectors, meta, bm25 = _load_meta_corpus()
-    top_k = settings.TOP_K
 
-    dense_idxs = np.array([], dtype=int)
-    dense_normalized = np.array([], dtype=np.float32)
-    if settings.USE_DENSE and vectors.size:
-        try:
-            query_vector = embed_query(query).astype("float32")
-            if vectors.ndim != 2 or query_vector.ndim != 1 or vectors.shape[1] != query_vector.shape[0]:
+def _merge_top_k(parts: Sequence[Candidates], top_k: int) -> Candidates:
+    """Global top ``top_k`` of per-shard lists that are each ordered by score, then row."""
+    if len(parts) == 1:
+        return parts[0]
+    ranked = heapq.merge(*(zip((-scores).tolist(), ids.tolist()) for ids, scores in parts))
+    best = list(islice(ranked, top_k))
+    dtype = np.result_type(*(scores for _, scores in parts)) if parts else np.float64
+    return (
+        np.array([row for _, row in best], dtype=np.int64),
+        np.array([-score for score, _ in best], dtype=dtype),
+    )
+
+
+def _fan_out(
+    shards: List[IndexShard],
+    task: Callable[[IndexShard], List[Candidates]],
+    count: int,
+    top_k: int,
+) -> List[Candidates]:
+    """Run ``task`` on every shard and merge each of the ``count`` queries' lists.
+
+    Shards are searched concurrently on SEARCH_SHARD_WORKERS threads; the heavy parts
+    (matrix products, posting-list arithmetic) run in NumPy with the GIL released.
+    """
+    workers = settings.SEARCH_SHARD_WORKERS or min(len(shards), os.cpu_count() or 1)
+    if len(shards) > 1 and workers > 1:
+        per_shard = list(_shard_pool(workers).map(task, shards))
+    else:
+        per_shard = [task(shard) for shard in shards]
+    return [_merge_top_k([lists[query] for lists in per_shard], top_k) for query in range(count)]
+
+
+def _local_rows(shard: IndexShard, allowed: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    """The sorted global rows ``allowed`` that live in ``shard``, as shard rows."""
+    if allowed is None or shard.rows is None:
+        return allowed
+    positions = np.searchsorted(shard.rows, allowed)
+    found = positions < len(shard.rows)
+    found[found] = shard.rows[positions[found]] == allowed[found]
+    return positions[found]
+
+
+def _global(shard: IndexShard, candidates: Candidates) -> Candidates:
+    ids, scores = candidates
+    return (ids, scores) if shard.rows is None else (shard.rows[ids], scores)
+
+
+def _dense_shard(
+    shard: IndexShard,
+    query_vectors: np.ndarray,
+    top_k: int,
+    allowed: Optional[np.ndarray],
+) -> List[Candidates]:
+    """Exact top ``top_k`` rows of one shard per query vector, in global row ids."""
+    vectors = shard.vectors
+    candidate_index: Optional[Union[AnnIndex, CompactVectors]] = (
+        shard.ann if shard.ann is not None else shard.compact
+    )
+    allowed = _local_rows(shard, allowed)
+    if allowed is not None and allowed.size == 0:
+        return [_EMPTY] * len(query_vectors)
+    if allowed is not None:
+        coarse = _subset_scores(vectors, allowed, query_vectors)
+        shortlists = [allowed[_shortlist(row, top_k)] for row in coarse]
+    elif candidate_index is None:
+        shortlists = [_shortlist(row, top_k) for row in query_vectors @ vectors.T]
+    else:
+        shortlists = candidate_index.search(query_vectors, top_k * RERANK_FACTOR)
+
+    candidates = []
+    for shortlist, query_vector in zip(shortlists, query_vectors):
+        incr("search_candidates", len(shortlist), source="dense_shortlist")
+        candidates.append(_global(shard, _rescore_dense(vectors, shortlist, query_vector, top_k)))
+    return candidates
+
+
+def _dense_candidates(
+    queries: List[str],
+    index: SearchIndex,
+    top_k: int,
+    allowed: Optional[np.ndarray] = None,
+) -> List[Candidates]:
+    """Embed all queries in one (cached) call and rank them with a single matrix-matrix product.
+
+    With an ANN index the product is replaced by an approximate candidate search, so
+    cost no longer grows linearly with the number of indexed chunks; with a compact
+    float16/int8 copy the product runs on that copy instead of the float32 vectors.
+    When ``allowed`` rows are given, only those rows are scored, exactly. Scores are the
+    raw inner products; fusion normalizes them. A sharded index does this per shard and
+    merges the shards' exact top ``top_k``.
+    """
+    if not (settings.USE_DENSE and queries and any(shard.vectors.size for shard in index.shards)):
+        return [_EMPTY] * len(queries)
+    if allowed is not None and allowed.size == 0:
+        return [_EMPTY] * len(queries)
+    try:
+        with span("search.embed_query"):
+            query_vectors = embed_queries(queries).astype("float32")
+        for shard in index.shards:
+            vectors = shard.vectors
+            if query_vectors.ndim != 2 or vectors.shape[1] != query_vectors.shape[1]:
                 raise ValueError(
-                    f"Index dimension {vectors.shape} does not match query dimension {query_vector.shape}"
+                    f"Index dimension {vectors.shape} does not match query dimension "
+                    f"{query_vectors.shape[1:]}"
                 )
-            query_vector /= np.linalg.norm(query_vector) + 1e-12
-            dense_scores = vectors @ query_vector
-            dense_idxs = np.argsort(dense_scores)[::-1][:top_k]
-            dense_normalized = _normalize(dense_scores[dense_idxs])
-        except Exception as exc:
-            logger.warning("Dense retrieval unavailable; using BM25 only: %s", exc)
-
-    bm25_scores = bm25.get_scores(query_tokens)
-    positive_bm25 = np.flatnonzero(bm25_scores > 0)
-    bm25_idxs = positive_bm25[np.argsort(bm25_scores[positive_bm25])[::-1]][:top_k]
-    bm25_normalized = _normalize(bm25_scores[bm25_idxs])
-
-    candidates = set(dense_idxs.tolist()) | set(bm25_idxs.tolist())
-    dense_positions = {idx: pos for pos, idx in enumerate(dense_idxs)}
-    bm25_positions = {idx: pos for pos, idx in enumerate(bm25_idxs)}
-    results = []
-
-    for idx in candidates:
-        dense_score = (
-            float(dense_normalized[dense_positions[idx]]) if idx in dense_positions else 0.0
-        )
-        bm25_score = (
-            float(bm25_normalized[bm25_positions[idx]]) if idx in bm25_positions else 0.0
+        query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True) + 1e-12
+        with span("search.dense_scan"):
+            return _fan_out(
+                index.shards,
+                lambda shard: _dense_shard(shard, query_vectors, top_k, allowed),
+                len(queries),
+                top_k,
+            )
+    except Exception as exc:
+        logger.warning("Dense retrieval unavailable; using BM25 only: %s", exc)
+        incr("dense_fallbacks", len(queries), error=type(exc).__name__)
+        return [_EMPTY] * len(queries)
+
+
+def _lexical_shard(
+    shard: IndexShard,
+    token_lists: List[List[str]],
+    top_k: int,
+    allowed: Optional[np.ndarray],
+) -> List[Candidates]:
+    lists = shard.bm25.top_k_many(token_lists, top_k, _local_rows(shard, allowed))
+    return [_global(shard, candidates) for candidates in lists]
+
+
+def _hit(item: Dict, score: float) -> Dict:
+    return {
+        "text": item["text"],
+        "source": item.get(
+            "source", f"policy://{item.get('policy_id', 'unknown')}/{item.get('section', '')}"
+        ),
+        "score": score,
+        "policy_id": item.get("policy_id"),
+        "section": item.get("section"),
+        "effective_from": item.get("effective_from"),
+        "segments": item.get("segments"),
+    }
+
+
+def hybrid_search_many(
+    queries: List[str], filters: Optional[SearchFilter] = None
+) -> List[List[Dict]]:
+    """Search several questions at once; each hit list matches ``hybrid_search``.
+
+    Queries share one embedding call, one dense matrix product and one BM25 pass
+    that scores each distinct query term only once. Results are cached per index
+    version, so repeated questions skip retrieval entirely. ``filters`` limits every
+    query to matching chunks before anything is scored.
+    """
+    with profile_call("search", " | ".join(queries)), span("search"):
+        return _search_many(queries, filters)
+
+
+def _search_many(queries: List[str], filters: Optional[SearchFilter]) -> List[List[Dict]]:
+    token_lists = [tokenize(query) for query in queries]
+    active = [position for position, tokens in enumerate(token_lists) if tokens]
+    results: List[List[Dict]] = [[] for _ in queries]
+    if not active:
+        return results
+
+    with span("search.load_index"):
+        index = _load_meta_corpus()
+    incr("search_queries", len(active))
+    top_k = settings.TOP_K
+    cache = get_result_cache()
+    keys: Dict[int, str] = {}
+    if cache.enabled:
+        settings_key = (
+            top_k,
+            settings.USE_DENSE,
+            settings.MIN_RELEVANCE_SCORE,
+            settings.FUSION_DENSE_WEIGHT,
+            settings.FUSION_METHOD,
+            settings.FUSION_RRF_K,
         )
-        score = 0.6 * dense_score + 0.4 * bm25_score if dense_normalized.size else bm25_score
-        if score < settings.MIN_RELEVANCE_SCORE:
-            continue
-        item = meta[idx]
-        results.append(
-            {
-                "text": item["text"],
-                "source": item.get(
-                    "source", f"policy://{item.get('policy_id', 'unknown')}/{item.get('section', '')}"
-                ),
-                "score": score,
-                "policy_id": item.get("policy_id"),
-                "section": item.get("section"),
-                "effective_from": item.get("effective_from"),
-            }
+        filter_key = filters.cache_key() if filters is not None else None
+        misses = []
+        for position in active:
+            keys[position] = result_key(
+                "search",
+                index.fingerprint,
+                normalize_query(queries[position]),
+                settings_key,
+                filter_key,
+            )
+            cached = cache.get(keys[position])
+            if cached is None:
+                misses.append(position)
+            else:
+                results[position] = cached
+        incr("result_cache", len(active) - len(misses), kind="search", result="hit")
+        incr("result_cache", len(misses), kind="search", result="miss")
+        active = misses
+        if not active:
+            return results
+
+    with span("search.filter"):
+        allowed = index.metadata.rows(filters)
+    if allowed is not None and allowed.size == 0:
+        return results
+    dense = _dense_candidates([queries[position] for position in active], index, top_k, allowed)
+    with span("search.bm25"):
+        lexical = _fan_out(
+            index.shards,
+            lambda shard: _lexical_shard(
+                shard, [token_lists[position] for position in active], top_k, allowed
+            ),
+            len(active),
+            top_k,
         )
+    with span("search.fuse"):
+        for position, dense_candidates, lexical_candidates in zip(active, dense, lexical):
+            incr("search_candidates", len(dense_candidates[0]), source="dense")
+            incr("search_candidates", len(lexical_candidates[0]), source="bm25")
+            idxs, scores = fuse(
+                dense_candidates,
+                lexical_candidates,
+                top_k,
+                settings.FUSION_METHOD,
+                settings.FUSION_DENSE_WEIGHT,
+                settings.MIN_RELEVANCE_SCORE,
+                settings.FUSION_RRF_K,
+            )
+            results[position] = [
+                _hit(index.meta[idx], score) for idx, score in zip(idxs.tolist(), scores.tolist())
+            ]
+            incr("search_hits", len(results[position]))
+            if position in keys:
+                cache.put(keys[position], results[position])
+    return results
+
 
-    return sorted(results, key=lambda item: item["score"], reverse=True)[:top_k]
+def hybrid_search(query: str, filters: Optional[SearchFilter] = None) -> List[Dict]:
+    return hybrid_search_many([query], filters)[0]
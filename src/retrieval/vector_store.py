@@ -0,0 +1,85 @@
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+SCAN_BLOCK_BYTES = 16 * 1024 * 1024  # float32 working set per block of the coarse scan
+STORAGE_DTYPES = {"float32", "float16", "int8"}
+
+
+class CompactVectors:
+    """Reduced-precision, memory-mapped copy of the index used only to shortlist rows.
+
+    ``float16`` halves the matrix; ``int8`` stores per-dimension affine codes
+    (``x ≈ offset + code * scale``) for a 4x cut. Both are scanned in blocks converted to
+    float32, and the shortlisted rows are rescored against the full-precision vectors.
+    """
+
+    def __init__(
+        self,
+        codes: np.ndarray,
+        offset: Optional[np.ndarray] = None,
+        scale: Optional[np.ndarray] = None,
+    ):
+        self.codes = codes
+        self.offset = offset
+        self.scale = scale
+
+    @property
+    def dtype(self) -> str:
+        return str(self.codes.dtype)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @classmethod
+    def quantize(cls, vectors: np.ndarray, dtype: str) -> "CompactVectors":
+        if dtype == "float16":
+            return cls(np.asarray(vectors, dtype=np.float16))
+        if dtype != "int8":
+            raise ValueError(f"Unsupported compact vector dtype: {dtype}")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        minimum, maximum = vectors.min(axis=0), vectors.max(axis=0)
+        offset = ((maximum + minimum) / 2).astype(np.float32)
+        scale = np.maximum((maximum - minimum) / 254, 1e-12).astype(np.float32)
+        codes = np.clip(np.rint((vectors - offset) / scale), -127, 127).astype(np.int8)
+        return cls(codes, offset, scale)
+
+    def _block_rows(self) -> int:
+        return max(1024, SCAN_BLOCK_BYTES // (4 * max(1, self.codes.shape[1])))
+
+    def scores(self, query_vectors: np.ndarray) -> np.ndarray:
+        """Approximate inner products, shape (queries, rows), without densifying the matrix."""
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        if self.scale is not None:
+            # The offset term is identical for every row, so it cannot change the ranking.
+            query_vectors = query_vectors * self.scale
+        scores = np.empty((len(query_vectors), len(self.codes)), dtype=np.float32)
+        block = self._block_rows()
+        for start in range(0, len(self.codes), block):
+            rows = self.codes[start : start + block].astype(np.float32)
+            scores[:, start : start + len(rows)] = query_vectors @ rows.T
+        return scores
+
+    def search(self, query_vectors: np.ndarray, count: int) -> List[np.ndarray]:
+        """Top ``count`` candidate rows per query by approximate score."""
+        scores = self.scores(query_vectors)
+        if count >= scores.shape[1]:
+            return [np.arange(scores.shape[1]) for _ in scores]
+        return [np.argpartition(-row, count - 1)[:count] for row in scores]
+
+    def save(self, codes_path: Path, params_path: Path) -> Dict:
+        np.save(codes_path, self.codes)
+        info = {"dtype": self.dtype, "path": codes_path.name}
+        if self.scale is not None:
+            np.save(params_path, np.stack([self.offset, self.scale]))
+            info["params_path"] = params_path.name
+        return info
+
+    @classmethod
+    def load(cls, directory: Path, info: Dict) -> "CompactVectors":
+        codes = np.load(directory / info["path"], mmap_mode="r")
+        if "params_path" not in info:
+            return cls(codes)
+        offset, scale = np.load(directory / info["params_path"])
+        return cls(codes, offset, scale)
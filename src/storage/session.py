@@ -1,9 +1,23 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from functools import lru_cache
+
 from src.core.config import settings
 
-_engine = create_engine(settings.DATABASE_URL or "sqlite:///smarthr_dev.db", echo=False, future=True)
-SessionLocal = sessionmaker(bind=_engine, autoflush=False, autocommit=False, future=True)
+
+@lru_cache(maxsize=1)
+def get_engine():
+    """Create the SQLAlchemy engine on first use so importing storage costs nothing."""
+    from sqlalchemy import create_engine
+
+    url = settings.DATABASE_URL or "sqlite:///smarthr_dev.db"
+    return create_engine(url, echo=False, future=True)
+
+
+@lru_cache(maxsize=1)
+def _session_factory():
+    from sqlalchemy.orm import sessionmaker
+
+    return sessionmaker(bind=get_engine(), autoflush=False, autocommit=False, future=True)
+
 
 def get_session():
-    return SessionLocal()
+    return _session_factory()()
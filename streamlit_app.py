@@ -10,7 +10,7 @@ if str(ROOT) not in sys.path:
 # ---- imports ----
 import streamlit as st  # noqa: E402
 from src.core.config import settings  # noqa: E402
-from src.llm.generator import generate_answer  # noqa: E402
+from src.llm.generator import generate_answer_stream  # noqa: E402
 from src.retrieval.search import hybrid_search  # noqa: E402
 
 # ---- page config ----
@@ -363,21 +363,23 @@ with col2:
     }[style_label]
 
     if submitted and q.strip():
-        with st.spinner('🔍 Searching and generating answer...'):
-            try:
+        try:
+            with st.spinner('🔍 Searching policies...'):
                 hits = hybrid_search(q.strip())
-                st.session_state["last_hits"] = hits
-                
-                # Render Markdown natively inside a bordered response card.
-                st.markdown("---")
-                st.markdown('<h3 class="section-heading">✨ Answer</h3>', unsafe_allow_html=True)
-                answer = generate_answer(q, hits, style=style)
-                with st.container(border=True):
-                    st.markdown(answer)
-                
-            except Exception as e:
-                st.error("❌ Error while answering:")
-                st.exception(e)
+            st.session_state["last_hits"] = hits
+
+            # Render Markdown natively inside a bordered response card, redrawing it as
+            # LLM tokens arrive (title and sources show up first).
+            st.markdown("---")
+            st.markdown('<h3 class="section-heading">✨ Answer</h3>', unsafe_allow_html=True)
+            with st.container(border=True):
+                answer_slot = st.empty()
+                for answer in generate_answer_stream(q, hits, style=style):
+                    answer_slot.markdown(answer)
+
+        except Exception as e:
+            st.error("❌ Error while answering:")
+            st.exception(e)
 
     # ---- Retrieved snippets section ----
     if st.session_state.get("last_hits"):
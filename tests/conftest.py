@@ -0,0 +1,29 @@
+import pytest
+
+from src.core.config import settings
+from src.core.result_cache import get_result_cache
+from src.llm.semantic_cache import get_semantic_cache
+from src.retrieval.embedding_cache import get_query_cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_query_cache(tmp_path, monkeypatch):
+    """Keep cached query embeddings from leaking between tests or into data/cache."""
+    cache_path = tmp_path / "query_embeddings.sqlite"
+    monkeypatch.setattr(settings, "QUERY_EMBED_CACHE_PATH", str(cache_path))
+    get_query_cache.cache_clear()
+    yield
+    get_query_cache.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def no_result_caches(monkeypatch):
+    """Tests exercise retrieval itself; the ones covering the result caches enable them."""
+    monkeypatch.setattr(settings, "RESULT_CACHE_SIZE", 0)
+    monkeypatch.setattr(settings, "RESULT_CACHE_PATH", "")
+    monkeypatch.setattr(settings, "SEMANTIC_CACHE_STYLES", "")
+    get_result_cache.cache_clear()
+    get_semantic_cache.cache_clear()
+    yield
+    get_result_cache.cache_clear()
+    get_semantic_cache.cache_clear()
@@ -0,0 +1,159 @@
+"""Minimal OpenAI-compatible server for tests.
+
+Serves ``POST /v1/chat/completions`` both as one JSON response and as a server-sent
+event stream, one chunk per configured token. ``fail_after`` drops the connection
+after that many streamed tokens to simulate a stream failing midway.
+
+``POST /v1/embeddings`` returns deterministic vectors derived from each input text.
+``fail_statuses`` lists HTTP errors (e.g. 429) returned to the first requests, and
+``delay`` slows every response so tests can observe concurrency.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence
+
+
+def fake_embedding(text: str, dimension: int = 8) -> List[float]:
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [byte / 255 - 0.5 for byte in digest[:dimension]]
+
+
+class FakeOpenAIServer:
+    def __init__(
+        self,
+        tokens: Sequence[str] = (),
+        fail_after: Optional[int] = None,
+        delay: float = 0.0,
+        fail_statuses: Sequence[int] = (),
+    ):
+        self.tokens = list(tokens)
+        self.fail_after = fail_after
+        self.delay = delay
+        self.fail_statuses = list(fail_statuses)
+        self.requests: List[Dict] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.requests.append(request)
+                    status = fake.fail_statuses.pop(0) if fake.fail_statuses else None
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    time.sleep(fake.delay)
+                    if status is not None:
+                        self._send_json({"error": {"message": "injected", "type": "test"}}, status)
+                    elif self.path.endswith("/embeddings"):
+                        self._embed(request)
+                    elif request.get("stream"):
+                        self._stream(request)
+                    else:
+                        self._complete(request)
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+            def _send_json(self, payload: Dict, status: int = 200) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _embed(self, request: Dict) -> None:
+                data = [
+                    {"object": "embedding", "index": index, "embedding": fake_embedding(text)}
+                    for index, text in enumerate(request["input"])
+                ]
+                self._send_json(
+                    {
+                        "object": "list",
+                        "data": data[::-1],  # the API does not promise input order
+                        "model": request["model"],
+                        "usage": {"prompt_tokens": 1, "total_tokens": 1},
+                    }
+                )
+
+            def _chunk(self, request: Dict, delta: Dict, finish: Optional[str] = None) -> Dict:
+                return {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": request["model"],
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                }
+
+            def _stream(self, request: Dict) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                events = [self._chunk(request, {"role": "assistant", "content": ""})]
+                events += [self._chunk(request, {"content": token}) for token in fake.tokens]
+                events.append(self._chunk(request, {}, "stop"))
+                for number, event in enumerate(events):
+                    if fake.fail_after is not None and number > fake.fail_after:
+                        self.wfile.write(b"data: {\"truncated")
+                        self.wfile.flush()
+                        self.close_connection = True
+                        return
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(fake.delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def _complete(self, request: Dict) -> None:
+                self._send_json(
+                    {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": request["model"],
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": {"role": "assistant", "content": "".join(fake.tokens)},
+                                "finish_reason": "stop",
+                            }
+                        ],
+                        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                    }
+                )
+
+        return Handler
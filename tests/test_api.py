@@ -0,0 +1,115 @@
+import asyncio
+import http.client
+import json
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from src.api import server
+from src.api.server import QueryServer
+from src.llm.generator import generate_answer
+from src.retrieval.filters import SearchFilter
+from src.retrieval.search import clear_search_cache, hybrid_search
+
+
+@contextmanager
+def running_server(**kwargs):
+    """Run a QueryServer on an ephemeral port in a background event loop."""
+    loop = asyncio.new_event_loop()
+    query_server = QueryServer(**kwargs)
+    port = loop.run_until_complete(query_server.start("127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield port
+    finally:
+        asyncio.run_coroutine_threadsafe(query_server.close(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+
+
+def request(port, method, path, payload=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        body = json.dumps(payload) if payload is not None else None
+        connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def wait_until_ready(port):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        status, body = request(port, "GET", "/ready")
+        if status == 200:
+            return body
+        time.sleep(0.02)
+    raise AssertionError("index never became ready")
+
+
+def test_search_and_answer_endpoints_match_library_calls():
+    clear_search_cache()
+    with running_server(workers=2) as port:
+        ready = wait_until_ready(port)
+        assert ready["index"]["version"] == "legacy"
+        assert request(port, "GET", "/health")[1]["index"] == ready["index"]
+
+        query = "How many PTO days carry over?"
+        expected_hits = hybrid_search(query)
+        status, body = request(port, "POST", "/search", {"query": query})
+        assert status == 200
+        assert body["hits"] == [
+            {key: value for key, value in hit.items() if key != "segments"}
+            for hit in expected_hits
+        ]
+
+        status, body = request(port, "POST", "/answer", {"query": query, "style": "paragraph"})
+        assert status == 200
+        assert body["answer"] == generate_answer(query, expected_hits, "paragraph")
+
+        policy = expected_hits[0]["policy_id"]
+        params = urlencode({"query": query, "policy_id": policy})
+        status, body = request(port, "GET", f"/search?{params}")
+        assert status == 200
+        assert body["hits"] and {hit["policy_id"] for hit in body["hits"]} == {policy}
+        assert len(body["hits"]) == len(hybrid_search(query, SearchFilter.of(policy_ids=policy)))
+
+        assert request(port, "POST", "/search", {"query": "  "})[0] == 400
+        for as_of in [20250101, "20250101", "2025-13-01", "next week", "2025-06-01"]:
+            status = request(port, "POST", "/search", {"query": query, "effective_as_of": as_of})[0]
+            assert status == (200 if as_of == "2025-06-01" else 400), as_of
+        assert request(port, "POST", "/answer", {"query": query, "style": "haiku"})[0] == 400
+        assert request(port, "GET", "/answer")[0] == 405
+        assert request(port, "GET", "/missing")[0] == 404
+
+
+def test_requests_beyond_the_pending_limit_are_refused(monkeypatch):
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_search(query, search_filter=None):
+        started.set()
+        release.wait(timeout=10)
+        return []
+
+    monkeypatch.setattr(server, "hybrid_search", slow_search)
+    with running_server(workers=1, max_pending=0) as port:
+        wait_until_ready(port)
+        results = []
+        first = threading.Thread(
+            target=lambda: results.append(request(port, "POST", "/search", {"query": "pto"}))
+        )
+        first.start()
+        assert started.wait(timeout=10)
+        try:
+            status, body = request(port, "POST", "/search", {"query": "pto"})
+            assert status == 503
+            assert request(port, "GET", "/health")[0] == 200
+        finally:
+            release.set()
+            first.join(timeout=10)
+        assert [(status, body["hits"]) for status, body in results] == [(200, [])]
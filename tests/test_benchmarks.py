@@ -0,0 +1,34 @@
+import numpy as np
+
+from benchmarks.run import compare, run_scale
+from benchmarks.synthetic import fake_embed_texts
+from src.retrieval import index_faiss
+
+
+def _results(search_p95: float, build_s: float) -> dict:
+    metrics = {"chunks": 1000, "build_s": build_s, "search_ms": {"p95": search_p95}}
+    return {"results": {"1k": metrics}}
+
+
+def test_compare_flags_only_meaningful_slowdowns():
+    baseline = _results(search_p95=10.0, build_s=2.0)
+    assert compare(_results(12.0, 2.4), baseline, threshold=0.25) == []
+    assert compare(_results(14.0, 2.0), baseline, threshold=0.25) == [
+        "1k.search_ms.p95: 14ms vs baseline 10ms"
+    ]
+    # A large ratio on a tiny absolute difference is noise.
+    assert compare(_results(0.2, 0.01), _results(0.1, 0.005), threshold=0.25) == []
+
+
+def test_small_benchmark_run_covers_every_stage(tmp_path):
+    index_dir = index_faiss.INDEX_DIR
+    result = run_scale(120, tmp_path, queries=10)
+
+    assert result["chunks"] == 120
+    assert result["build_s"] > 0 and result["load_generation_s"] > 0
+    assert set(result["answer_ms"]) == {"bullets", "paragraph"}
+    assert result["search_ms"]["p50"] <= result["search_ms"]["p99"]
+    assert index_faiss.INDEX_DIR == index_dir  # module state restored afterwards
+    vectors = fake_embed_texts(["PTO carryover", "PTO carryover", ""])
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert np.array_equal(vectors[0], vectors[1])
@@ -0,0 +1,105 @@
+import random
+
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+
+from src.retrieval import bm25
+from src.retrieval.bm25 import BM25Index, searchable_text, tokenize
+from src.retrieval.index_faiss import load_index
+
+
+def _reference_top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    positive = np.flatnonzero(scores > 0)
+    return positive[np.lexsort((positive, -scores[positive]))][:k]
+
+
+def test_scores_match_rank_bm25_on_indexed_policies():
+    _, metadata = load_index()
+    corpus = [tokenize(searchable_text(item)) for item in metadata]
+    reference, index = BM25Okapi(corpus), BM25Index.build(corpus)
+
+    for question in ["What is the PTO carryover policy?", "dress code", "overtime overtime pay"]:
+        tokens = tokenize(question)
+        expected = reference.get_scores(tokens)
+        assert np.array_equal(index.get_scores(tokens), expected)
+        docs, scores = index.top_k(tokens, 6)
+        assert docs.tolist() == _reference_top_k(expected, 6).tolist()
+        assert np.array_equal(scores, expected[docs])
+
+
+@pytest.mark.parametrize("share", [0.0, float("inf")], ids=["dense", "sparse"])
+def test_pruned_top_k_matches_exhaustive_ranking(monkeypatch, share):
+    monkeypatch.setattr(bm25, "DENSE_ACCUMULATOR_SHARE", share)
+    rng = random.Random(7)
+    words = [f"term{number}" for number in range(40)]
+    corpus = [
+        [rng.choice(words[: rng.randint(1, 40)]) for _ in range(rng.randint(1, 25))]
+        for _ in range(300)
+    ]
+    reference, index = BM25Okapi(corpus), BM25Index.build(corpus)
+
+    for _ in range(50):
+        tokens = [rng.choice(words + ["unknown"]) for _ in range(rng.randint(1, 5))]
+        k = rng.randint(1, 10)
+        expected = _reference_top_k(reference.get_scores(tokens), k)
+        assert index.top_k(tokens, k)[0].tolist() == expected.tolist(), tokens
+
+
+def test_top_k_ignores_unknown_terms():
+    index = BM25Index.build([["leave", "policy"], ["dress", "code"]])
+    docs, scores = index.top_k(["zxqv"], 3)
+    assert docs.size == 0 and scores.size == 0
+
+
+@pytest.mark.parametrize("share", [0.0, float("inf")], ids=["dense", "sparse"])
+def test_allowed_documents_restrict_the_ranking(monkeypatch, share):
+    monkeypatch.setattr(bm25, "DENSE_ACCUMULATOR_SHARE", share)
+    rng = random.Random(11)
+    words = [f"term{number}" for number in range(30)]
+    corpus = [[rng.choice(words) for _ in range(rng.randint(1, 20))] for _ in range(400)]
+    reference, index = BM25Okapi(corpus), BM25Index.build(corpus)
+
+    for size in [3, 40, 350]:  # direct scoring and masked postings
+        allowed = np.array(sorted(rng.sample(range(400), size)))
+        for _ in range(20):
+            tokens = [rng.choice(words) for _ in range(rng.randint(1, 4))]
+            scores = np.zeros(400)
+            scores[allowed] = reference.get_scores(tokens)[allowed]
+            expected = _reference_top_k(scores, 6)
+            assert index.top_k(tokens, 6, allowed=allowed)[0].tolist() == expected.tolist()
+
+
+def test_saved_index_is_memory_mapped_and_scores_identically(tmp_path):
+    _, metadata = load_index()
+    corpus = [tokenize(searchable_text(item)) for item in metadata]
+    built = BM25Index.build(corpus)
+    info = built.save(tmp_path / "bm25.bin")
+    loaded = BM25Index.load(tmp_path / "bm25.bin", info)
+
+    assert info["bytes"] == (tmp_path / "bm25.bin").stat().st_size
+    assert loaded.vocab == built.vocab
+    assert isinstance(loaded.doc_ids.base, np.memmap)
+    for question in ["What is the PTO carryover policy?", "dress code", "overtime overtime pay"]:
+        tokens = tokenize(question)
+        assert np.array_equal(loaded.get_scores(tokens), built.get_scores(tokens))
+        for got, expected in zip(loaded.top_k(tokens, 6), built.top_k(tokens, 6)):
+            assert np.array_equal(got, expected)
+
+
+def test_subset_keeps_corpus_statistics():
+    rng = random.Random(5)
+    words = [f"term{number}" for number in range(30)]
+    corpus = [[rng.choice(words) for _ in range(rng.randint(1, 20))] for _ in range(300)]
+    index = BM25Index.build(corpus)
+    rows = np.array(sorted(rng.sample(range(300), 90)))
+    shard = index.subset(rows)
+
+    assert len(shard) == 90
+    for _ in range(30):
+        tokens = [rng.choice(words + ["unknown"]) for _ in range(rng.randint(1, 4))]
+        assert np.array_equal(shard.get_scores(tokens), index.get_scores(tokens)[rows])
+        docs, scores = shard.top_k(tokens, 6)
+        expected_docs, expected_scores = index.top_k(tokens, 6, allowed=rows)
+        assert rows[docs].tolist() == expected_docs.tolist()
+        assert np.array_equal(scores, expected_scores)
@@ -1,12 +1,46 @@
+import json
+import os
+import subprocess
+import sys
 from pathlib import Path
 
+import numpy as np
+import pytest
+from fake_openai import FakeOpenAIServer
+
+from src.data_pipeline import cli_ingest
 from src.data_pipeline.cli_ingest import chunk_text, ingest, iter_sections
+from src.llm import generator
 from src.llm.generator import generate_answer
+from src.llm.semantic_cache import get_semantic_cache
 from src.core.config import settings
+from src.core.result_cache import get_result_cache
 from src.retrieval.index_faiss import load_index
-from src.retrieval.search import _searchable_text, _tokenize, clear_search_cache, hybrid_search
+from src.retrieval import embeddings, search
+from src.retrieval.bm25 import searchable_text, tokenize
+from src.retrieval.filters import MetadataIndex, SearchFilter
+from src.retrieval.search import (
+    clear_search_cache,
+    hybrid_search,
+    hybrid_search_many,
+)
 from src.storage.models import Base
 
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _run_with_env(code: str, **env: str) -> str:
+    """Run ``code`` in a fresh interpreter, so settings are read from ``env``."""
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env={**os.environ, **env},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip()
+
 
 def test_database_models_are_mappable():
     assert {"users", "chat_sessions", "messages", "policy_chunks"} <= set(Base.metadata.tables)
@@ -38,17 +72,103 @@ def test_ingest_supports_text_files(tmp_path: Path):
     assert "leave.txt" in (output / "corpus.jsonl").read_text(encoding="utf-8")
 
 
+def test_ingest_output_does_not_depend_on_line_endings(tmp_path: Path):
+    text = (
+        "# Leave\nEmployees receive paid leave after the waiting period.\n"
+        "## Carryover\nUp to five unused days carry over into the next year.\n"
+    )
+    corpora = []
+    for ending in ["\n", "\r\n", "\r"]:
+        source, output = tmp_path / f"source-{len(corpora)}", tmp_path / f"output-{len(corpora)}"
+        source.mkdir()
+        (source / "leave.md").write_bytes(text.replace("\n", ending).encode("utf-8"))
+        assert ingest(source, output, "GLOBAL", "2025-01-01") == 2
+        corpora.append((output / "corpus.jsonl").read_text(encoding="utf-8"))
+    assert corpora[0] == corpora[1] == corpora[2]
+    assert [json.loads(line)["section"] for line in corpora[0].splitlines()] == [
+        "Leave",
+        "Carryover",
+    ]
+
+
+def test_incremental_ingest_only_rechunks_changed_files(tmp_path: Path, monkeypatch):
+    source, output = tmp_path / "source", tmp_path / "output"
+    source.mkdir()
+    sentence = "Employees may request paid leave after completing the waiting period."
+    for name in ("leave", "travel", "conduct"):
+        (source / f"{name}.md").write_text(f"# {name}\n{sentence} ({name})", encoding="utf-8")
+    ingest(source, output, "GLOBAL", "2025-01-01")
+    old_ids = {
+        json.loads(line)["policy_id"]: json.loads(line)["id"]
+        for line in (output / "corpus.jsonl").read_text(encoding="utf-8").splitlines()
+    }
+
+    (source / "travel.md").write_text(
+        f"# travel\n{sentence} Receipts are required.", encoding="utf-8"
+    )
+    (source / "conduct.md").unlink()
+    (source / "dress.md").write_text(f"# dress\n{sentence} (dress)", encoding="utf-8")
+    parsed = []
+    original_file_records = cli_ingest.file_records
+
+    def tracking_file_records(policy_id, *args):
+        parsed.append(policy_id)
+        return original_file_records(policy_id, *args)
+
+    monkeypatch.setattr(cli_ingest, "file_records", tracking_file_records)
+    assert ingest(source, output, "GLOBAL", "2025-01-01") == 3
+    assert sorted(parsed) == ["dress", "travel"]
+
+    delta = json.loads((output / "delta.json").read_text(encoding="utf-8"))
+    new_ids = {
+        json.loads(line)["policy_id"]: json.loads(line)["id"]
+        for line in (output / "corpus.jsonl").read_text(encoding="utf-8").splitlines()
+    }
+    assert delta["files"] == {
+        "added": ["dress.md"],
+        "changed": ["travel.md"],
+        "deleted": ["conduct.md"],
+        "unchanged": 1,
+    }
+    assert delta["added"] == sorted([new_ids["dress"], new_ids["travel"]])
+    assert delta["removed"] == sorted([old_ids["conduct"], old_ids["travel"]])
+
+    ingest(source, tmp_path / "full", "GLOBAL", "2025-01-01")
+    full_corpus = (tmp_path / "full" / "corpus.jsonl").read_bytes()
+    assert (output / "corpus.jsonl").read_bytes() == full_corpus
+
+
+def test_parallel_ingest_matches_serial_output(tmp_path: Path):
+    source = tmp_path / "source"
+    source.mkdir()
+    for number in range(12):
+        sections = "\n".join(
+            f"## Rule {rule}\nEmployees in team {number} must follow rule {rule}. " * 8
+            for rule in range(4)
+        )
+        (source / f"policy_{number:02d}.md").write_text(sections, encoding="utf-8")
+
+    serial = ingest(source, tmp_path / "serial", "GLOBAL", "2025-01-01")
+    parallel = ingest(source, tmp_path / "parallel", "GLOBAL", "2025-01-01", workers=3)
+
+    assert serial == parallel > 12
+    serial_corpus = (tmp_path / "serial" / "corpus.jsonl").read_bytes()
+    assert (tmp_path / "parallel" / "corpus.jsonl").read_bytes() == serial_corpus
+    stats = json.loads((tmp_path / "parallel" / "delta.json").read_text(encoding="utf-8"))["stats"]
+    assert stats["parsed_files"] == 12 and stats["chunks_per_second"] > 0
+
+
 def test_offline_answer_needs_retrieval_evidence():
     answer = generate_answer("unrelated question", [])
     assert "couldn't find reliable information" in answer
 
 
 def test_tokenizer_removes_punctuation():
-    assert _tokenize("PTO carry-over policy?") == ["pto", "carry-over", "policy"]
+    assert tokenize("PTO carry-over policy?") == ["pto", "carry-over", "policy"]
 
 
 def test_searchable_text_includes_policy_and_section_names():
-    text = _searchable_text(
+    text = searchable_text(
         {"policy_id": "employee_benefits_policy", "section": "Health Insurance", "text": "Details"}
     )
     assert "employee benefits policy" in text
@@ -112,3 +232,214 @@ def test_answer_is_detailed_readable_and_focused(monkeypatch):
     assert "[Company Name]" not in answer
     assert "Social Media Policy" not in answer
     assert answer.count("\n- ") >= 3
+
+
+def _fake_embed_texts(texts):
+    vectors = []
+    for text in texts:
+        rng = np.random.default_rng(sum(map(ord, text)))
+        vectors.append(rng.standard_normal(1536))
+    return np.array(vectors, dtype=np.float32)
+
+
+def test_batched_search_matches_single_queries(monkeypatch):
+    questions = ["What is the PTO carryover policy?", "", "dress code", "zxqv unmatched gibberish"]
+    for use_dense in (False, True):
+        monkeypatch.setattr(settings, "USE_DENSE", use_dense)
+        monkeypatch.setattr(embeddings, "embed_texts", _fake_embed_texts)
+        clear_search_cache()
+        batched = hybrid_search_many(questions)
+        assert batched == [hybrid_search(question) for question in questions]
+        assert batched[0] and batched[1] == []
+
+
+def test_result_cache_serves_repeats_and_follows_index_version(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(settings, "USE_DENSE", False)
+    monkeypatch.setattr(settings, "RESULT_CACHE_SIZE", 16)
+    monkeypatch.setattr(settings, "RESULT_CACHE_PATH", str(tmp_path / "results.sqlite"))
+    get_result_cache.cache_clear()
+    clear_search_cache()
+
+    hits = hybrid_search("What is the PTO carryover policy?")
+    assert hybrid_search("  what is the pto CARRYOVER policy? ") == hits
+    answer = generate_answer("What is the PTO carryover policy?", hits)
+    assert generate_answer("PTO carryover?", hits) == answer  # offline answers ignore wording
+    hits[0]["text"] = "mutated by the caller"
+    assert hybrid_search("What is the PTO carryover policy?")[0]["text"] != hits[0]["text"]
+    assert get_result_cache().stats()["memory_hits"] == 3
+
+    get_result_cache.cache_clear()  # another worker sharing the SQLite tier
+    assert generate_answer("PTO?", hybrid_search("What is the PTO carryover policy?")) == answer
+    assert get_result_cache().stats() == {
+        "memory_hits": 0, "disk_hits": 2, "misses": 0, "memory_entries": 2
+    }
+
+    generation = search._load_meta_corpus()
+    monkeypatch.setattr(search, "_generation", generation._replace(fingerprint="next:version"))
+    monkeypatch.setattr(settings, "INDEX_RELOAD_INTERVAL", -1.0)
+    assert hybrid_search("What is the PTO carryover policy?")
+    assert get_result_cache().stats()["misses"] == 1
+
+
+def test_result_cache_caps_rows_on_disk_without_ttl(tmp_path: Path):
+    from src.core import result_cache
+
+    cache = result_cache.ResultCache(0, 0, tmp_path / "results.sqlite", max_disk_entries=100)
+    writes = 2 * result_cache._PURGE_EVERY
+    for number in range(writes):
+        cache.put(f"key-{number}", [number])
+    cache.put("key-0", [0])  # rewriting a key makes it the newest again
+
+    rows = cache._db().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    assert rows == 101
+    assert cache.get("key-0") == [0] and cache.get(f"key-{writes - 1}") == [writes - 1]
+    assert cache.get(f"key-{writes - 101}") is None
+
+
+def test_empty_result_cache_path_in_the_environment_keeps_the_cache_in_process():
+    code = (
+        "from src.core.result_cache import get_result_cache\n"
+        "cache = get_result_cache()\n"
+        "cache.put('key', [1])\n"
+        "print(repr(cache.path), cache._db())"
+    )
+    assert _run_with_env(code, RESULT_CACHE_PATH="") == "None None"
+
+
+def _topic_embed_texts(texts):
+    topics = {"pto": 0, "carry": 0, "dress": 1, "code": 1}
+    vectors = np.zeros((len(texts), 8), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, topics.get(word.strip("?"), 7)] += 1.0
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_empty_query_embed_cache_path_in_the_environment_keeps_vectors_in_process():
+    code = (
+        "from src.retrieval.embedding_cache import get_query_cache\n"
+        "cache = get_query_cache()\n"
+        "print(repr(cache.path), cache._db())"
+    )
+    assert _run_with_env(code, QUERY_EMBED_CACHE_PATH="") == "None None"
+
+
+def test_paraphrased_llm_questions_reuse_the_cached_answer(monkeypatch):
+    llm_calls = []
+    monkeypatch.setattr(embeddings, "embed_texts", _topic_embed_texts)
+    monkeypatch.setattr(
+        generator, "_paragraph_llm_openai", lambda query, hits: llm_calls.append(query) or query
+    )
+    monkeypatch.setattr(settings, "USE_LLM", True)
+    monkeypatch.setattr(settings, "USE_DENSE", False)
+    monkeypatch.setattr(settings, "SEMANTIC_CACHE_STYLES", "llm")
+    monkeypatch.setattr(settings, "SEMANTIC_CACHE_THRESHOLD", 0.9)
+    get_semantic_cache.cache_clear()
+    clear_search_cache()
+
+    hits = hybrid_search("What is the PTO carryover policy?")
+    first = generate_answer("PTO carry", hits, style="llm")
+    assert generate_answer("carry PTO?", hits, style="llm") == first
+    assert generate_answer("dress code", hits, style="llm") != first  # not a paraphrase
+    assert generate_answer("PTO carry", hits, style="bullets") != first  # style not cached
+    assert llm_calls == ["PTO carry", "dress code"]
+
+    stats = get_semantic_cache().stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+    assert stats["hit_rate"] == 1 / 3
+
+
+def test_semantic_cache_needs_the_llm_and_the_same_cited_chunks(monkeypatch):
+    llm_calls = []
+    monkeypatch.setattr(embeddings, "embed_texts", _topic_embed_texts)
+    monkeypatch.setattr(
+        generator, "_paragraph_llm_openai", lambda query, hits: llm_calls.append(query) or query
+    )
+    monkeypatch.setattr(settings, "USE_LLM", True)
+    monkeypatch.setattr(settings, "USE_DENSE", False)
+    monkeypatch.setattr(settings, "SEMANTIC_CACHE_STYLES", "llm")
+    monkeypatch.setattr(settings, "SEMANTIC_CACHE_THRESHOLD", 0.9)
+    get_semantic_cache.cache_clear()
+    clear_search_cache()
+
+    hits = hybrid_search("What is the PTO carryover policy?")
+    narrowed = hits[:1]  # as under a stricter filter: same top policy, fewer chunks cited
+    assert len(generator._focused_hits(hits)) > 1
+    first = generate_answer("PTO carry", hits, style="llm")
+    assert generate_answer("carry PTO?", narrowed, style="llm") != first
+    assert llm_calls == ["PTO carry", "carry PTO?"]
+
+    # Offline answers are cheap and deterministic: no embedding, no semantic lookup.
+    monkeypatch.setattr(settings, "USE_LLM", False)
+    stats = get_semantic_cache().stats()
+    generate_answer("PTO carry", hits, style="llm")
+    assert get_semantic_cache().stats() == stats
+
+
+def test_empty_semantic_cache_styles_in_the_environment_disable_the_cache():
+    code = "from src.llm.semantic_cache import semantic_styles\nprint(sorted(semantic_styles()))"
+    assert _run_with_env(code, SEMANTIC_CACHE_STYLES="") == "[]"
+    assert _run_with_env(code, SEMANTIC_CACHE_STYLES="llm, bullets") == "['bullets', 'llm']"
+
+
+def test_filters_restrict_search_to_matching_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "USE_DENSE", False)
+    clear_search_cache()
+    question = "How many days of leave do employees get?"
+
+    policies = {"paid_time_off_policy", "leave_of_absence_policy"}
+    hits = hybrid_search(question, SearchFilter.of(policy_ids=policies))
+    assert hits and {hit["policy_id"] for hit in hits} <= policies
+    assert hybrid_search(question, SearchFilter.of(region="US")) == []
+    assert hybrid_search(question, SearchFilter.of(effective_as_of="2024-12-31")) == []
+    in_effect = SearchFilter.of(region=["GLOBAL", "US"], effective_as_of="2025-06-30")
+    assert hybrid_search(question, in_effect) == hybrid_search(question)
+
+
+def test_metadata_index_handles_common_and_rare_values():
+    regions = ["GLOBAL", "US", None, "GLOBAL"]
+    meta = [
+        {"region": regions[row % 4], "policy_id": f"policy_{row // 2}", "effective_from": None}
+        for row in range(400)
+    ]
+    index = MetadataIndex.build(meta)
+    assert index.regions["GLOBAL"].dtype == np.uint8  # common value: packed bitmap
+    assert index.policies["policy_7"].tolist() == [14, 15]  # rare value: row ids
+
+    search_filter = SearchFilter.of(region=["US", "EU"], policy_ids=["policy_0", "policy_1"])
+    assert index.rows(search_filter).tolist() == [1]
+
+
+def _stream_with_fake_server(monkeypatch, server, question="What is the PTO carryover policy?"):
+    monkeypatch.setattr(settings, "USE_LLM", True)
+    monkeypatch.setattr(settings, "USE_DENSE", False)
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", server.base_url)
+    clear_search_cache()
+    hits = hybrid_search(question)
+    return hits, list(generator.generate_answer_stream(question, hits, style="llm"))
+
+
+def test_llm_answer_streams_after_title_and_sources(monkeypatch):
+    pytest.importorskip("openai")
+    tokens = ["### Overview\n\n", "Up to five ", "days carry ", "over. [1]"]
+    with FakeOpenAIServer(tokens) as server:
+        hits, renderings = _stream_with_fake_server(monkeypatch, server)
+
+    assert server.requests[0]["stream"] is True
+    assert generator.STREAM_PLACEHOLDER in renderings[0]
+    assert renderings[0].startswith("## Paid Time Off Policy")
+    assert "### Policy sources" in renderings[0]
+    assert len(renderings) == len(tokens) + 2
+    assert "Up to five days carry over. [1]" in renderings[-1]
+    assert all(rendering.endswith(renderings[0].split("---")[-1]) for rendering in renderings)
+
+
+def test_llm_stream_failure_falls_back_to_offline_answer(monkeypatch):
+    pytest.importorskip("openai")
+    with FakeOpenAIServer(["Partial ", "answer ", "that never ends"], fail_after=2) as server:
+        hits, renderings = _stream_with_fake_server(monkeypatch, server)
+
+    assert "Partial answer" in renderings[-2]
+    offline = generator._offline_body(generator._focused_hits(hits), "paragraph")
+    assert offline in renderings[-1] and "Partial" not in renderings[-1]
@@ -0,0 +1,54 @@
+import pytest
+
+from benchmarks.evaluate import (
+    Question,
+    configurations,
+    evaluate,
+    load_questions,
+    pareto_frontier,
+    ranking_metrics,
+)
+from src.core.config import settings
+from src.retrieval.search import index_fingerprint, loaded_index
+
+
+def test_ranking_metrics_use_binary_relevance_cut_at_k():
+    metrics = ranking_metrics([False, True, False, True, True], relevant_total=3, k=3)
+    assert metrics["recall"] == pytest.approx(1 / 3)
+    assert metrics["mrr"] == pytest.approx(0.5)
+    assert metrics["ndcg"] == pytest.approx((1 / 1.5849625) / (1 + 1 / 1.5849625 + 0.5))
+    assert ranking_metrics([False, False], relevant_total=2, k=5)["mrr"] == 0.0
+    # Recall is capped at k relevant chunks.
+    assert ranking_metrics([True, True], relevant_total=4, k=2)["recall"] == 1.0
+
+
+def test_pareto_frontier_drops_dominated_configurations():
+    def result(ndcg, p95, tokens):
+        metrics = {"ndcg": ndcg, "search_ms": {"p95": p95}, "prompt_tokens": tokens}
+        return {"config": {}, "metrics": metrics}
+
+    best, fast, dominated = result(0.9, 5.0, 300), result(0.7, 1.0, 300), result(0.7, 6.0, 300)
+    assert pareto_frontier([best, fast, dominated]) == [best, fast]
+
+
+def test_labeled_questions_evaluate_against_the_shipped_index():
+    questions = load_questions()
+    index_fingerprint()
+    policies = {item["policy_id"] for item in loaded_index().meta}
+    assert len(questions) >= len(policies)
+    assert {question.policy_id for question in questions} == policies
+
+    top_k = settings.TOP_K
+    metrics = evaluate(questions[:8], {"TOP_K": 3}, k=3, repeats=1)
+    assert settings.TOP_K == top_k  # configuration is undone afterwards
+    assert 0.5 <= metrics["ndcg"] <= 1.0 and metrics["mrr"] > 0
+    assert metrics["prompt_tokens"] > 0 and metrics["embed_tokens"] == 0
+    assert metrics["search_ms"]["p50"] > 0
+
+    with pytest.raises(ValueError, match="NOT_A_SETTING"):
+        configurations({"NOT_A_SETTING": [1]})
+    assert configurations({"TOP_K": [3, 6], "USE_DENSE": [False]}) == [
+        {"TOP_K": 3, "USE_DENSE": False},
+        {"TOP_K": 6, "USE_DENSE": False},
+    ]
+    assert Question("q", "p").section is None
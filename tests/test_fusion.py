@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from src.core.config import Settings, settings
+from src.retrieval.fusion import fuse, min_max
+from src.retrieval.search import hybrid_search
+
+
+def _per_item_weighted(dense, lexical, top_k, weight, min_score):
+    """The original dict-and-loop fusion, as a reference."""
+    dense_scores = dict(zip(dense[0].tolist(), min_max(dense[1]).tolist()))
+    lexical_scores = dict(zip(lexical[0].tolist(), min_max(lexical[1]).tolist()))
+    results = []
+    for idx in sorted(set(dense_scores) | set(lexical_scores)):
+        d, b = dense_scores.get(idx, 0.0), lexical_scores.get(idx, 0.0)
+        score = weight * d + (1 - weight) * b if dense_scores else b
+        if score >= min_score:
+            results.append((idx, score))
+    return sorted(results, key=lambda item: -item[1])[:top_k]
+
+
+def _ranked(rng, size, pool):
+    ids = rng.choice(pool, size=size, replace=False)
+    scores = np.sort(rng.random(size).astype(np.float32))[::-1]
+    return ids, scores
+
+
+def test_weighted_fusion_matches_the_per_item_loop():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        dense = _ranked(rng, int(rng.integers(0, 12)), 40)
+        lexical = _ranked(rng, int(rng.integers(0, 12)), 40)
+        ids, scores = fuse(dense, lexical, 6, "weighted", 0.6, 0.05)
+        expected = _per_item_weighted(dense, lexical, 6, 0.6, 0.05)
+        assert list(zip(ids.tolist(), scores.tolist())) == expected
+
+
+def test_ties_are_broken_by_chunk_id_even_at_the_cut():
+    lexical = (np.array([9, 4, 7, 1]), np.array([2.0, 1.0, 1.0, 1.0], dtype=np.float32))
+    ids, scores = fuse((np.array([], dtype=int), np.array([])), lexical, 3)
+    assert ids.tolist() == [9, 1, 4] and scores.tolist() == [1.0, 0.0, 0.0]
+
+
+def test_rank_and_zscore_fusion_stay_in_unit_range():
+    dense = (np.array([3, 5, 8]), np.array([0.9, 0.5, 0.1], dtype=np.float32))
+    lexical = (np.array([3, 8, 2]), np.array([12.0, 3.0, 1.0], dtype=np.float32))
+
+    ids, scores = fuse(dense, lexical, 4, "rrf", dense_weight=0.5, rrf_k=60)
+    assert ids.tolist() == [3, 8, 5, 2]
+    assert scores[0] == pytest.approx(1.0)
+    assert scores[1] == pytest.approx(0.5 * 61 / 63 + 0.5 * 61 / 62)
+
+    ids, scores = fuse(dense, lexical, 4, "zscore", dense_weight=0.5)
+    assert ids[0] == 3 and np.all((scores >= 0) & (scores <= 1))
+    assert fuse(dense, lexical, 4, "zscore", min_score=0.6)[0].tolist() == [3]
+
+    with pytest.raises(ValueError, match="borda"):
+        fuse(dense, lexical, 4, "borda")
+
+
+@pytest.mark.parametrize("method", ["weighted", "rrf", "zscore"])
+def test_search_uses_the_configured_fusion(monkeypatch, method):
+    monkeypatch.setattr(settings, "FUSION_METHOD", method)
+    hits = hybrid_search("How many PTO days carry over?")
+    assert hits and hits[0]["policy_id"] == "paid_time_off_policy"
+    assert all(0 <= hit["score"] <= 1 for hit in hits)
+    assert [hit["score"] for hit in hits] == sorted((hit["score"] for hit in hits), reverse=True)
+
+
+def test_fusion_method_setting_is_normalized_and_validated():
+    assert Settings(FUSION_METHOD=" RRF ").FUSION_METHOD == "rrf"
+    with pytest.raises(ValueError, match="FUSION_METHOD"):
+        Settings(FUSION_METHOD="borda")
@@ -0,0 +1,311 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.core.config import settings
+from src.retrieval import embeddings, index_faiss, search
+from src.retrieval.ann import FaissIndex, IVFIndex, recall_at_k
+from src.retrieval.filters import SearchFilter
+from src.retrieval.embedding_cache import get_query_cache
+from src.retrieval.vector_store import CompactVectors
+
+
+def _clustered_vectors(count: int = 2000, dimension: int = 32, clusters: int = 25) -> np.ndarray:
+    rng = np.random.default_rng(3)
+    centers = rng.standard_normal((clusters, dimension))
+    noise = 0.3 * rng.standard_normal((count, dimension))
+    vectors = centers[rng.integers(0, clusters, count)] + noise
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _fake_embed_texts(texts):
+    vectors = np.array(
+        [np.random.default_rng(sum(map(ord, text))).standard_normal(16) for text in texts],
+        dtype=np.float32,
+    )
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def tmp_index(tmp_path: Path, monkeypatch):
+    """Point index_faiss at a temporary corpus and index directory."""
+    index_dir = tmp_path / "index"
+    docs_path = tmp_path / "processed" / "corpus.jsonl"
+    monkeypatch.setattr(index_faiss, "DOCS_PATH", docs_path)
+    for name, value in list(vars(index_faiss).items()):
+        if isinstance(value, Path) and value.parent == index_faiss.INDEX_DIR:
+            monkeypatch.setattr(index_faiss, name, index_dir / value.name)
+    monkeypatch.setattr(index_faiss, "INDEX_DIR", index_dir)
+    monkeypatch.setattr(index_faiss, "embed_texts", _fake_embed_texts)
+    monkeypatch.setattr(embeddings, "embed_texts", _fake_embed_texts)
+    docs_path.parent.mkdir(parents=True)
+    with docs_path.open("w", encoding="utf-8") as f:
+        for number in range(300):
+            record = {
+                "id": f"chunk-{number}",
+                "policy_id": f"policy_{number % 7}",
+                "section": f"Section {number % 5}",
+                "text": f"Employees in group {number} follow leave rule {number % 11}.",
+            }
+            f.write(json.dumps(record) + "\n")
+    yield index_dir
+    search.clear_search_cache()
+
+
+def test_ivf_recall_against_brute_force():
+    vectors = _clustered_vectors()
+    ann = IVFIndex.train(vectors, nlist=40)
+    ann.nprobe = 8
+    assert recall_at_k(ann, vectors, vectors[:100] + 0.01, k=6) >= 0.9
+
+
+def test_faiss_hnsw_recall_against_brute_force():
+    pytest.importorskip("faiss")
+    vectors = _clustered_vectors()
+    ann = FaissIndex.build(vectors, "hnsw", nlist=0, hnsw_m=16).configure(nprobe=1, ef_search=64)
+    assert recall_at_k(ann, vectors, vectors[:100], k=6) >= 0.9
+
+
+def test_build_index_records_ann_used_by_search(tmp_index, monkeypatch):
+    monkeypatch.setattr(settings, "ANN_BACKEND", "ivf")
+    monkeypatch.setattr(settings, "ANN_NPROBE", 1000)  # probe every cell
+    monkeypatch.setattr(settings, "USE_DENSE", True)
+    index_faiss.build_index()
+
+    info = index_faiss.read_info()
+    assert info["ann"]["backend"] == "ivf"
+    assert info["ann"]["recall_at_k"] == 1.0
+    assert isinstance(index_faiss.load_ann_index(), IVFIndex)
+
+    search.clear_search_cache()
+    with_ann = search.hybrid_search("leave rule for group 12")
+    monkeypatch.setattr(search, "load_ann_index", lambda directory: None)
+    search.clear_search_cache()
+    assert with_ann == search.hybrid_search("leave rule for group 12")
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_compact_vectors_keep_recall_after_rescoring(dtype):
+    vectors = _clustered_vectors()
+    compact = CompactVectors.quantize(vectors, dtype)
+    assert compact.codes.nbytes * (2 if dtype == "float16" else 4) == vectors.nbytes
+    assert recall_at_k(compact, vectors, vectors[:100] + 0.01, k=6) >= 0.99
+
+
+def test_compact_storage_search_matches_float32(tmp_index, monkeypatch):
+    monkeypatch.setattr(settings, "USE_DENSE", True)
+    questions = ["leave rule for group 12", "Employees in group 250"]
+    index_faiss.build_index()
+    search.clear_search_cache()
+    expected = search.hybrid_search_many(questions)
+    assert isinstance(index_faiss.load_index()[0], np.memmap)
+
+    monkeypatch.setattr(settings, "VECTOR_STORAGE", "int8")
+    index_faiss.build_index()
+    search.clear_search_cache()
+    assert isinstance(search._load_meta_corpus().shards[0].compact, CompactVectors)
+    assert search.hybrid_search_many(questions) == expected
+
+
+def test_query_embedding_cache_tiers_and_model_invalidation(tmp_path, monkeypatch):
+    calls = []
+
+    def counting_embed(texts):
+        calls.append(list(texts))
+        return _fake_embed_texts(texts)
+
+    monkeypatch.setattr(embeddings, "embed_texts", counting_embed)
+    first = embeddings.embed_queries(["What is the PTO policy?", "what is the  PTO policy?"])
+    assert calls == [["What is the PTO policy?"]]
+    assert np.array_equal(first[0], first[1])
+
+    embeddings.embed_query("WHAT IS THE PTO POLICY?")
+    get_query_cache.cache_clear()  # a fresh worker only has the SQLite tier
+    assert np.array_equal(embeddings.embed_query("What is the PTO policy?"), first[0])
+    assert len(calls) == 1
+    assert get_query_cache().stats()["disk_hits"] == 1
+
+    monkeypatch.setattr(settings, "ST_MODEL", "another-model")
+    embeddings.embed_query("What is the PTO policy?")
+    assert len(calls) == 2
+    assert get_query_cache().stats()["misses"] == 1
+
+
+def test_rebuild_only_embeds_new_or_changed_chunks(tmp_index, monkeypatch):
+    calls = []
+
+    def counting_embed(texts):
+        calls.append(len(texts))
+        return _fake_embed_texts(texts)
+
+    monkeypatch.setattr(index_faiss, "embed_texts", counting_embed)
+    index_faiss.build_index()
+    original_vectors = np.array(index_faiss.load_index()[0])
+
+    records = [json.loads(line) for line in index_faiss.DOCS_PATH.open(encoding="utf-8")]
+    records[5] = {**records[5], "id": "chunk-5-edited", "text": "Edited leave rule text."}
+    del records[9]
+    index_faiss.DOCS_PATH.write_text(
+        "".join(json.dumps(record) + "\n" for record in records), encoding="utf-8"
+    )
+    index_faiss.build_index()
+
+    info = index_faiss.read_info()
+    assert calls == [300, 1]
+    assert info["embeddings"] == {"reused": 298, "embedded": 1, "dropped": 2}
+    rebuilt_vectors = index_faiss.load_index()[0]
+    assert np.array_equal(rebuilt_vectors[:5], original_vectors[:5])
+    assert np.array_equal(rebuilt_vectors[9:], original_vectors[10:])
+
+
+def test_interrupted_build_resumes_from_checkpoint(tmp_index, monkeypatch):
+    monkeypatch.setattr(settings, "INDEX_BATCH_SIZE", 64)
+    calls = []
+    api = {"available_calls": 2}
+
+    def flaky_embed(texts):
+        if len(calls) == api["available_calls"]:
+            raise RuntimeError("embedding API unavailable")
+        calls.append(len(texts))
+        return _fake_embed_texts(texts)
+
+    monkeypatch.setattr(index_faiss, "embed_texts", flaky_embed)
+    with pytest.raises(RuntimeError):
+        index_faiss.build_index()
+    checkpoint_path = index_faiss.STAGING_DIR / index_faiss.CHECKPOINT_NAME
+    checkpoint = json.loads(checkpoint_path.read_text(encoding="utf-8"))
+    assert checkpoint["rows_done"] == 128
+    assert index_faiss.current_version() is None
+
+    calls.clear()
+    api["available_calls"] = None
+    index_faiss.build_index()
+
+    assert calls == [64, 64, 44]
+    assert not index_faiss.STAGING_DIR.exists()
+    info = index_faiss.read_info()
+    assert info["embeddings"] == {"reused": 0, "embedded": 300, "dropped": 0}
+    vectors, meta = index_faiss.load_index()
+    texts = [record["text"] for record in meta]
+    assert len(texts) == 300 and np.allclose(vectors, _fake_embed_texts(texts))
+
+
+def test_running_process_swaps_in_published_version(tmp_index, monkeypatch):
+    monkeypatch.setattr(settings, "INDEX_RELOAD_INTERVAL", 0.0)
+    first = index_faiss.build_index()
+    search.clear_search_cache()
+    old_generation = search._load_meta_corpus()
+    assert old_generation.version == first and len(old_generation.meta) == 300
+
+    with index_faiss.DOCS_PATH.open("a", encoding="utf-8") as f:
+        record = {"id": "chunk-new", "policy_id": "remote_work", "text": "Remote work rules."}
+        f.write(json.dumps(record) + "\n")
+    second = index_faiss.build_index()
+    assert index_faiss.current_version() == second != first
+
+    assert search._load_meta_corpus() is old_generation  # reload runs in the background
+    search._reload_thread.join()
+    new_generation = search._load_meta_corpus()
+    assert new_generation.version == second and len(new_generation.meta) == 301
+    assert len(old_generation.meta) == 300  # in-flight queries keep their generation
+    assert search.hybrid_search("remote work rules")[0]["policy_id"] == "remote_work"
+
+
+def test_filtered_dense_search_scores_only_allowed_rows(tmp_index, monkeypatch):
+    monkeypatch.setattr(settings, "ANN_BACKEND", "ivf")
+    monkeypatch.setattr(settings, "USE_DENSE", True)
+    index_faiss.build_index()
+    search.clear_search_cache()
+
+    scored_rows = []
+    subset_scores = search._subset_scores
+
+    def counting_subset_scores(vectors, rows, query_vectors):
+        scored_rows.append(len(rows))
+        return subset_scores(vectors, rows, query_vectors)
+
+    monkeypatch.setattr(search, "_subset_scores", counting_subset_scores)
+    hits = search.hybrid_search("leave rule for group 12", SearchFilter.of(policy_ids="policy_3"))
+    assert scored_rows == [43]
+    assert len(hits) == settings.TOP_K and {hit["policy_id"] for hit in hits} == {"policy_3"}
+
+
+def test_answers_use_sentences_segmented_at_build_time(tmp_index, monkeypatch):
+    from src.llm import generator, sentences
+
+    index_faiss.build_index()
+    assert index_faiss.read_info()["segments"] == sentences.SEGMENTS_VERSION
+    hits = search.hybrid_search("leave rule for group 42")
+    assert all(hit["segments"]["spans"] for hit in hits)
+
+    with monkeypatch.context() as patched:
+        patched.setattr(sentences, "clean_text", lambda text: pytest.fail("regex at query time"))
+        answer = generator.generate_answer("leave rule for group 42", hits)
+    unsegmented = [{k: v for k, v in hit.items() if k != "segments"} for hit in hits]
+    assert answer == generator.generate_answer("leave rule for group 42", unsegmented)
+
+
+def test_search_loads_persisted_bm25_and_rejects_mismatched_files(tmp_index, monkeypatch):
+    from src.retrieval.bm25 import BM25Index
+
+    index_faiss.build_index()
+    expected = search.hybrid_search("leave rule for group 42")
+    search.clear_search_cache()
+
+    with monkeypatch.context() as patched:
+        patched.setattr(BM25Index, "build", lambda corpus: pytest.fail("tokenized at load time"))
+        assert search.hybrid_search("leave rule for group 42") == expected
+
+    directory = index_faiss.index_dir()
+    with (directory / index_faiss.BM25_NAME).open("ab") as f:
+        f.write(b"\0")
+    with pytest.raises(ValueError):
+        index_faiss.load_bm25_index()
+    search.clear_search_cache()
+    assert search.hybrid_search("leave rule for group 42") == expected
+
+
+@pytest.mark.parametrize("by", ["hash", "policy_id"])
+def test_sharded_index_ranks_like_the_unsharded_one(tmp_index, monkeypatch, by):
+    monkeypatch.setattr(settings, "USE_DENSE", True)
+    questions = ["leave rule for group 12", "Employees in group 250", "section 3 leave rule 7"]
+    policy_3 = SearchFilter.of(policy_ids="policy_3")
+    index_faiss.build_index()
+    search.clear_search_cache()
+    expected = search.hybrid_search_many(questions), search.hybrid_search_many(questions, policy_3)
+
+    monkeypatch.setattr(settings, "INDEX_SHARDS", 3)
+    monkeypatch.setattr(settings, "INDEX_SHARD_BY", by)
+    monkeypatch.setattr(settings, "SEARCH_SHARD_WORKERS", 3)
+    index_faiss.build_index()
+    assert not (index_faiss.index_dir() / index_faiss.VECS_NAME).exists()
+    with pytest.raises(ValueError, match="sharded"):
+        index_faiss.load_index()
+
+    search.clear_search_cache()
+    generation = search._load_meta_corpus()
+    assert len(generation.shards) == 3
+    assert sum(len(shard.rows) for shard in generation.shards) == 300
+    if by == "policy_id":  # every policy lives in exactly one shard
+        meta = generation.meta
+        policies = [{meta[row]["policy_id"] for row in shard.rows} for shard in generation.shards]
+        assert sum(map(len, policies)) == 7
+    assert (
+        search.hybrid_search_many(questions),
+        search.hybrid_search_many(questions, policy_3),
+    ) == expected
+
+
+@pytest.mark.parametrize("storage, backend", [("float32", "auto"), ("int8", "ivf")])
+def test_empty_corpus_builds_an_empty_index(tmp_index, monkeypatch, storage, backend):
+    monkeypatch.setattr(settings, "VECTOR_STORAGE", storage)
+    monkeypatch.setattr(settings, "ANN_BACKEND", backend)
+    index_faiss.DOCS_PATH.write_text("", encoding="utf-8")
+    index_faiss.build_index()
+    vectors, meta = index_faiss.load_index()
+    assert len(vectors) == 0 and meta == []
+    assert index_faiss.read_info()["ann"] is None
+    search.clear_search_cache()
+    assert search.hybrid_search("leave rule") == []
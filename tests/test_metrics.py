@@ -0,0 +1,74 @@
+import json
+import logging
+
+import pytest
+
+from src.api.server import PROMETHEUS_CONTENT_TYPE, encode_response
+from src.core import metrics
+from src.core.config import settings
+from src.llm.generator import generate_answer
+from src.retrieval import search
+
+
+@pytest.fixture
+def enabled_metrics(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    monkeypatch.setattr(settings, "METRICS_LOG", True)
+    metrics.reset_metrics()
+    yield
+    metrics.reset_metrics()
+
+
+def test_disabled_metrics_record_nothing():
+    metrics.reset_metrics()
+    assert metrics.span("search") is metrics.span("answer")
+    with metrics.span("search"):
+        metrics.incr("search_queries")
+    assert metrics.snapshot() == {"stages": {}, "counters": {}}
+
+
+def test_pipeline_stages_and_counters(enabled_metrics, monkeypatch, caplog):
+    search.clear_search_cache()
+    query = "How many PTO days carry over?"
+    with caplog.at_level(logging.INFO, logger="src.core.metrics"):
+        hits = search.hybrid_search(query)
+        generate_answer(query, hits, "paragraph")
+
+    stages = metrics.snapshot()["stages"]
+    for stage in ("index.load", "index.load.bm25", "search", "search.bm25", "search.fuse"):
+        assert stages[stage]["count"] == 1
+    assert {"answer", "answer.cache_lookup", "answer.offline", "answer.render"} <= set(stages)
+    counters = metrics.snapshot()["counters"]
+    assert counters["search_queries"] == 1
+    assert counters["search_hits"] == len(hits)
+
+    records = [json.loads(record.getMessage()) for record in caplog.records]
+    assert [record["span"] for record in records] == ["search", "answer"]
+    assert {"index.load", "search.bm25"} <= set(records[0]["stages"])
+    assert records[0]["counters"]["search_queries"] == 1
+    assert records[0]["error"] is None
+
+    def failing_embed(queries):
+        raise RuntimeError("embedding service down")
+
+    monkeypatch.setattr(settings, "USE_DENSE", True)
+    monkeypatch.setattr(search, "embed_queries", failing_embed)
+    assert search.hybrid_search(query) == hits
+    text = metrics.render_prometheus()
+    assert 'hr_policy_dense_fallbacks_total{error="RuntimeError"} 1' in text
+    assert 'hr_policy_stage_seconds_bucket{stage="search.bm25",le="+Inf"} 2' in text
+    assert 'hr_policy_stage_seconds_count{stage="search"} 2' in text
+    assert "# TYPE hr_policy_search_queries_total counter" in text
+
+
+def test_histogram_buckets_are_cumulative(enabled_metrics):
+    metrics.observe("build.ann", 0.003)
+    metrics.observe("build.ann", 0.2)
+    text = metrics.render_prometheus()
+    assert 'hr_policy_stage_seconds_bucket{stage="build.ann",le="0.0025"} 0' in text
+    assert 'hr_policy_stage_seconds_bucket{stage="build.ann",le="0.005"} 1' in text
+    assert 'hr_policy_stage_seconds_bucket{stage="build.ann",le="0.25"} 2' in text
+    assert "hr_policy_stage_seconds_sum{stage=\"build.ann\"} 0.203" in text
+
+    response = encode_response(200, text, keep_alive=False)
+    assert f"Content-Type: {PROMETHEUS_CONTENT_TYPE}".encode() in response
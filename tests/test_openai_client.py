@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from fake_openai import FakeOpenAIServer, fake_embedding
+
+from src.core import openai_client
+from src.core.config import settings
+from src.core.openai_client import RateLimiter, token_batches
+from src.llm import generator
+from src.retrieval import embeddings
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """Point the shared client at a local stub server and retry without real waits."""
+
+    def serve(**kwargs) -> FakeOpenAIServer:
+        server = FakeOpenAIServer(**kwargs).__enter__()
+        servers.append(server)
+        monkeypatch.setattr(settings, "OPENAI_BASE_URL", server.base_url)
+        return server
+
+    servers = []
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(openai_client, "RETRY_BASE_DELAY", 0.001)
+    openai_client._client.cache_clear()
+    openai_client.get_rate_limiter.cache_clear()
+    yield serve
+    for server in servers:
+        server.__exit__(None, None, None)
+    openai_client._client.cache_clear()
+    openai_client.get_rate_limiter.cache_clear()
+
+
+def _count_acquisitions(monkeypatch) -> list:
+    """Record the tokens of every acquire on the shared rate limiter."""
+    limiter, acquired = openai_client.get_rate_limiter(), []
+    acquire = limiter.acquire
+
+    def counting_acquire(tokens=0):
+        acquired.append(tokens)
+        acquire(tokens)
+
+    monkeypatch.setattr(limiter, "acquire", counting_acquire)
+    return acquired
+
+
+def test_token_batches_respect_budget_and_order():
+    texts = ["x" * 40] * 7 + ["y" * 400]
+    batches = token_batches(texts, max_tokens=30, max_items=3)
+    assert [position for batch in batches for position in batch] == list(range(8))
+    assert [len(batch) for batch in batches] == [2, 2, 2, 1, 1]
+
+
+def test_embeddings_are_batched_concurrently_and_retried(fake_openai, monkeypatch):
+    pytest.importorskip("openai")
+    server = fake_openai(delay=0.05, fail_statuses=[429, 429])
+    monkeypatch.setattr(settings, "EMBEDDINGS_PROVIDER", "openai")
+    monkeypatch.setattr(settings, "OPENAI_EMBED_BATCH_TOKENS", 25)
+    monkeypatch.setattr(settings, "OPENAI_MAX_CONCURRENCY", 4)
+    acquired = _count_acquisitions(monkeypatch)
+    texts = [f"Policy chunk number {number:02d} about leave." for number in range(20)]
+
+    vectors = embeddings.embed_texts(texts)
+
+    expected = np.array([fake_embedding(text) for text in texts], dtype=np.float32)
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    assert np.allclose(vectors, expected, atol=1e-6)
+    assert len(server.requests) == 10 + 2  # ten batches of two, two rate-limited attempts
+    assert len(acquired) == len(server.requests)  # retries are throttled as well
+    assert all(len(request["input"]) == 2 for request in server.requests)
+    assert server.max_in_flight > 1
+    assert len({id(openai_client.get_openai_client()) for _ in range(3)}) == 1
+
+
+def test_chat_completion_retries_server_errors(fake_openai, monkeypatch):
+    pytest.importorskip("openai")
+    server = fake_openai(tokens=["Grounded ", "answer."], fail_statuses=[503])
+    monkeypatch.setattr(settings, "USE_LLM", True)
+    acquired = _count_acquisitions(monkeypatch)
+
+    hits = [{"text": "Employees may carry over five days.", "policy_id": "paid_time_off_policy"}]
+    assert generator._paragraph_llm_openai("PTO carryover?", hits) == "Grounded answer."
+    assert len(server.requests) == 2
+    assert len(acquired) == 2  # the retried attempt is charged to the limiter too
+
+
+def test_rate_limiter_waits_for_request_and_token_budgets():
+    now, sleeps = [0.0], []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    requests = RateLimiter(2, 0, clock=lambda: now[0], sleep=sleep)
+    requests.acquire()
+    requests.acquire()
+    requests.acquire()
+    assert sleeps == [pytest.approx(30)]
+
+    sleeps.clear()
+    tokens = RateLimiter(0, 600, clock=lambda: now[0], sleep=sleep)
+    tokens.acquire(600)
+    tokens.acquire(300)
+    tokens.acquire(10_000)  # larger than a minute's budget: waits for a full bucket
+    assert sleeps == [pytest.approx(30), pytest.approx(60)]
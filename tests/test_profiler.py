@@ -0,0 +1,80 @@
+import json
+import time
+
+from src.core import profiler
+from src.core.config import settings
+from src.llm.generator import generate_answer
+from src.retrieval import search
+
+
+def _configure(monkeypatch, tmp_path, **values):
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "PROFILE_INTERVAL_MS", 1.0)
+    for name, value in values.items():
+        monkeypatch.setattr(settings, name, value)
+
+
+def test_slow_calls_are_saved_with_stacks_and_stage_timings(monkeypatch, tmp_path):
+    _configure(monkeypatch, tmp_path, PROFILE_SLOW_MS=20.0, PROFILE_MAX_FILES=2)
+    original = search._search_many
+
+    def slow_search_many(queries, filters):
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        return original(queries, filters)
+
+    query = "How many PTO days carry over?"
+    hits = search.hybrid_search(query)
+    assert profiler.load_captures(tmp_path) == []  # fast calls leave nothing behind
+
+    monkeypatch.setattr(search, "_search_many", slow_search_many)
+    for _ in range(3):
+        search.hybrid_search(query)
+
+    records = profiler.load_captures(tmp_path)
+    assert len(records) == 2 and len(list(tmp_path.iterdir())) == 4  # rotated
+    record = records[0]
+    assert record["kind"] == "search" and record["trigger"] == "slow"
+    assert record["query"] == query and record["duration_ms"] >= 20
+    assert record["index"]["version"] == "legacy"
+    assert {"search.load_index", "search.bm25", "search.fuse"} <= set(record["stages_ms"])
+
+    collapsed = (tmp_path / record["profile"]).read_text(encoding="utf-8")
+    assert collapsed.startswith("hybrid_search_many (search.py")
+    assert "slow_search_many (test_profiler.py" in collapsed
+    assert "slow_search_many" in profiler.describe(record, tmp_path)
+    assert profiler.summarize(records).startswith("search: 2 captures")
+
+    monkeypatch.setattr(settings, "PROFILE_SLOW_MS", 0.0)
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_RATE", 1.0)
+    generate_answer(query, hits)
+    record = profiler.load_captures(tmp_path)[0]
+    assert record["kind"] == "answer" and record["format"] == "pstats"
+    assert "answer.offline" in record["stages_ms"]
+    assert "cumulative" in profiler.describe(record, tmp_path)
+
+
+def test_unsampled_calls_are_not_stack_sampled_without_a_slow_threshold(monkeypatch, tmp_path):
+    _configure(monkeypatch, tmp_path, PROFILE_SLOW_MS=0.0, PROFILE_SAMPLE_RATE=0.5)
+    monkeypatch.setattr(profiler.random, "random", lambda: 0.9)  # never cProfiled
+    watched = []
+    monkeypatch.setattr(profiler._sampler, "watch", watched.append)
+
+    search.hybrid_search("How many PTO days carry over?")
+    assert watched == [] and profiler.load_captures(tmp_path) == []
+
+
+def test_disabled_profiler_is_a_shared_no_op(tmp_path):
+    assert settings.PROFILE_SLOW_MS == 0 and settings.PROFILE_SAMPLE_RATE == 0
+    assert profiler.profile_call("search", "a") is profiler.profile_call("answer", "b")
+
+
+def test_hot_frames_count_self_and_total_samples():
+    collapsed = "main;search;bm25 3\nmain;search 1\nmain;answer;bm25 2\n"
+    assert profiler.hot_frames(collapsed, limit=3) == [
+        ("main", 0, 6),
+        ("bm25", 5, 5),
+        ("search", 1, 4),
+    ]
+    assert json.dumps(profiler.summarize([])) == '"No captured profiles."'
@@ -0,0 +1,79 @@
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict
+
+import pytest
+
+from src.core import config
+
+ROOT = Path(__file__).resolve().parents[1]
+STARTUP_BUDGET_SECONDS = 0.75
+# Imported only by the code paths that use them, never at module import.
+LAZY_MODULES = {"streamlit", "sentence_transformers", "openai", "sqlalchemy", "rank_bm25", "faiss"}
+
+
+def _import_times(module: str) -> Dict[str, int]:
+    """Cumulative microseconds per module from ``python -X importtime``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "src.data_pipeline.cli_ingest",
+        "src.retrieval.index_faiss",  # all of scripts/build_index.py's imports
+        "src.retrieval.search",
+        "src.llm.generator",
+        "src.storage.session",
+        "src.api.server",
+    ],
+)
+def test_entry_points_import_quickly_without_heavy_dependencies(module):
+    times = _import_times(module)
+    loaded = {name.split(".")[0] for name in times}
+    assert not loaded & LAZY_MODULES
+    assert times[module] / 1e6 < STARTUP_BUDGET_SECONDS
+
+
+def test_settings_import_neither_numpy_nor_retrieval_code():
+    times = _import_times("src.core.config")
+    assert "numpy" not in times
+    assert not any(name.startswith("src.retrieval") for name in times)
+
+
+def test_streamlit_secrets_are_read_once(monkeypatch):
+    reads = []
+
+    class Secrets:
+        def keys(self):
+            reads.append("keys")
+            return ["A"]
+
+        def __getitem__(self, key):
+            return "1"
+
+    monkeypatch.setitem(sys.modules, "streamlit", SimpleNamespace(secrets=Secrets()))
+    monkeypatch.delenv("A", raising=False)
+    monkeypatch.delenv("B", raising=False)
+    config._streamlit_secrets.cache_clear()
+    try:
+        assert config.getenv("A") == "1"
+        assert config.getenv("B", "default") == "default"
+        assert len(reads) == 1
+    finally:
+        config._streamlit_secrets.cache_clear()